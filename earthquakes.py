@@ -1,6 +1,7 @@
 #! /usr/bin/env python
 # pyright: basic
 
+import argparse
 import json
 import os
 import sys
@@ -9,7 +10,21 @@ from typing import Any
 
 import pandas as pd
 
-from utils import crud, filters, parser, stats, utils, visuals
+from utils import (
+    catalog,
+    crud,
+    events,
+    filters,
+    magnitude,
+    parser,
+    query,
+    render,
+    report,
+    stations,
+    stats,
+    utils,
+    visuals,
+)
 
 HEADER = """=== Terramotos ==="""
 
@@ -47,6 +62,8 @@ MENU = """[1] Criar a base de dados
 [8] Criar uma entrada
 [9] Gráficos
 [10] Filtros (T7)
+[11] Estações
+[12] Magnitude local (ML) a partir das amplitudes
 
 [Q] Sair
 """
@@ -94,13 +111,14 @@ def main():
                 if fname is None:
                     fname = "dados.txt"
 
+                # o catalogo registado e o original, que vive ate ao proximo load
                 if _file_exists(fname) and fname.endswith(".json"):
-                    db = pd.read_json(fname)
-                    original_db = db.copy()
+                    original_db = catalog.register(pd.read_json(fname))
+                    db = original_db.copy()
                     print("Base de dados populada.")
                 elif _file_exists(fname):
-                    db = parser.parse(fname)
-                    original_db = db.copy()
+                    original_db = catalog.register(parser.parse(fname))
+                    db = original_db.copy()
                     input("Base de dados populada. Enter para voltar ao menu inicial")
                 else:
                     input("Base de dados não encontrada. Por favor tenta de novo.")
@@ -224,6 +242,18 @@ def main():
                 else:
                     retInfo = "Base de dados não encontrada!"
 
+            case "11":
+                if db is not None:
+                    stations.station_menu(db)
+                else:
+                    retInfo = "Base de dados não encontrada!"
+
+            case "12":
+                if db is not None:
+                    magnitude.magnitude_menu(db)
+                else:
+                    retInfo = "Base de dados não encontrada!"
+
             case "q":
                 isRunning = False
                 continue
@@ -302,6 +332,208 @@ def _prettify_event(df: pd.DataFrame) -> None:
     )
 
 
+def load_catalog(fname: str) -> pd.DataFrame:
+    """Le e regista o catalogo, a partir de um ficheiro de dados ou JSON
+
+    Args:
+        fname (str): nome do ficheiro
+
+    Returns:
+        pd.DataFrame: catalogo registado
+    """
+    if fname.endswith(".json"):
+        return catalog.register(pd.read_json(fname))
+    return catalog.register(parser.parse(fname))
+
+
+def run_query(fname: str, expr: str, output: str | None) -> int:
+    """Modo nao interativo: aplica uma expressao de filtros ao catalogo
+
+    Args:
+        fname (str): ficheiro de dados
+        expr (str): expressao de filtros (ver `utils/query.py`)
+        output (str | None): ficheiro csv onde guardar o resultado
+
+    Returns:
+        int: codigo de saida
+    """
+    try:
+        q = query.compile_query(expr)
+    except ValueError as e:
+        print(f"Erro na expressão: {e}", file=sys.stderr)
+        return 2
+
+    db = load_catalog(fname)
+    result = q.run(db)
+    events = result.drop_duplicates(subset="ID", keep="first")
+
+    print(q.explain())
+    print(f"Eventos: {len(events)} ({len(result)} linhas)")
+    print(f"Compilação: {q.compile_ms:.3f} ms | Execução: {q.run_ms:.3f} ms")
+
+    if output:
+        guardar_csv(result, output)
+    else:
+        print(events[["ID", "Data", "Regiao", "Latitude", "Longitude"]].to_string(index=False))
+    return 0
+
+
+def _parse_presets(presets: list[str] | None) -> dict[str, str] | None:
+    """Subconjuntos `nome=expressao` da linha de comandos
+
+    Args:
+        presets (list[str] | None): subconjuntos; sem subconjuntos, usa os de
+            `report.PRESETS`
+
+    Returns:
+        dict[str, str] | None: nome -> expressao, ou None se algum for invalido
+    """
+    if not presets:
+        return dict(report.PRESETS)
+
+    chosen = {"catalogo": ""}
+    for p in presets:
+        name, sep, expr = p.partition("=")
+        if not sep or not name.strip():
+            print(f"Subconjunto inválido (nome=expressão): {p}", file=sys.stderr)
+            return None
+        chosen[name.strip()] = expr.strip()
+    return chosen
+
+
+def run_report(fname: str, outdir: str, presets: list[str] | None) -> int:
+    """Modo nao interativo: escreve o relatorio estatistico completo
+
+    Args:
+        fname (str): ficheiro de dados
+        outdir (str): diretorio de saida
+        presets (list[str] | None): subconjuntos `nome=expressao`, que substituem os
+            de `report.PRESETS`
+
+    Returns:
+        int: codigo de saida
+    """
+    chosen = _parse_presets(presets)
+    if chosen is None:
+        return 2
+
+    db = load_catalog(fname)
+    try:
+        res = report.build_report(db, chosen)
+    except ValueError as e:
+        print(f"Erro na expressão: {e}", file=sys.stderr)
+        return 2
+
+    files = report.write_report(res, outdir)
+    print(f"Relatório escrito em {outdir} ({len(files)} ficheiros)")
+    print(f"Tempo de cálculo: {res['tempos']['total']:.1f} ms")
+    return 0
+
+
+def run_render(
+    fname: str,
+    outdir: str,
+    formats: str,
+    presets: list[str] | None,
+    zone: str | None,
+) -> int:
+    """Modo nao interativo: desenha os graficos T6 para ficheiros, sem display
+
+    Args:
+        fname (str): ficheiro de dados
+        outdir (str): diretorio de saida
+        formats (str): formatos separados por virgulas (ex: `png,svg`)
+        presets (list[str] | None): subconjuntos `nome=expressao`
+        zone (str | None): tipo de zona para uma variante por zona (ex: `SZ`)
+
+    Returns:
+        int: codigo de saida
+    """
+    chosen = _parse_presets(presets)
+    if chosen is None:
+        return 2
+
+    db = load_catalog(fname)
+    try:
+        res = render.render_all(
+            db,
+            outdir,
+            tuple(f.strip().lower() for f in formats.split(",") if f.strip()),
+            chosen,
+            zone,
+        )
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+
+    print(
+        f"{res['graficos']} gráficos ({len(res['ficheiros'])} ficheiros) em {outdir}"
+    )
+    print(
+        f"Dados: {res['tempos']['dados']:.1f} ms | Desenho: {res['tempos']['desenho']:.1f} ms"
+    )
+    return 0
+
+
+def run_build_events(fname: str) -> int:
+    """Modo nao interativo: constroi o catalogo de eventos da app Dash (`utils/vis.py`)
+
+    Args:
+        fname (str): ficheiro de dados
+
+    Returns:
+        int: codigo de saida
+    """
+    res = events.build(fname)
+    print(f"Catálogo de eventos: {len(res)} eventos em {events.ARTIFACT}")
+    return 0
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Argumentos da linha de comandos. Sem argumentos, corre o menu interativo
+
+    Args:
+        argv (list[str] | None): argumentos (default: `sys.argv`)
+
+    Returns:
+        argparse.Namespace: argumentos lidos
+    """
+    ap = argparse.ArgumentParser(description="Terramotos")
+    ap.add_argument("-f", "--ficheiro", default="dados.txt", help="ficheiro de dados")
+    ap.add_argument("-q", "--query", help='expressão de filtros, ex: "gap<180 and sz=SZ06"')
+    ap.add_argument("-o", "--saida", help="ficheiro csv para o resultado")
+    ap.add_argument("-r", "--relatorio", help="diretório para o relatório estatístico")
+    ap.add_argument(
+        "-p",
+        "--preset",
+        action="append",
+        help='subconjunto do relatório e dos gráficos, "nome=expressão" (pode repetir-se)',
+    )
+    ap.add_argument("-g", "--graficos", help="diretório para os gráficos T6 (sem display)")
+    ap.add_argument(
+        "--formatos", default="png", help="formatos dos gráficos, ex: png,svg,pdf"
+    )
+    ap.add_argument("-z", "--zona", help="tipo de zona para gráficos por zona, ex: SZ")
+    ap.add_argument(
+        "-e",
+        "--eventos",
+        action="store_true",
+        help="constrói o catálogo de eventos para a app de mapas (utils/vis.py)",
+    )
+    return ap.parse_args(argv)
+
+
 # entry point
 if __name__ == "__main__":
+    args = _parse_args()
+    if args.query:
+        sys.exit(run_query(args.ficheiro, args.query, args.saida))
+    if args.relatorio:
+        sys.exit(run_report(args.ficheiro, args.relatorio, args.preset))
+    if args.graficos:
+        sys.exit(
+            run_render(args.ficheiro, args.graficos, args.formatos, args.preset, args.zona)
+        )
+    if args.eventos:
+        sys.exit(run_build_events(args.ficheiro))
     main()
@@ -0,0 +1,196 @@
+# pyright: basic
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import bitmap, catalog, cube, parser, spatial  # noqa: F401 (regista as estruturas)
+
+"""Catalogos usados nos testes
+
+`dados.txt` e pequeno (21 eventos, todos com magnitude), pelo que a maior parte dos
+testes usa tambem um catalogo sintetico com as colunas do parser: eventos sem
+magnitudes, com magnitudes de varios tipos e com varias magnitudes do mesmo tipo,
+zonas em falta, leituras P/S/IAML e chegadas depois da meia-noite.
+
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILE = os.path.join(ROOT, "dados.txt")
+
+COLUMNS = [
+    "Estacao",
+    "Componente",
+    "Tipo Onda",
+    "Hora",
+    "Min",
+    "Seg",
+    "Amplitude",
+    "Data",
+    "Distancia",
+    "Tipo Evento",
+    "Latitude",
+    "Longitude",
+    "Profundidade",
+    "Estacoes",
+    "Magnitudes",
+    "Gap",
+    "Origin",
+    "Error_lat",
+    "Error_long",
+    "Error_depth",
+    "Cov_xy",
+    "Cov_xz",
+    "Cov_yz",
+    "ID",
+    "Sentido",
+    "Pub",
+    "Regiao",
+    "VZ",
+    "SZ",
+    "Onda",
+    "DIS",
+]
+
+STATIONS = ["PBOI", "PCND", "PMAN", "PSET", "PFAI", "PGRA", "PSJO", "PTOM"]
+PHASES = ["P", "S", "IAML", "P   4", "S   9", np.nan]
+SPEEDS = {"P": 6.0, "S": 3.5, "IAML": 3.5}
+
+
+def _pick(rng: np.random.Generator, values: list):
+    """Valor aleatorio de `values`, com o tipo original (str, ou NaN)"""
+    return values[rng.integers(len(values))]
+
+
+def _magnitudes(rng: np.random.Generator) -> list[dict[str, str]]:
+    """Magnitudes de um evento, no formato do parser (Gutenberg-Richter, b = 1)"""
+    ml = round(1.0 + rng.exponential(1 / np.log(10)), 1)
+    other = round(max(ml + rng.normal(0, 0.3), 0.5), 1)
+    p = rng.random()
+    if p < 0.1:
+        mags = []
+    elif p < 0.6:
+        mags = [("L", ml)]
+    elif p < 0.8:
+        mags = [("L", ml), ("C", other)]
+    elif p < 0.9:
+        mags = [("L", ml), ("L", other)]
+    else:
+        mags = [("C", other)]
+    return [{"Magnitude": f"{m:4.1f}", "Tipo": t} for t, m in mags]
+
+
+def make_catalog(events: int = 400, seed: int = 0) -> pd.DataFrame:
+    """Catalogo sintetico, com as colunas e os tipos do `parser.parse`
+
+    Args:
+        events (int): numero aproximado de eventos (default: 400)
+        seed (int): semente (default: 0)
+
+    Returns:
+        pd.DataFrame: uma linha por leitura, ordenada pela hora de origem
+    """
+    rng = np.random.default_rng(seed)
+    days = 2 * 365
+    # alguns eventos 5 s antes da meia-noite, com chegadas no dia seguinte
+    late = rng.choice(days, 6, replace=False) * 86400 + 86395
+    seconds = np.unique(
+        np.r_[rng.choice(days * 86400, events - len(late), replace=False), late]
+    )
+    start = pd.Timestamp("2014-01-01")
+
+    rows = []
+    for s in seconds:
+        origin = start + pd.Timedelta(int(s), "s") + pd.Timedelta(rng.integers(10) * 100, "ms")
+        header = {
+            "Data": origin,
+            "ID": int(origin.strftime("%Y%m%d%H%M%S")),
+            "Distancia": "Local",
+            "Tipo Evento": _pick(rng, ["Quake", "Quake", "Quake", "Volcanic"]),
+            "Latitude": round(rng.uniform(37.5, 39.5), 3),
+            "Longitude": round(rng.uniform(-29.5, -26.5), 3),
+            "Profundidade": np.nan if rng.random() < 0.05 else round(rng.uniform(0, 30), 1),
+            "Magnitudes": _magnitudes(rng),
+            "Gap": int(rng.integers(50, 350)),
+            "Origin": round(rng.uniform(0, 2), 2),
+            "Error_lat": round(rng.uniform(0, 10), 1),
+            "Error_long": round(rng.uniform(0, 10), 1),
+            "Error_depth": round(rng.uniform(0, 10), 1),
+            "Cov_xy": round(rng.normal(0, 20), 2),
+            "Cov_xz": round(rng.normal(0, 20), 2),
+            "Cov_yz": round(rng.normal(0, 20), 2),
+            "Sentido": "",
+            "Pub": _pick(rng, ["EPI", "NAO"]),
+            "Regiao": _pick(rng, ["Pico", "Faial", "Sao Jorge"]),
+            "VZ": _pick(rng, ["VZ14", "VZ15", np.nan]),
+            "SZ": _pick(rng, ["SZ06", "SZ07", "SZ13", np.nan]),
+            "Onda": [f"{origin:%Y-%m-%d-%H%M-%S}S_SWARM.SEI"],
+        }
+        picks = int(rng.integers(1, 6))
+        header["Estacoes"] = picks
+        for _ in range(picks):
+            phase = _pick(rng, PHASES)
+            dis = round(rng.uniform(1, 300), 2)
+            speed = SPEEDS.get(str(phase).split()[0], SPEEDS["P"])
+            arrival = origin + pd.Timedelta(round(dis / speed, 2), "s")
+            rows.append(
+                {
+                    **header,
+                    "Estacao": _pick(rng, STATIONS),
+                    "Componente": "EZ",
+                    "Tipo Onda": phase,
+                    "Hora": arrival.hour,
+                    "Min": arrival.minute,
+                    "Seg": round(arrival.second + arrival.microsecond / 1e6, 2),
+                    "Amplitude": round(10 ** rng.uniform(0, 4), 1)
+                    if phase == "IAML"
+                    else np.nan,
+                    "DIS": dis,
+                }
+            )
+
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df["Data"] = df["Data"].astype("datetime64[ns]")
+    return df
+
+
+def magnitude_lists(df: pd.DataFrame) -> dict[int, list[tuple[str, float]]]:
+    """Magnitudes de cada evento, lidas diretamente das listas do parser"""
+    events = df.drop_duplicates(subset="ID", keep="first")
+    return {
+        eid: [(m["Tipo"], float(m["Magnitude"])) for m in mags]
+        for eid, mags in zip(events["ID"], events["Magnitudes"])
+    }
+
+
+def max_magnitudes(df: pd.DataFrame, mag_type: str | None = None) -> pd.Series:
+    """Maior magnitude (do tipo `mag_type`) de cada evento, NaN se nao tiver"""
+    res = {
+        eid: max((m for t, m in mags if mag_type is None or t == mag_type), default=np.nan)
+        for eid, mags in magnitude_lists(df).items()
+    }
+    return pd.Series(res, dtype=float)
+
+
+@pytest.fixture(scope="session")
+def dados_raw() -> pd.DataFrame:
+    return parser.parse(DATA_FILE)
+
+
+@pytest.fixture(scope="session")
+def synthetic_raw() -> pd.DataFrame:
+    return make_catalog()
+
+
+@pytest.fixture
+def dados(dados_raw) -> pd.DataFrame:
+    """`dados.txt`, registado como um catalogo novo"""
+    return catalog.register(dados_raw.copy())
+
+
+@pytest.fixture
+def synthetic(synthetic_raw) -> pd.DataFrame:
+    """Catalogo sintetico, registado como um catalogo novo"""
+    return catalog.register(synthetic_raw.copy())
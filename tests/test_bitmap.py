@@ -0,0 +1,46 @@
+# pyright: basic
+
+import itertools
+
+import pytest
+
+from utils import bitmap
+
+CRITERIA = [
+    {"SZ": "SZ06"},
+    {"SZ": ["SZ06", "SZ07"], "Pub": "EPI"},
+    {"VZ": ["VZ14", "VZ15"], "Tipo Evento": "Volcanic"},
+    {"SZ": ["SZ13"], "VZ": "VZ15", "Pub": ["EPI", "NAO"], "Tipo Evento": ["Quake"]},
+    {"SZ": "SZ99"},
+    {"SZ": []},
+]
+
+
+@pytest.mark.parametrize("criteria", CRITERIA)
+def test_select_matches_masks(synthetic, criteria):
+    events = synthetic.drop_duplicates(subset="ID")
+    mask = True
+    for col, values in criteria.items():
+        mask &= events[col].isin([values] if isinstance(values, str) else values)
+
+    index = bitmap.get_index(synthetic)
+    assert list(index.select(criteria)) == list(events.loc[mask, "ID"])
+    assert index.count(criteria) == int(mask.sum())
+
+
+def test_every_value_is_indexed(synthetic):
+    events = synthetic.drop_duplicates(subset="ID")
+    index = bitmap.get_index(synthetic)
+    for col in bitmap.CATEGORICAL_COLS:
+        assert index.values(col) == sorted(events[col].dropna().unique())
+
+    # os bitsets de uma coluna sao disjuntos e cobrem os eventos com valor
+    for col in bitmap.CATEGORICAL_COLS:
+        sets = [set(index.select({col: v})) for v in index.values(col)]
+        assert sum(map(len, sets)) == events[col].notna().sum()
+        assert all(not a & b for a, b in itertools.combinations(sets, 2))
+
+
+def test_unindexed_column_raises(synthetic):
+    with pytest.raises(KeyError):
+        bitmap.get_index(synthetic).select({"Regiao": "Pico"})
@@ -0,0 +1,109 @@
+# pyright: basic
+
+import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils import catalog, crud, filters
+from utils.utils import event_magnitudes
+
+
+def test_subsets_share_the_structures_of_the_catalog(synthetic):
+    built = []
+
+    def _build(df):
+        built.append(len(df))
+        return object()
+
+    full = catalog.derived(synthetic, "teste", _build)
+    subset = synthetic.iloc[:10]
+    assert catalog.version(subset) == catalog.version(synthetic)
+    assert catalog.root(subset) is synthetic
+    assert catalog.derived(subset, "teste", _build) is full
+    assert built == [len(synthetic)]
+
+
+def test_unregistered_frames_are_not_cached():
+    df = pd.DataFrame({"ID": [1, 2]})
+    assert catalog.version(df) is None
+    assert catalog.derived(df, "teste", len) == 2
+
+
+def test_derived_is_built_once_across_threads(synthetic):
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def _build(df):
+        calls.append(1)
+        return len(df)
+
+    def _get(_):
+        barrier.wait()
+        return catalog.derived(synthetic, "teste", _build)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(_get, range(8)))
+    assert results == [len(synthetic)] * 8
+    assert len(calls) == 1
+
+
+def test_bump_gives_a_new_version(synthetic):
+    eid = synthetic["ID"].iloc[0]
+    old = catalog.version(synthetic)
+    new = crud.delete_event(synthetic, eid)
+    assert catalog.version(new) != old
+    assert catalog.root(new) is new
+    assert eid not in event_magnitudes(new)["ID"].to_numpy()
+
+
+def test_in_place_update_invalidates_filters(synthetic):
+    before = filters.filter_by_gap(synthetic, 250)
+    row = before.index[0]
+    old = catalog.version(synthetic)
+
+    crud.update_table_row(synthetic, row, {"Gap": 999})
+
+    assert catalog.version(synthetic) != old
+    after = filters.filter_by_gap(synthetic, 250)
+    expected = synthetic[synthetic["Gap"] <= 250]
+    assert row not in after.index
+    pd.testing.assert_index_equal(after.index, expected.index)
+
+
+def test_in_place_update_invalidates_magnitudes(synthetic):
+    rows = synthetic.index[synthetic["ID"] == synthetic["ID"].iloc[0]]
+    eid = synthetic.loc[rows[0], "ID"]
+    event_magnitudes(synthetic)
+
+    for row in rows:
+        crud.update_table_row(
+            synthetic, row, {"Magnitudes": [{"Magnitude": " 9.9", "Tipo": "L"}]}
+        )
+
+    mags = event_magnitudes(synthetic)
+    assert mags.loc[mags["ID"] == eid, "Magnitude"].tolist() == [9.9]
+
+
+def test_root_survives_while_subsets_are_used(synthetic):
+    db = crud.delete_event(synthetic, synthetic["ID"].iloc[0])
+    subset = filters.filter_by_gap(db, 250)
+    version = catalog.version(db)
+    del db
+    gc.collect()
+
+    assert catalog.version(subset) == version
+    assert catalog.root(subset) is not None
+
+
+def test_collected_catalogs_are_forgotten(synthetic_raw):
+    old = catalog.register(synthetic_raw.copy())
+    version = catalog.version(old)
+    event_magnitudes(old)
+    catalog.register(synthetic_raw.copy())
+    del old
+    gc.collect()
+
+    assert version not in catalog._roots
+    assert not [k for k in catalog._derived if k[0] == version]
@@ -0,0 +1,91 @@
+# pyright: basic
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import max_magnitudes
+from utils import catalog, crud, cube
+from utils.utils import MAG_COLUMN
+
+
+def _events(df: pd.DataFrame) -> pd.DataFrame:
+    """Tabela por evento com as dimensoes do cubo, calculada diretamente"""
+    events = df.drop_duplicates(subset="ID", keep="first")
+    return pd.DataFrame(
+        {
+            "Mes": events["Data"].dt.to_period("M").map(lambda p: p.ordinal).to_numpy(),
+            "SZ": events["SZ"].fillna(cube.NO_ZONE).to_numpy(),
+            "VZ": events["VZ"].fillna(cube.NO_ZONE).to_numpy(),
+            "Tipo Evento": events["Tipo Evento"].fillna(cube.NO_ZONE).to_numpy(),
+            "Profundidade": events["Profundidade"].to_numpy(),
+            MAG_COLUMN: events["ID"].map(max_magnitudes(df)).to_numpy(),
+        }
+    )
+
+
+@pytest.mark.parametrize("by", [["Mes"], ["SZ"], ["VZ", "Tipo Evento"], cube.CUBE_DIMS])
+@pytest.mark.parametrize("column", ["Profundidade", MAG_COLUMN])
+def test_rollup_matches_groupby(synthetic, by, column):
+    res = cube.get_cube(synthetic).rollup(column, by)
+    grouped = _events(synthetic).groupby(by, sort=True)
+    expected = pd.DataFrame(
+        {
+            "Count": grouped.size(),
+            "Mean": grouped[column].mean(),
+            "Std": grouped[column].std(),
+            "Min": grouped[column].min(),
+            "Max": grouped[column].max(),
+        }
+    )
+    pd.testing.assert_frame_equal(res, expected, check_names=False, check_dtype=False)
+
+
+def test_rollup_with_restrictions(synthetic):
+    where = {"SZ": {"SZ06", "SZ13"}, "Tipo Evento": {"Quake"}}
+    res = cube.get_cube(synthetic).rollup(None, ["VZ"], where)
+    events = _events(synthetic)
+    events = events[events["SZ"].isin(where["SZ"]) & (events["Tipo Evento"] == "Quake")]
+    expected = events.groupby("VZ").size()
+    np.testing.assert_array_equal(res["Count"], expected)
+    np.testing.assert_array_equal(res.index, expected.index)
+
+
+def _assert_same_cube(a: cube.RollupCube, b: cube.RollupCube) -> None:
+    pd.testing.assert_frame_equal(a.events.sort_index(), b.events.sort_index(), check_dtype=False)
+    cols = sorted(b.cells.columns)
+    pd.testing.assert_frame_equal(a.cells[cols], b.cells[cols], check_dtype=False, atol=1e-9)
+
+
+def test_update_after_delete_matches_rebuild(synthetic):
+    cube.get_cube(synthetic)
+    new = crud.delete_event(synthetic, synthetic["ID"].iloc[10])
+    _assert_same_cube(cube.get_cube(new), cube.RollupCube.from_catalog(new))
+
+
+def test_update_after_row_change_matches_rebuild(synthetic):
+    cube.get_cube(synthetic)
+    eid = synthetic["ID"].iloc[20]
+    rows = synthetic.index[synthetic["ID"] == eid]
+    for row in rows:
+        crud.update_table_row(
+            synthetic,
+            row,
+            {
+                "SZ": "SZ99",
+                "Profundidade": 42.0,
+                "Magnitudes": [{"Magnitude": " 4.2", "Tipo": "C"}],
+            },
+        )
+    updated = cube.get_cube(synthetic)
+    assert "SZ99" in updated.cells.index.get_level_values("SZ")
+    _assert_same_cube(updated, cube.RollupCube.from_catalog(synthetic))
+
+
+def test_update_after_row_insert_matches_rebuild(synthetic):
+    cube.get_cube(synthetic)
+    eid = synthetic["ID"].iloc[30]
+    first = synthetic.index[synthetic["ID"] == eid][0]
+    new = crud.create_table_row(synthetic, eid, first + 1)
+    assert catalog.version(new) != catalog.version(synthetic)
+    _assert_same_cube(cube.get_cube(new), cube.RollupCube.from_catalog(new))
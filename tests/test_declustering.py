@@ -0,0 +1,188 @@
+# pyright: basic
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import make_catalog, max_magnitudes
+from utils import catalog, declustering, spatial
+
+
+def _events(df: pd.DataFrame):
+    events = df.drop_duplicates(subset="ID").sort_values("Data", kind="stable")
+    days = ((events["Data"] - events["Data"].min()).dt.total_seconds() / 86400).to_numpy()
+    mags = events["ID"].map(max_magnitudes(df)).to_numpy(dtype=float)
+    lats = events["Latitude"].to_numpy(dtype=float)
+    lons = events["Longitude"].to_numpy(dtype=float)
+    return events["ID"].to_numpy(), days, mags, lats, lons
+
+
+def _distance(lats, lons, i, j) -> float:
+    return spatial.haversine(lats[i], lons[i], np.array([lats[j]]), np.array([lons[j]]))[0]
+
+
+def _brute_gk(df: pd.DataFrame, ratio: float) -> np.ndarray:
+    """Gardner & Knopoff comparando todos os pares de eventos"""
+    ids, days, mags, lats, lons = _events(df)
+    clusters = np.zeros(len(ids), dtype=int)
+    nextId = 1
+    for i in np.argsort(-mags, kind="stable"):
+        if math.isnan(mags[i]):
+            break
+        if clusters[i]:
+            continue
+        dist, window = declustering.gk_windows(np.array([mags[i]]))
+        members = [
+            j
+            for j in range(len(ids))
+            if clusters[j] == 0
+            and days[i] - ratio * window[0] <= days[j] <= days[i] + window[0]
+            and _distance(lats, lons, i, j) <= dist[0]
+        ]
+        if len(members) > 1:
+            clusters[members] = nextId
+            nextId += 1
+    return clusters
+
+
+def _brute_reasenberg(df: pd.DataFrame) -> np.ndarray:
+    """Ligacao de Reasenberg comparando cada evento com todos os seguintes"""
+    ids, days, mags, lats, lons = _events(df)
+    n = len(ids)
+    group = list(range(n))
+    mags = np.nan_to_num(mags, nan=-np.inf)
+    crack = declustering.crack_radius(np.where(np.isinf(mags), np.nan, mags))
+
+    def members(g):
+        return [k for k in range(n) if group[k] == g]
+
+    for i in range(n):
+        cluster = members(group[i])
+        big = max(cluster, key=lambda k: (mags[k], -k))
+        if len(cluster) > 1:
+            dm = (1 - declustering.XK) * mags[big] - declustering.XMEFF
+            lnP = -math.log(1 - declustering.P_NEXT)
+            with np.errstate(over="ignore", invalid="ignore"):
+                tau = lnP * (days[i] - days[big]) / 10 ** (2 * (dm - 1) / 3)
+            if np.isnan(tau):
+                tau = declustering.TAU_MAX
+            tau = min(max(tau, declustering.TAU_MIN), declustering.TAU_MAX)
+        else:
+            tau = declustering.TAU_MIN
+        reach = declustering.RFACT * crack[big]
+        for j in range(i + 1, n):
+            if days[j] > days[i] + tau:
+                break
+            if _distance(lats, lons, i, j) <= reach + crack[j] and group[j] != group[i]:
+                old = group[j]
+                for k in members(old):
+                    group[k] = group[i]
+
+    sizes = pd.Series(group).value_counts()
+    return np.array([g if sizes[g] > 1 else -1 for g in group])
+
+
+def _dense_catalog(spread: float = 0.08, speedup: int = 1) -> pd.DataFrame:
+    """Catalogo com sequencias de replicas: eventos numa area mais pequena e, com
+    `speedup`, mais proximos no tempo"""
+    df = make_catalog(events=300, seed=5)
+    rng = np.random.default_rng(5)
+    ids = df["ID"].unique()
+    lat = dict(zip(ids, np.round(38.5 + rng.normal(0, spread, len(ids)), 4)))
+    lon = dict(zip(ids, np.round(-28 + rng.normal(0, spread, len(ids)), 4)))
+    start = df["Data"].min()
+    return df.assign(
+        Data=start + (df["Data"] - start) / speedup,
+        Latitude=df["ID"].map(lat),
+        Longitude=df["ID"].map(lon),
+    )
+
+
+CATALOGS = {
+    "dense": lambda: _dense_catalog(),
+    # enxame: ligacoes de Reasenberg (raios de rutura de centenas de metros)
+    "swarm": lambda: _dense_catalog(0.02, 5),
+}
+
+
+@pytest.fixture(scope="module", params=["synthetic", *CATALOGS])
+def events(request, synthetic_raw):
+    df = synthetic_raw if request.param == "synthetic" else CATALOGS[request.param]()
+    return catalog.register(df.copy())
+
+
+def _same_partition(a: np.ndarray, b: np.ndarray) -> None:
+    """Os clusters tem de ser os mesmos, a menos da numeracao"""
+    np.testing.assert_array_equal(a > 0, b >= 0)
+    clustered = a > 0
+    pairs = set(zip(a[clustered], b[clustered]))
+    assert len(pairs) == len(set(a[clustered])) == len(set(b[clustered]))
+
+
+@pytest.mark.parametrize("ratio", [1.0, 0.5])
+def test_gk_matches_all_pairs(events, ratio):
+    res = declustering.decluster(events, "gk", ratio)
+    ids, *_ = _events(events)
+    assert list(res.index) == list(ids)
+    expected = _brute_gk(events, ratio)
+    np.testing.assert_array_equal(res[declustering.CLUSTER_COL], expected)
+
+
+def test_reasenberg_matches_all_pairs(events):
+    res = declustering.decluster(events, "reasenberg")
+    _same_partition(res[declustering.CLUSTER_COL].to_numpy(), _brute_reasenberg(events))
+
+
+@pytest.mark.parametrize("method", declustering.METHODS)
+def test_spatial_index_gives_the_same_clusters(events, method, monkeypatch):
+    expected = declustering.decluster(events, method)
+    monkeypatch.setattr(declustering, "SPATIAL_MIN", 0)
+    pd.testing.assert_frame_equal(declustering.decluster(events, method), expected)
+
+
+@pytest.mark.parametrize("method", declustering.METHODS)
+def test_mainshocks(events, method):
+    res = declustering.decluster(events, method)
+    ids, days, mags, *_ = _events(events)
+    mags = pd.Series(np.nan_to_num(mags, nan=-np.inf), index=ids)
+    clusters = res[declustering.CLUSTER_COL]
+
+    assert res.loc[clusters == 0, "Principal"].all()
+    for c in set(clusters) - {0}:
+        members = clusters.index[clusters == c]
+        main = members[res.loc[members, "Principal"].to_numpy()]
+        assert len(main) == 1
+        # o maior evento do cluster, o primeiro em caso de empate
+        assert main[0] == mags[members].idxmax()
+
+    np.testing.assert_array_equal(
+        np.sort(declustering.mainshock_ids(events, method)), np.sort(res.index[res["Principal"]])
+    )
+
+
+def test_clusters_are_cached_per_version(synthetic):
+    res = declustering.get_clusters(synthetic)
+    assert declustering.get_clusters(synthetic.iloc[:50]) is res
+    with pytest.raises(ValueError):
+        declustering.get_clusters(synthetic, "kmeans")
+    with pytest.raises(ValueError):
+        declustering.decluster(synthetic, "kmeans")
+
+
+def test_cluster_stats_on_a_subset(events):
+    subset = events[events["Data"] < "2015-01-01"]
+    res = declustering.cluster_stats(subset)
+    clusters = declustering.get_clusters(events)
+
+    with_cluster = declustering.add_clusters(subset.drop_duplicates(subset="ID"))
+    with_cluster = with_cluster[with_cluster[declustering.CLUSTER_COL] > 0]
+    g = with_cluster.groupby(declustering.CLUSTER_COL)
+    np.testing.assert_array_equal(res.index, sorted(g.groups))
+    np.testing.assert_array_equal(res["N"], g.size())
+    np.testing.assert_array_equal(res["Inicio"], g["Data"].min())
+    np.testing.assert_allclose(res["Profundidade"], g["Profundidade"].mean())
+    for c, main in res["Principal"].items():
+        assert clusters.loc[main, declustering.CLUSTER_COL] == c
+        assert clusters.loc[main, "Principal"]
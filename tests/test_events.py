@@ -0,0 +1,86 @@
+# pyright: basic
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import DATA_FILE, max_magnitudes
+from utils import events, parser
+
+
+@pytest.fixture
+def source(tmp_path):
+    src = tmp_path / "dados.txt"
+    shutil.copy(DATA_FILE, src)
+    return str(src)
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Conta as chamadas ao parser"""
+    calls = []
+    parse = parser.parse
+
+    def _parse(path):
+        calls.append(path)
+        return parse(path)
+
+    monkeypatch.setattr(parser, "parse", _parse)
+    return calls
+
+
+def test_event_table(synthetic):
+    res = events.event_table(synthetic)
+    first = synthetic.drop_duplicates(subset="ID")
+    assert list(res.columns) == events.EVENT_COLS + ["Magnitude"]
+    np.testing.assert_array_equal(res["ID"], first["ID"])
+    pd.testing.assert_frame_equal(
+        res[events.EVENT_COLS], first[events.EVENT_COLS].reset_index(drop=True)
+    )
+    np.testing.assert_array_equal(res["Magnitude"], first["ID"].map(max_magnitudes(synthetic)))
+
+
+def test_load_reuses_the_saved_catalog(source, parses, tmp_path):
+    dest = str(tmp_path / "cache" / "eventos.pkl")
+    built = events.load(source, dest)
+    assert os.path.exists(dest) and len(parses) == 1
+
+    pd.testing.assert_frame_equal(events.load(source, dest), built)
+    assert len(parses) == 1
+
+
+def test_load_rebuilds_when_the_source_changes(source, parses, tmp_path):
+    dest = str(tmp_path / "eventos.pkl")
+    events.build(source, dest)
+
+    # outro ficheiro com o mesmo conteudo
+    other = str(tmp_path / "outro.txt")
+    shutil.copy(source, other)
+    os.utime(other, ns=(os.stat(source).st_atime_ns, os.stat(source).st_mtime_ns))
+    events.load(other, dest)
+    assert len(parses) == 2
+
+    # o mesmo ficheiro, alterado
+    with open(other, "a") as f:
+        f.write("\n")
+    events.load(other, dest)
+    assert len(parses) == 3
+
+
+def test_load_rebuilds_other_schema_versions(source, parses, tmp_path, monkeypatch):
+    dest = str(tmp_path / "eventos.pkl")
+    events.build(source, dest)
+    monkeypatch.setattr(events, "SCHEMA_VERSION", events.SCHEMA_VERSION + 1)
+    events.load(source, dest)
+    assert len(parses) == 2
+    assert pd.read_pickle(dest)["fonte"][0] == events.SCHEMA_VERSION
+
+
+def test_load_rebuilds_corrupt_files(source, parses, tmp_path):
+    dest = tmp_path / "eventos.pkl"
+    dest.write_bytes(b"")
+    res = events.load(source, str(dest))
+    assert len(parses) == 1 and len(res) == res["ID"].nunique()
@@ -0,0 +1,162 @@
+# pyright: basic
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import magnitude_lists, max_magnitudes
+from utils import catalog, filters
+
+
+def _same_rows(result: pd.DataFrame, expected: pd.DataFrame) -> None:
+    pd.testing.assert_index_equal(result.index, expected.index)
+
+
+@pytest.mark.parametrize(
+    "start,end",
+    [
+        ("2014-03-01", "2014-06-30"),
+        ("2014-03-01 12:00", "2014-03-02 11:59:59"),
+        ("2013-01-01", "2013-12-31"),
+        ("2010-01-01", "2020-01-01"),
+    ],
+)
+def test_date_matches_mask(synthetic, start, end):
+    mask = (synthetic["Data"] >= pd.Timestamp(start)) & (
+        synthetic["Data"] <= pd.Timestamp(end)
+    )
+    _same_rows(filters.filter_by_date(synthetic, start, end), synthetic[mask])
+
+
+def test_date_on_unsorted_catalog(synthetic_raw):
+    df = catalog.register(synthetic_raw.sample(frac=1, random_state=1))
+    mask = (df["Data"] >= "2014-03-01") & (df["Data"] <= "2014-06-30")
+    _same_rows(filters.filter_by_date(df, "2014-03-01", "2014-06-30"), df[mask])
+
+
+def test_last_window(synthetic):
+    ref = pd.Timestamp("2015-02-10 12:00")
+    res = filters.filter_by_last(synthetic, "last 7 days", ref)
+    mask = (synthetic["Data"] >= ref - pd.Timedelta(7, "D")) & (synthetic["Data"] <= ref)
+    _same_rows(res, synthetic[mask])
+
+
+@pytest.mark.parametrize(
+    "window,offset",
+    [("7d", pd.DateOffset(days=7)), ("24h", pd.DateOffset(hours=24)),
+     ("ultimos 2 meses", pd.DateOffset(months=2)), ("1 ano", pd.DateOffset(years=1))],
+)
+def test_parse_window(window, offset):
+    assert filters.parse_window(window) == offset
+
+
+def test_parse_window_rejects_unknown_units():
+    with pytest.raises(ValueError):
+        filters.parse_window("3 luas")
+
+
+@pytest.mark.parametrize("mag_type", ["L", "C"])
+@pytest.mark.parametrize("mode", ["max", "type", "any"])
+def test_magnitude_matches_lists(synthetic, mode, mag_type):
+    lo, hi = 1.5, 2.5
+    lists = magnitude_lists(synthetic)
+    if mode == "max":
+        mx = max_magnitudes(synthetic, mag_type)
+        ids = mx.index[(mx >= lo) & (mx <= hi)]
+    else:
+        ids = [
+            eid
+            for eid, mags in lists.items()
+            if any(lo <= m <= hi for t, m in mags if mode == "any" or t == mag_type)
+        ]
+
+    res = filters.filter_by_magnitude(synthetic, lo, hi, mag_type, mode)
+    _same_rows(res, synthetic[synthetic["ID"].isin(ids)])
+
+
+def test_magnitude_rejects_unknown_mode(synthetic):
+    with pytest.raises(ValueError):
+        filters.filter_by_magnitude(synthetic, 1, 2, "L", "media")
+
+
+def test_numeric_filters_match_masks(synthetic):
+    df = synthetic
+    _same_rows(filters.filter_by_gap(df, 180), df[df["Gap"] <= 180])
+    _same_rows(
+        filters.filter_by_depth(df, 5, 15),
+        df[(df["Profundidade"] >= 5) & (df["Profundidade"] <= 15)],
+    )
+    _same_rows(
+        filters.filter_by_range(df, "Latitude", 38, 38.5),
+        df[(df["Latitude"] >= 38) & (df["Latitude"] <= 38.5)],
+    )
+
+
+def test_categorical_filters_match_masks(synthetic):
+    df = synthetic
+    _same_rows(filters.filter_by_quality(df, "EPI"), df[df["Pub"] == "EPI"])
+    _same_rows(
+        filters.filter_by_zone(df, "SZ", ["SZ06", "SZ13"]),
+        df[df["SZ"].isin(["SZ06", "SZ13"])],
+    )
+    # `Regiao` nao tem indice bitmap
+    _same_rows(filters.filter_by_zone(df, "Regiao", "Pico"), df[df["Regiao"] == "Pico"])
+
+    criteria = {"SZ": ["SZ06", "SZ07"], "VZ": "VZ14", "Tipo Evento": "Quake", "Regiao": ["Faial"]}
+    mask = (
+        df["SZ"].isin(["SZ06", "SZ07"])
+        & (df["VZ"] == "VZ14")
+        & (df["Tipo Evento"] == "Quake")
+        & (df["Regiao"] == "Faial")
+    )
+    _same_rows(filters.filter_by_categories(df, criteria), df[mask])
+
+
+def test_chained_filters_are_cached_in_any_order(synthetic):
+    filters._cache.clear()
+    a = filters.filter_by_zone(filters.filter_by_gap(synthetic, 200), "SZ", "SZ06")
+    misses = filters._cache.misses
+    b = filters.filter_by_gap(filters.filter_by_zone(synthetic, "SZ", "SZ06"), 200)
+
+    _same_rows(a, b)
+    _same_rows(a, synthetic[(synthetic["Gap"] <= 200) & (synthetic["SZ"] == "SZ06")])
+    # o primeiro filtro da segunda cadeia e novo, o segundo ja estava na cache
+    assert filters._cache.misses == misses + 1
+    assert filters._cache.hits >= 1
+    assert filters.applied_filters(a) == filters.applied_filters(b)
+
+
+def test_cached_result_is_a_subset_of_the_catalog(synthetic):
+    first = filters.filter_by_gap(synthetic, 150)
+    hits = filters._cache.hits
+    second = filters.filter_by_gap(synthetic, 150)
+    assert filters._cache.hits == hits + 1
+    pd.testing.assert_frame_equal(first, second)
+    assert catalog.root(second) is synthetic
+
+
+def test_unregistered_frames_are_filtered_without_cache(synthetic_raw):
+    df = synthetic_raw.copy()
+    df.attrs = {}
+    res = filters.filter_by_gap(df, 200)
+    _same_rows(res, df[df["Gap"] <= 200])
+    assert filters.FILTERS_ATTR not in res.attrs
+
+
+def test_normalize_chain_keeps_order_around_nearest():
+    gap = ("filter_by_gap", (200,))
+    zone = ("filter_by_zone", ("SZ", "SZ06"))
+    near = ("filter_by_nearest", (38.0, -28.0, 5))
+    assert filters.normalize_chain((zone, gap, gap)) == filters.normalize_chain((gap, zone))
+    assert filters.normalize_chain((gap, near, zone)) != filters.normalize_chain(
+        (zone, near, gap)
+    )
+
+
+def test_cache_respects_memory_limit():
+    cache = filters.FilterCache(max_bytes=1000)
+    for i in range(10):
+        cache.put((i,), np.arange(50))
+    assert cache.nbytes <= 1000
+    assert cache.get((0,)) is None
+    assert cache.get((9,)) is not None
@@ -0,0 +1,142 @@
+# pyright: basic
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import max_magnitudes
+from utils import gutenberg
+
+
+def _gr_sample(n: int = 3000, b: float = 1.0, mc: float = 1.5, seed: int = 0) -> np.ndarray:
+    """Magnitudes de Gutenberg-Richter, com a completude a diminuir abaixo de `mc`"""
+    rng = np.random.default_rng(seed)
+    mags = mc - 0.6 + rng.exponential(1 / (b * math.log(10)), n)
+    keep = rng.random(n) < np.clip((mags - mc + 0.6) / 0.6, 0, 1)
+    return np.round(mags[keep], 1)
+
+
+def _counts(mags: np.ndarray, bin_width: float = gutenberg.MAG_BIN):
+    codes = np.round(mags / bin_width).astype(int)
+    centers = np.round(np.arange(codes.min(), codes.max() + 1) * bin_width, 10)
+    counts = np.array([(codes == c).sum() for c in range(codes.min(), codes.max() + 1)])
+    return counts, centers
+
+
+def _aki(mags: np.ndarray, mc: float, bin_width: float = gutenberg.MAG_BIN) -> dict:
+    above = mags[mags >= mc - 1e-9]
+    b = math.log10(math.e) / (above.mean() - (mc - bin_width / 2))
+    std = 2.3 * b**2 * np.sqrt(((above - above.mean()) ** 2).sum() / (len(above) * (len(above) - 1)))
+    return {"N": len(above), "Mc": mc, "b": b, "b_std": std, "a": math.log10(len(above)) + b * mc}
+
+
+def _gof_mc(mags: np.ndarray, min_events: int) -> float:
+    """Mc pelo metodo `gof`, calculada classe a classe"""
+    counts, centers = _counts(mags)
+    ncum = counts[::-1].cumsum()[::-1]
+    r = np.full(len(centers), -np.inf)
+    for k, mc in enumerate(centers):
+        if ncum[k] < min_events:
+            continue
+        fit = _aki(mags, mc)
+        syn = 10 ** (fit["a"] - fit["b"] * centers[k:])
+        r[k] = 100 - 100 * np.abs(ncum[k:] - syn).sum() / ncum[k:].sum()
+    for level in gutenberg.GOF_LEVELS:
+        if (r >= level).any():
+            return centers[np.argmax(r >= level)]
+    return centers[np.argmax(r)]
+
+
+def test_fmd_matches_histogram():
+    mags = _gr_sample()
+    res = gutenberg.fmd(mags)
+    counts, centers = _counts(mags)
+    np.testing.assert_allclose(res.index, centers)
+    np.testing.assert_array_equal(res["N"], counts)
+    np.testing.assert_array_equal(res["Ncum"], [(mags >= c - 1e-9).sum() for c in centers])
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_b_value_maxc(seed):
+    mags = _gr_sample(seed=seed)
+    counts, centers = _counts(mags)
+    mc = round(centers[counts.argmax()] + gutenberg.MAXC_CORRECTION, 10)
+    res = gutenberg.b_value(mags, "maxc")
+    expected = _aki(mags, mc)
+    for key, value in expected.items():
+        assert res[key] == pytest.approx(value, rel=1e-9), key
+    assert 0.8 < res["b"] < 1.2
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_b_value_gof(seed):
+    mags = _gr_sample(seed=seed)
+    res = gutenberg.b_value(mags, "gof")
+    mc = _gof_mc(mags, gutenberg.MIN_EVENTS)
+    assert res["Mc"] == pytest.approx(mc)
+    assert res["b"] == pytest.approx(_aki(mags, mc)["b"], rel=1e-9)
+
+
+def test_b_value_edge_cases():
+    # Mc (maxc) fica limitada a maior classe com eventos
+    res = gutenberg.b_value(np.array([1.0, 1.1, 1.2]), min_events=10)
+    assert res["N"] == 1
+    assert all(math.isnan(res[k]) for k in ("Mc", "b", "b_std", "a"))
+
+    res = gutenberg.b_value(np.array([]))
+    assert res["N"] == 0 and math.isnan(res["b"])
+
+    with pytest.raises(ValueError):
+        gutenberg.b_value(_gr_sample(), "mbs")
+
+
+def test_magnitudes_per_event(synthetic):
+    pd.testing.assert_series_equal(
+        gutenberg.magnitudes(synthetic, None).sort_index(),
+        max_magnitudes(synthetic).dropna().sort_index(),
+        check_names=False,
+    )
+
+
+@pytest.mark.parametrize("by", ["month", "SZ"])
+@pytest.mark.parametrize("method", gutenberg.MC_METHODS)
+def test_gr_table_matches_b_value(synthetic, by, method):
+    res = gutenberg.gr_table(synthetic, by, None, method, min_events=5)
+    mags = gutenberg.magnitudes(synthetic, None)
+    events = synthetic.drop_duplicates(subset="ID").set_index("ID").loc[mags.index]
+    keys = events["Data"].dt.to_period("M") if by == "month" else events[by]
+
+    assert list(res.index) == sorted(keys.dropna().unique())
+    for key, row in res.iterrows():
+        expected = gutenberg.b_value(mags[(keys == key).to_numpy()].to_numpy(), method, min_events=5)
+        for col in gutenberg.GR_COLUMNS:
+            if math.isnan(expected[col]):
+                assert math.isnan(row[col]), (key, col)
+            else:
+                assert row[col] == pytest.approx(expected[col], rel=1e-9), (key, col)
+
+
+def test_bootstrap_is_reproducible():
+    mags = _gr_sample(1500)
+    a = gutenberg.bootstrap(mags, 600, seed=7, workers=1)
+    b = gutenberg.bootstrap(mags, 600, seed=7, workers=2)
+    pd.testing.assert_frame_equal(a, b)
+    assert len(a) == 600
+    assert not a.equals(gutenberg.bootstrap(mags, 600, seed=8, workers=1))
+
+    # o intervalo contem a estimativa da amostra original
+    b0 = gutenberg.b_value(mags)["b"]
+    low, high = np.nanpercentile(a["b"], gutenberg.BOOT_CI)
+    assert low < b0 < high
+
+
+def test_gr_table_bootstrap(synthetic):
+    a = gutenberg.gr_table(synthetic, "SZ", None, samples=200, seed=3, min_events=5, workers=1)
+    b = gutenberg.gr_table(synthetic, "SZ", None, samples=200, seed=3, min_events=5, workers=2)
+    pd.testing.assert_frame_equal(a, b)
+    fitted = a["b"].notna()
+    assert fitted.any()
+    assert (a.loc[fitted, "b_low"] <= a.loc[fitted, "b_high"]).all()
+    assert a.loc[~fitted, "b_low"].isna().all()
@@ -0,0 +1,113 @@
+# pyright: basic
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import magnitude
+
+BIASES = {"PBOI": 0.3, "PCND": -0.2, "PMAN": 0.0, "PSET": 0.1, "PFAI": -0.4}
+
+
+def _picks_catalog(events: int = 60, noise: float = 0.0, seed: int = 0) -> pd.DataFrame:
+    """Leituras IAML cujas amplitudes dao exatamente `M + vies da estacao`"""
+    rng = np.random.default_rng(seed)
+    a, b, c = magnitude.LAWS[magnitude.DEFAULT_LAW]
+    rows = []
+    for i in range(events):
+        mag = round(rng.uniform(1, 4), 1)
+        depth = round(rng.uniform(0, 20), 1)
+        for station, bias in BIASES.items():
+            dis = rng.uniform(5, 200)
+            r = np.hypot(dis, depth)
+            ml = mag + bias + rng.normal(0, noise)
+            rows.append(
+                {
+                    "ID": 1000 + i,
+                    "Data": pd.Timestamp("2020-01-01") + pd.Timedelta(i, "h"),
+                    "Estacao": station,
+                    "Componente": "EN",
+                    "Tipo Onda": "IAML",
+                    "Amplitude": 10 ** (ml - a * np.log10(r) - b * r - c),
+                    "DIS": dis,
+                    "Profundidade": depth,
+                    "Magnitudes": [
+                        {"Magnitude": f"{mag:4.1f}", "Tipo": "L"},
+                        {"Magnitude": f"{mag + 0.5:4.1f}", "Tipo": "L"},
+                    ],
+                }
+            )
+        # leituras que nao contam: outra fase, amplitude nula
+        rows.append({**rows[-1], "Tipo Onda": "P", "Amplitude": np.nan})
+        rows.append({**rows[-1], "Tipo Onda": "IAML", "Amplitude": 0.0})
+    return pd.DataFrame(rows)
+
+
+def test_attenuation():
+    assert magnitude.attenuation("iaspei") == magnitude.LAWS["iaspei"]
+    assert magnitude.attenuation((1, 0, -2)) == (1.0, 0.0, -2.0)
+    with pytest.raises(ValueError):
+        magnitude.attenuation("richter")
+
+
+def test_station_magnitudes(synthetic):
+    res = magnitude.station_magnitudes(synthetic)
+    iaml = synthetic[
+        (synthetic["Tipo Onda"] == "IAML") & (synthetic["Amplitude"] > 0)
+    ]
+    a, b, c = magnitude.LAWS["iaspei"]
+    r = np.hypot(iaml["DIS"], iaml["Profundidade"].fillna(0))
+    np.testing.assert_array_equal(res["ID"], iaml["ID"])
+    np.testing.assert_allclose(res["Distancia"], r)
+    np.testing.assert_allclose(
+        res["ML"], np.log10(iaml["Amplitude"]) + a * np.log10(r) + b * r + c
+    )
+
+    corrections = pd.Series({"PBOI": 0.5})
+    corrected = magnitude.station_magnitudes(synthetic, corrections=corrections)
+    np.testing.assert_allclose(
+        corrected["ML"] - res["ML"], np.where(res["Estacao"] == "PBOI", 0.5, 0.0)
+    )
+
+
+def test_event_ml_matches_groupby():
+    picks = magnitude.station_magnitudes(_picks_catalog(noise=0.2))
+    res = magnitude.event_ml(picks)
+    grouped = picks.groupby("ID")["ML"]
+    median = grouped.median()
+    mad = (picks["ML"] - picks["ID"].map(median)).abs().groupby(picks["ID"]).median()
+    np.testing.assert_allclose(res["ML"], median)
+    np.testing.assert_allclose(res["MAD"], mad)
+    np.testing.assert_array_equal(res["N"], grouped.size())
+
+
+def test_remagnitude_recovers_catalog_magnitudes():
+    df = _picks_catalog()
+    res = magnitude.remagnitude(df)
+    # sem correcoes, a ML e a magnitude + a mediana dos vieses (0.0)
+    np.testing.assert_allclose(res["ML"], res["Catalogo"], atol=1e-9)
+    np.testing.assert_array_equal(res["N"], len(BIASES))
+    # o catalogo e a primeira magnitude L
+    first = df.drop_duplicates(subset="ID").set_index("ID")["Magnitudes"]
+    np.testing.assert_allclose(res["Catalogo"], first.map(lambda m: float(m[0]["Magnitude"])))
+
+
+def test_station_corrections():
+    df = _picks_catalog()
+    bias = pd.Series(BIASES)
+
+    ref = magnitude.station_corrections(df, reference="L")
+    np.testing.assert_allclose(ref[bias.index], -bias, atol=1e-9)
+
+    network = magnitude.station_corrections(df)
+    np.testing.assert_allclose(network[bias.index], bias.median() - bias, atol=1e-9)
+
+    table = magnitude.residuals(df, corrections=ref)
+    np.testing.assert_allclose(table["Mean"], 0, atol=1e-9)
+    np.testing.assert_allclose(table["Correcao"], ref[table.index])
+    np.testing.assert_allclose(magnitude.residuals(df)["Median"], (bias - bias.median())[table.index])
+
+
+def test_stations_with_few_picks_are_not_corrected():
+    df = _picks_catalog(events=2)
+    assert (magnitude.station_corrections(df, reference="L") == 0).all()
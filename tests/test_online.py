@@ -0,0 +1,101 @@
+# pyright: basic
+
+import math
+
+import numpy as np
+import pytest
+
+from utils import online, stats
+from utils.utils import MAG_COLUMN
+
+
+def test_running_moments_match_numpy():
+    rng = np.random.default_rng(1)
+    x = rng.normal(10, 3, 1000)
+    m = online.RunningMoments()
+    for v in x:
+        m.update(v)
+    assert m.count == len(x)
+    assert m.mean == pytest.approx(x.mean(), rel=1e-12)
+    assert m.variance() == pytest.approx(x.var(), rel=1e-10)
+    assert m.std(ddof=1) == pytest.approx(x.std(ddof=1), rel=1e-10)
+    assert (m.min, m.max) == (x.min(), x.max())
+
+
+def test_running_moments_merge():
+    rng = np.random.default_rng(2)
+    x = rng.exponential(2, 500)
+    a, b, whole = online.RunningMoments(), online.RunningMoments(), online.RunningMoments()
+    for v in x[:123]:
+        a.update(v)
+    for v in x[123:]:
+        b.update(v)
+    for v in x:
+        whole.update(v)
+    a.merge(b)
+    a.merge(online.RunningMoments())
+    assert a.count == whole.count
+    assert a.mean == pytest.approx(whole.mean, rel=1e-12)
+    assert a.m2 == pytest.approx(whole.m2, rel=1e-10)
+    assert math.isnan(online.RunningMoments().variance(ddof=1))
+
+
+@pytest.mark.parametrize("q", [0.0, 0.1, 0.25, 0.5, 0.75, 0.99, 1.0])
+def test_sketch_error_bound(q):
+    rng = np.random.default_rng(3)
+    x = np.r_[rng.normal(0, 5, 2000), np.zeros(10)]
+    sketch = online.QuantileSketch()
+    for v in x:
+        sketch.update(v)
+
+    xs = np.sort(x)
+    h = q * (len(x) - 1)
+    bound = sketch.alpha * max(abs(xs[math.floor(h)]), abs(xs[math.ceil(h)]))
+    assert abs(sketch.quantile(q) - np.quantile(x, q)) <= bound + 1e-12
+
+
+def test_sketch_merge_and_alpha():
+    a, b = online.QuantileSketch(), online.QuantileSketch()
+    for v in range(1, 50):
+        a.update(v)
+    for v in range(50, 101):
+        b.update(v)
+    a.merge(b)
+    assert a.count == 100
+    assert math.isnan(online.QuantileSketch().quantile(0.5))
+    with pytest.raises(ValueError):
+        a.merge(online.QuantileSketch(alpha=0.05))
+
+
+def test_summary_matches_batch_statistics(synthetic):
+    st = online.OnlineStats()
+    # linhas de estacoes repetidas sao ignoradas
+    st.update_frame(synthetic)
+    st.update_frame(synthetic)
+
+    mags, depths = stats._mag_depth(synthetic)
+    for column, expected in (("Profundidade", depths), (MAG_COLUMN, mags)):
+        res = st.summary(column)
+        assert [label for label, _ in res] == [label for label, _ in expected]
+        np.testing.assert_allclose([v for _, v in res], [v for _, v in expected], rtol=1e-10)
+
+
+def test_month_table_matches_stats_mag_month(synthetic):
+    st = online.OnlineStats(mag_type=None)
+    events = synthetic.drop_duplicates(subset="ID")
+    half = len(events) // 2
+    st.update_frame(events.iloc[:half])
+    other = online.OnlineStats(mag_type=None)
+    other.update_frame(events.iloc[half:])
+    st.merge(other)
+
+    res = st.month_table(MAG_COLUMN)
+    expected = stats.stats_mag_month(synthetic)
+    assert res.index.equals(expected.index)
+    for col in ("Mean", "Std", "Min", "Max"):
+        np.testing.assert_allclose(res[col], expected[col], rtol=1e-10)
+
+    # quantis: dentro do erro das estatisticas de ordem vizinhas
+    for col in ("Median", "Q1", "Q3"):
+        diff = np.abs(res[col] - expected[col]).dropna()
+        assert (diff <= st.alpha * expected["Max"].loc[diff.index] + 1e-12).all()
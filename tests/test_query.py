@@ -0,0 +1,142 @@
+# pyright: basic
+
+import pandas as pd
+import pytest
+
+from tests.conftest import max_magnitudes
+from utils import catalog, filters, query
+
+
+def _mask(df: pd.DataFrame, source: str) -> pd.Series:
+    """Mascara booleana equivalente a cada expressao dos testes"""
+    d, mL, mC = df["Data"], max_magnitudes(df, "L"), max_magnitudes(df, "C")
+    magL = df["ID"].map(mL)
+    magC = df["ID"].map(mC)
+    day = pd.Timestamp("2014-12-31")
+    nextDay = day + pd.Timedelta(1, "D")
+    return {
+        "gap<180": df["Gap"] < 180,
+        "gap<=180 and depth>5": (df["Gap"] <= 180) & (df["Profundidade"] > 5),
+        "depth between 5 and 10": df["Profundidade"].between(5, 10),
+        "lat>38.2 and lon<-28": (df["Latitude"] > 38.2) & (df["Longitude"] < -28),
+        "mag>=2.5": magL >= 2.5,
+        "magL between 1.5 and 2 and magC>1": magL.between(1.5, 2) & (magC > 1),
+        "magc<2": magC < 2,
+        "sz in (sz06, SZ07) and pub=epi": df["SZ"].isin(["SZ06", "SZ07"])
+        & (df["Pub"] == "EPI"),
+        "type=volcanic and vz=VZ14": (df["Tipo Evento"] == "Volcanic") & (df["VZ"] == "VZ14"),
+        "sz in (SZ06, SZ07) and sz=SZ07": df["SZ"] == "SZ07",
+        "date=2014-12-31": (d >= day) & (d < nextDay),
+        "date<=2014-12-31": d < nextDay,
+        "date<2014-12-31": d < day,
+        "date>2014-12-31": d >= nextDay,
+        "date>=2014-12-31": d >= day,
+        "date between 2014-06-01 and 2014-12-31": (d >= "2014-06-01") & (d < nextDay),
+        "date>'2014-06-01 12:00' and date<='2014-06-20 00:00:00'": (d > "2014-06-01 12:00")
+        & (d <= "2014-06-20"),
+        "date>=2014-01-01 and sz in (SZ06,SZ07) and magL between 1.5 and 3 and gap<180": (
+            (d >= "2014-01-01")
+            & df["SZ"].isin(["SZ06", "SZ07"])
+            & magL.between(1.5, 3)
+            & (df["Gap"] < 180)
+        ),
+    }[source]
+
+
+EXPRESSIONS = [
+    "gap<180",
+    "gap<=180 and depth>5",
+    "depth between 5 and 10",
+    "lat>38.2 and lon<-28",
+    "mag>=2.5",
+    "magL between 1.5 and 2 and magC>1",
+    "magc<2",
+    "sz in (sz06, SZ07) and pub=epi",
+    "type=volcanic and vz=VZ14",
+    "sz in (SZ06, SZ07) and sz=SZ07",
+    "date=2014-12-31",
+    "date<=2014-12-31",
+    "date<2014-12-31",
+    "date>2014-12-31",
+    "date>=2014-12-31",
+    "date between 2014-06-01 and 2014-12-31",
+    "date>'2014-06-01 12:00' and date<='2014-06-20 00:00:00'",
+    "date>=2014-01-01 and sz in (SZ06,SZ07) and magL between 1.5 and 3 and gap<180",
+]
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_query_matches_mask(synthetic, source):
+    res = query.run_query(synthetic, source)
+    expected = synthetic[_mask(synthetic, source).to_numpy()]
+    pd.testing.assert_index_equal(res.index, expected.index)
+
+
+def test_query_on_events_at_midnight(synthetic):
+    # um evento exatamente a meia-noite pertence ao dia que comeca
+    df = synthetic.copy()
+    eid = df["ID"].iloc[0]
+    df.loc[df["ID"] == eid, "Data"] = pd.Timestamp("2014-12-31")
+    df = catalog.register(df.sort_values("Data", kind="stable"))
+    assert eid in query.run_query(df, "date=2014-12-31")["ID"].to_numpy()
+    assert eid not in query.run_query(df, "date<=2014-12-30")["ID"].to_numpy()
+    assert eid in query.run_query(df, "date>2014-12-30")["ID"].to_numpy()
+
+
+def test_query_relative_and_spatial_clauses(synthetic):
+    steps = query.compile_query("last 30 days and last 7d").steps
+    assert steps == [(filters.filter_by_last, ("30 days",)), (filters.filter_by_last, ("7d",))]
+
+    res = query.run_query(synthetic, "within(38.5, -28, 80) and bbox(38, 39, -29, -27)")
+    expected = filters.filter_by_bbox(
+        filters.filter_by_radius(synthetic, 38.5, -28, 80), 38, 39, -29, -27
+    )
+    pd.testing.assert_index_equal(res.index, expected.index)
+
+
+def test_query_mainshocks(synthetic):
+    res = query.run_query(synthetic, "mainshocks(gk) and gap<=200")
+    expected = filters.filter_by_gap(filters.filter_by_mainshocks(synthetic, "gk"), 200)
+    pd.testing.assert_index_equal(res.index, expected.index)
+
+
+def test_cheap_filters_run_first():
+    steps = query.compile_query("mag>2 and gap<100 and sz=SZ06 and date>=2014-01-01").steps
+    names = [func.__name__ for func, _ in steps]
+    assert names == [
+        "filter_by_date",
+        "filter_by_categories",
+        "filter_by_gap",
+        "filter_by_magnitude",
+    ]
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "magnitude<3",
+        "magX>2",
+        "foo=1",
+        "sz<SZ06",
+        "gap<",
+        "gap<180 or depth>5",
+        "mainshocks(kmeans)",
+        "gap<180 and",
+        "gap ! 3",
+    ],
+)
+def test_invalid_expressions_raise(source):
+    with pytest.raises(ValueError):
+        query.compile_query(source)
+
+
+def test_tokenize_strings_and_operators():
+    assert query.tokenize("regiao='Fossa Hirondelle' and gap<=180") == [
+        "regiao",
+        "=",
+        "Fossa Hirondelle",
+        "and",
+        "gap",
+        "<=",
+        "180",
+    ]
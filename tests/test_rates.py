@@ -0,0 +1,124 @@
+# pyright: basic
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import max_magnitudes
+from utils import catalog, crud, filters, rates
+
+
+def _events(df: pd.DataFrame) -> pd.DataFrame:
+    events = df.drop_duplicates(subset="ID")
+    mags = events["ID"].map(max_magnitudes(df)).to_numpy(dtype=float)
+    return pd.DataFrame({"Data": events["Data"].to_numpy(), "M0": rates.seismic_moment(mags)})
+
+
+def _brute_windows(df: pd.DataFrame, ends: pd.DatetimeIndex, window: str, baseline: str | None):
+    events = _events(df)
+    length = pd.Timedelta(window)
+    counts, moments, expected = [], [], []
+    for end in ends:
+        inside = (events["Data"] > end - length) & (events["Data"] <= end)
+        counts.append(inside.sum())
+        moments.append(events.loc[inside, "M0"].sum())
+        if baseline is None:
+            span = max(events["Data"].max() - events["Data"].min(), length)
+            expected.append(len(events) * length / span)
+        else:
+            before = (events["Data"] > end - length - pd.Timedelta(baseline)) & (
+                events["Data"] <= end - length
+            )
+            n = before.sum()
+            expected.append(n * length / pd.Timedelta(baseline) if n else np.nan)
+    return np.array(counts), np.array(moments), np.array(expected)
+
+
+@pytest.mark.parametrize(
+    "window, step, baseline",
+    [("24h", "6h", "30D"), ("6h", "1h", "2D"), ("7D", "1D", None)],
+)
+def test_sliding_rates_match_brute_force(synthetic, window, step, baseline):
+    start, end = pd.Timestamp("2014-03-01"), pd.Timestamp("2014-05-01")
+    res = rates.sliding_rates(synthetic, window, step, baseline, start, end)
+    assert res.index[0] == start and res.index[-1] == end
+    assert (np.diff(res.index) == pd.Timedelta(step)).all()
+
+    counts, moments, expected = _brute_windows(synthetic, res.index, window, baseline)
+    np.testing.assert_array_equal(res["Count"], counts)
+    np.testing.assert_allclose(res["Moment"], moments, rtol=1e-9)
+    np.testing.assert_allclose(res["Expected"], expected, rtol=1e-12)
+
+    flags = (counts >= rates.ANOMALY_MIN_COUNT) & (
+        counts > expected + rates.ANOMALY_Z * np.sqrt(expected)
+    )
+    np.testing.assert_array_equal(res["Anomaly"], flags)
+
+
+def test_empty_baseline_is_never_anomalous(synthetic):
+    # um enxame depois de um periodo sem eventos: a referencia nao tem eventos
+    base = synthetic.drop_duplicates(subset="ID").iloc[:5]
+    swarm = base.assign(Data=pd.Timestamp("2016-06-01") + pd.to_timedelta(np.arange(5), "min"))
+    df = catalog.register(pd.concat([base, swarm.assign(ID=swarm["ID"] + 10**9)], ignore_index=True))
+    res = rates.sliding_rates(df, "1h", "10min", "2D", "2016-06-01", "2016-06-01 00:50")
+    assert res["Count"].max() == 5
+    assert res["Expected"].isna().all()
+    assert not res["Anomaly"].any()
+
+
+def test_subsets_use_only_their_events(synthetic):
+    subset = filters.filter_by_zone(synthetic, "SZ", "SZ06")
+    ev = rates.event_times(subset)
+    assert set(ev.ids) == set(subset["ID"])
+
+    res = rates.sliding_rates(subset, "30D", "10D", None)
+    counts, moments, expected = _brute_windows(subset, res.index, "30D", None)
+    np.testing.assert_array_equal(res["Count"], counts)
+    np.testing.assert_allclose(res["Moment"], moments, rtol=1e-9)
+    np.testing.assert_allclose(res["Expected"], expected)
+
+
+def test_event_times_follow_catalog_changes(synthetic):
+    before = rates.event_times(synthetic)
+    eid = synthetic["ID"].iloc[0]
+    new = crud.delete_event(synthetic, eid)
+    after = rates.event_times(new)
+    assert after is not before
+    assert eid not in after.ids and len(after) == len(before) - 1
+
+
+def test_latest_rates(synthetic):
+    at = pd.Timestamp("2014-07-15 12:00")
+    res = rates.latest_rates(synthetic, ("1h", "24h", "7D"), "30D", at)
+    assert list(res.index) == ["1h", "24h", "7D"]
+    for w, row in res.iterrows():
+        window = rates.sliding_rates(synthetic, w, "1h", "30D", at, at).iloc[0]
+        assert row["Count"] == window["Count"]
+        assert row["Moment"] == pytest.approx(window["Moment"])
+        np.testing.assert_allclose(row["Expected"], window["Expected"])
+        assert row["Anomaly"] == window["Anomaly"]
+
+
+def test_empty_catalog(synthetic):
+    res = rates.sliding_rates(synthetic.iloc[:0])
+    assert res.empty and list(res.columns) == rates.RATE_COLUMNS
+    assert (rates.latest_rates(synthetic.iloc[:0])["Count"] == 0).all()
+
+
+def test_anomalies_join_consecutive_windows():
+    index = pd.date_range("2020-01-01", periods=8, freq="h")
+    res = rates.anomalies(
+        pd.DataFrame(
+            {
+                "Count": [1, 5, 7, 1, 4, 1, 6, 9],
+                "Moment": [0.0, 2.0, 1.0, 0.0, 3.0, 0.0, 1.0, 5.0],
+                "Expected": 1.0,
+                "Anomaly": [False, True, True, False, True, False, True, True],
+            },
+            index=index,
+        )
+    )
+    assert list(res["Inicio"]) == [index[1], index[4], index[6]]
+    assert list(res["Fim"]) == [index[2], index[4], index[7]]
+    assert list(res["Count"]) == [7, 4, 9]
+    assert list(res["Moment"]) == [2.0, 3.0, 5.0]
@@ -0,0 +1,168 @@
+# pyright: basic
+
+import os
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib import cbook
+
+from utils import catalog, crud, figcache, render, stats, visuals
+
+matplotlib.use("Agg")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Cache de figuras num diretorio temporario, tambem como cache por omissao"""
+    fc = figcache.FigureCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(figcache, "_default", fc)
+    return fc
+
+
+def test_content_key():
+    a = np.arange(5.0)
+    key = figcache.content_key(visuals.plot_bar, {"x": a, "title": "t"}, 100.0)
+    assert key == figcache.content_key(visuals.plot_bar, {"title": "t", "x": a.copy()}, 100.0)
+    for other in (
+        (visuals.plot_bar, {"x": a + 1, "title": "t"}, 100.0),
+        (visuals.plot_bar, {"x": a.astype(np.float32), "title": "t"}, 100.0),
+        (visuals.plot_bar, {"x": a, "title": "u"}, 100.0),
+        (visuals.plot_boxplot, {"x": a, "title": "t"}, 100.0),
+        (visuals.plot_bar, {"x": a, "title": "t"}, 200.0),
+        (visuals.plot_bar, {"x": list(a), "title": "t"}, 100.0),
+    ):
+        assert figcache.content_key(*other) != key
+
+
+def test_data_key(synthetic, synthetic_raw):
+    assert figcache.data_key(synthetic_raw) is None
+    key = figcache.data_key(synthetic)
+    assert figcache.data_key(synthetic.iloc[:10]) != key
+    assert figcache.data_key(synthetic[::-1]) != key
+    new = crud.delete_event(synthetic, synthetic["ID"].iloc[-1])
+    assert figcache.data_key(new)[0] != key[0]
+
+
+def test_prepared_is_reused_until_the_data_changes(synthetic, cache, monkeypatch):
+    calls = []
+
+    def prepare(df, arg):
+        calls.append(arg)
+        return len(df)
+
+    assert cache.prepared(synthetic, "n", ("a",), prepare) == len(synthetic)
+    assert cache.prepared(synthetic, "n", ("a",), prepare) == len(synthetic)
+    assert cache.prepared(synthetic, "n", ("b",), prepare) == len(synthetic)
+    subset = synthetic.iloc[:100]
+    assert cache.prepared(subset, "n", ("a",), prepare) == 100
+    assert calls == ["a", "b", "a"]
+
+    # os dados modificados no lugar mudam a versao do catalogo
+    crud.update_table_row(synthetic, synthetic.index[0], {"Gap": 1})
+    cache.prepared(synthetic, "n", ("a",), prepare)
+    assert len(calls) == 4
+
+    monkeypatch.setattr(figcache, "MEMO_SIZE", 2)
+    small = figcache.FigureCache(cache.root)
+    for arg in "xyz":
+        small.prepared(synthetic, "n", (arg,), prepare)
+    assert [k[2] for k in small._memo] == [("y",), ("z",)]
+
+
+def test_put_get_and_evict(cache):
+    def write(payload):
+        def _write(tmps):
+            for t in tmps:
+                with open(t, "wb") as f:
+                    f.write(payload)
+
+        return _write
+
+    keys = [figcache.content_key(i) for i in range(4)]
+    for i, key in enumerate(keys):
+        cache.put(key, ("png", "svg"), write(bytes(100)))
+        os.utime(cache.path(key, "png"), (1000 + i, 1000 + i))
+        os.utime(cache.path(key, "svg"), (1000 + i, 1000 + i))
+    assert not [f for f in os.listdir(cache.root) if ".tmp." in f]
+
+    # usar a primeira figura torna-a a mais recente
+    assert cache.get(keys[0], "png") == cache.path(keys[0], "png")
+    assert cache.get(keys[0], "pdf") is None
+
+    cache.max_bytes = 350
+    assert cache.evict() == 5
+    left = sorted(os.listdir(cache.root))
+    assert left == sorted([f"{keys[0]}.png", f"{keys[3]}.png", f"{keys[3]}.svg"])
+
+
+def test_events_per_period_plot(synthetic):
+    for period in ("D", "M"):
+        _, kwargs = visuals.events_per_period_plot(synthetic, period, "x")
+        freq = "D" if period == "D" else "ME"
+        expected = synthetic.drop_duplicates(subset="ID").set_index("Data")["ID"].resample(freq).count()
+        np.testing.assert_array_equal(kwargs["counts"], expected)
+        assert kwargs["starts"][0] == expected.index[0].to_period(freq[0]).start_time
+        assert (kwargs["ends"] > kwargs["starts"]).all()
+
+
+@pytest.mark.parametrize("target", ["Profundidade", "Magnitude"])
+def test_boxplot_plot_matches_matplotlib(synthetic, target):
+    _, kwargs = visuals.boxplot_plot(synthetic, target)
+    column = "Profundidade" if target == "Profundidade" else stats.MAG_COLUMN
+    groups = stats.group_by_period(synthetic, column, "ME")
+    parts = [p for p in groups.split() if len(p)]
+    assert len(kwargs["boxes"]) == len(parts)
+    for box, part in zip(kwargs["boxes"], parts):
+        bx = cbook.boxplot_stats(part, whis=stats.BOX_WHIS)[0]
+        for k in ("med", "q1", "q3", "whislo", "whishi"):
+            assert box[k] == pytest.approx(bx[k]), k
+        np.testing.assert_array_equal(np.sort(box["fliers"]), np.sort(bx["fliers"]))
+
+
+def test_draw_uses_the_cache(cache, tmp_path):
+    calls = []
+
+    def plot(x, title, fname=None):
+        calls.append(fname)
+        for f in fname:
+            with open(f, "w") as fh:
+                fh.write(f"{title} {x}")
+
+    kwargs = {"x": 1, "title": "t"}
+    visuals.draw(plot, kwargs, str(tmp_path / "a.png"), cache)
+    visuals.draw(plot, kwargs, [str(tmp_path / "b.png"), str(tmp_path / "b.svg")], cache)
+    assert len(calls) == 2 and len(calls[1]) == 1
+    assert (tmp_path / "b.png").read_text() == "t 1"
+    visuals.draw(plot, kwargs, str(tmp_path / "c.svg"), cache)
+    assert len(calls) == 2
+
+
+def test_render_all(synthetic, cache, tmp_path):
+    presets = {"catalogo": "", "sz06": "sz=SZ06"}
+    out = tmp_path / "out"
+    res = render.render_all(synthetic, str(out), ("png", "svg"), presets, workers=2)
+    assert res["graficos"] == len(presets) * len(visuals.T6_PLOTS)
+    assert res["cache"] == 0
+    for name in presets:
+        for plot in visuals.T6_PLOTS:
+            for ext in ("png", "svg"):
+                assert (out / name / f"{plot}.{ext}").stat().st_size > 0
+
+    # os mesmos dados: copiados da cache, sem desenhar
+    again = render.render_all(synthetic, str(tmp_path / "again"), ("png", "svg"), presets)
+    assert again["cache"] == again["graficos"]
+    png = out / "sz06" / "eventos_mes.png"
+    assert png.read_bytes() == (tmp_path / "again" / "sz06" / "eventos_mes.png").read_bytes()
+
+    with pytest.raises(ValueError):
+        render.render_all(synthetic, str(out), ("gif",))
+
+
+def test_variants(synthetic):
+    res = render.variants(synthetic, {"all": "", "gap": "gap<180"}, "SZ")
+    assert list(res) == ["all", "gap", "SZ_SZ06", "SZ_SZ07", "SZ_SZ13"]
+    assert res["all"] is synthetic
+    pd.testing.assert_frame_equal(res["SZ_SZ07"], synthetic[synthetic["SZ"] == "SZ07"])
+    assert catalog.root(res["gap"]) is synthetic
@@ -0,0 +1,102 @@
+# pyright: basic
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import magnitude_lists
+from utils import query, report, stats
+
+
+def _t3(values: np.ndarray) -> list[float]:
+    values = values[~np.isnan(values)]
+    uniques, counts = np.unique(values, return_counts=True)
+    return [
+        len(values),
+        values.mean(),
+        values.var(),
+        values.std(),
+        values.min(),
+        values.max(),
+        uniques[counts.argmax()],
+        np.median(values),
+    ]
+
+
+def test_t3_table(synthetic):
+    res = report.t3_table(synthetic)
+    mags = [(t, m) for ms in magnitude_lists(synthetic).values() for t, m in ms]
+    events = synthetic.drop_duplicates(subset="ID")
+    expected = {
+        "Magnitudes": np.array([m for _, m in mags]),
+        "Magnitudes C": np.array([m for t, m in mags if t == "C"]),
+        "Magnitudes L": np.array([m for t, m in mags if t == "L"]),
+        "Distancia": synthetic["DIS"].to_numpy(dtype=float),
+        "Profundidade": events["Profundidade"].to_numpy(dtype=float),
+    }
+    assert list(res.index) == list(expected)
+    assert list(res.columns) == [stats.STAT_LABELS[k] for k in report.T3_STATS]
+    for name, values in expected.items():
+        np.testing.assert_allclose(res.loc[name].to_numpy(dtype=float), _t3(values), err_msg=name)
+
+
+PRESETS = {"catalogo": "", "sz06": "sz=SZ06", "gap180": "gap<180 and depth>5"}
+
+
+@pytest.fixture
+def built(synthetic):
+    return report.build_report(synthetic, PRESETS, workers=4)
+
+
+def test_build_report_matches_direct_calls(synthetic, built):
+    assert set(built["tabelas"]) == set(PRESETS)
+    assert built["expressoes"] == PRESETS
+    for name, expr in PRESETS.items():
+        subset = query.run_query(synthetic, expr) if expr else synthetic
+        tables = built["tabelas"][name]
+        assert set(tables) == set(report.SECTION_TITLES)
+        assert built["eventos"][name] == subset["ID"].nunique()
+        pd.testing.assert_frame_equal(tables["t3"], report.t3_table(subset))
+        pd.testing.assert_frame_equal(tables["profundidade_mes"], stats.stats_depth_month(subset))
+        pd.testing.assert_frame_equal(tables["magnitude_mes"], stats.stats_mag_month(subset))
+        pd.testing.assert_frame_equal(
+            tables["eventos_mes"], stats.aggregate(subset, None, ("count",), "ME")
+        )
+        pd.testing.assert_frame_equal(
+            tables["eventos_dia"], stats.aggregate(subset, None, ("count",), "D")
+        )
+
+
+def test_build_report_is_independent_of_threads(synthetic, built):
+    serial = report.build_report(synthetic, PRESETS, workers=1)
+    for name, tables in built["tabelas"].items():
+        for section, table in tables.items():
+            pd.testing.assert_frame_equal(table, serial["tabelas"][name][section])
+    assert {"filtros", "total", "sz06/t3"} <= set(built["tempos"])
+
+
+def test_invalid_preset_raises(synthetic):
+    with pytest.raises(ValueError):
+        report.build_report(synthetic, {"bad": "gap<<3"})
+
+
+def test_write_report(built, tmp_path):
+    written = report.write_report(built, str(tmp_path / "out"))
+    assert all(os.path.exists(f) for f in written)
+    assert len(written) == len(PRESETS) * len(report.SECTION_TITLES) + 2
+
+    t3 = pd.read_csv(tmp_path / "out" / "sz06_t3.csv", index_col=0)
+    np.testing.assert_allclose(t3.to_numpy(), built["tabelas"]["sz06"]["t3"].to_numpy(dtype=float))
+
+    with open(tmp_path / "out" / "relatorio.json", encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["eventos"] == built["eventos"]
+    months = data["tabelas"]["catalogo"]["eventos_mes"]
+    assert [row["Count"] for row in months] == list(built["tabelas"]["catalogo"]["eventos_mes"]["Count"])
+
+    md = (tmp_path / "out" / "relatorio.md").read_text(encoding="utf-8")
+    for title in report.SECTION_TITLES.values():
+        assert md.count(f"### {title}") == len(PRESETS)
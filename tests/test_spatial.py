@@ -0,0 +1,102 @@
+# pyright: basic
+
+import math
+
+import numpy as np
+import pytest
+from matplotlib.path import Path
+
+from utils import filters, spatial
+
+POLYGON = [(38.0, -29.0), (39.2, -28.5), (38.8, -27.0), (38.3, -27.6), (37.7, -27.2)]
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(3)
+    n = 5000
+    return np.arange(n) + 100, rng.uniform(36, 41, n), rng.uniform(-31, -24, n)
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * spatial.EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def test_haversine(points):
+    _, lats, lons = points
+    res = spatial.haversine(38.5, -28.0, lats[:50], lons[:50])
+    expected = [_haversine(38.5, -28.0, a, b) for a, b in zip(lats[:50], lons[:50])]
+    np.testing.assert_allclose(res, expected, rtol=1e-12)
+    # um grau de latitude
+    assert spatial.haversine(0, 0, np.array([1.0]), np.array([0.0]))[0] == pytest.approx(
+        spatial.KM_PER_DEG
+    )
+
+
+def test_points_in_polygon(points):
+    _, lats, lons = points
+    expected = Path([(lon, lat) for lat, lon in POLYGON]).contains_points(
+        np.c_[lons, lats]
+    )
+    np.testing.assert_array_equal(spatial.points_in_polygon(lats, lons, POLYGON), expected)
+
+
+@pytest.mark.parametrize("cell_size", [None, 0.05, 1.0])
+def test_index_matches_brute_force(points, cell_size):
+    ids, lats, lons = points
+    index = spatial.SpatialIndex(ids, lats, lons, cell_size)
+    assert len(index) == len(ids)
+
+    box = (38.1, 38.9, -28.7, -27.3)
+    inBox = (lats >= box[0]) & (lats <= box[1]) & (lons >= box[2]) & (lons <= box[3])
+    assert set(index.bbox(*box)) == set(ids[inBox])
+
+    dist = spatial.haversine(38.5, -28.0, lats, lons)
+    assert set(index.radius(38.5, -28.0, 40)) == set(ids[dist <= 40])
+    np.testing.assert_array_equal(index.nearest(38.5, -28.0, 25), ids[np.argsort(dist)[:25]])
+
+    allowed = ids[::7]
+    near = index.nearest(38.5, -28.0, 10, allowed)
+    order = np.argsort(dist[::7])[:10]
+    np.testing.assert_array_equal(near, allowed[order])
+
+    inside = spatial.points_in_polygon(lats, lons, POLYGON)
+    assert set(index.polygon(POLYGON)) == set(ids[inside])
+
+
+def test_nearest_with_fewer_events_than_k(points):
+    ids, lats, lons = points
+    index = spatial.SpatialIndex(ids[:3], lats[:3], lons[:3])
+    assert len(index.nearest(38.5, -28.0, 10)) == 3
+    assert len(index.nearest(38.5, -28.0, 10, np.array([], dtype=int))) == 0
+
+
+def test_spatial_filters_match_brute_force(synthetic):
+    df = synthetic
+    lats, lons = df["Latitude"].to_numpy(), df["Longitude"].to_numpy()
+
+    res = filters.filter_by_bbox(df, 38.0, 39.0, -28.5, -27.5)
+    mask = (lats >= 38.0) & (lats <= 39.0) & (lons >= -28.5) & (lons <= -27.5)
+    assert res.index.equals(df.index[mask])
+
+    dist = spatial.haversine(38.5, -28.0, lats, lons)
+    assert filters.filter_by_radius(df, 38.5, -28.0, 50).index.equals(df.index[dist <= 50])
+
+    inside = spatial.points_in_polygon(lats, lons, POLYGON)
+    assert filters.filter_by_polygon(df, POLYGON).index.equals(df.index[inside])
+
+
+def test_nearest_filter_uses_only_the_subset(synthetic):
+    subset = filters.filter_by_zone(synthetic, "SZ", "SZ06")
+    events = subset.drop_duplicates(subset="ID")
+    dist = spatial.haversine(
+        38.5, -28.0, events["Latitude"].to_numpy(), events["Longitude"].to_numpy()
+    )
+    expected = events["ID"].to_numpy()[np.argsort(dist)[:5]]
+
+    res = filters.filter_by_nearest(subset, 38.5, -28.0, 5)
+    assert set(res["ID"]) == set(expected)
+    assert res.index.isin(subset.index).all()
@@ -0,0 +1,143 @@
+# pyright: basic
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import SPEEDS
+from utils import parser, stations
+
+
+def _phase(value) -> str:
+    return str(value).split()[0] if isinstance(value, str) and value.strip() else "?"
+
+
+def test_arrival_times_cross_midnight(synthetic):
+    arrival = parser.arrival_times(synthetic)
+    travel = (arrival - synthetic["Data"]).dt.total_seconds()
+    speed = synthetic["Tipo Onda"].map(lambda p: SPEEDS.get(_phase(p), SPEEDS["P"]))
+    np.testing.assert_allclose(travel, synthetic["DIS"] / speed, atol=0.006)
+
+    late = synthetic["Data"].dt.strftime("%H:%M:%S") == "23:59:55"
+    assert late.any()
+    assert (arrival[late].dt.normalize() > synthetic.loc[late, "Data"].dt.normalize()).any()
+
+
+def test_arrival_times_before_origin_day():
+    df = pd.DataFrame(
+        {
+            "Data": pd.to_datetime(
+                ["2020-01-01 00:00:02", "2020-01-01 12:00:00", "2020-01-01 00:00:00"]
+            ),
+            "Hora": [23, 12, np.nan],
+            "Min": [59, 0, 0],
+            "Seg": [58.5, 30.25, 0],
+        }
+    )
+    res = parser.arrival_times(df)
+    assert res[0] == pd.Timestamp("2019-12-31 23:59:58.5")
+    assert res[1] == pd.Timestamp("2020-01-01 12:00:30.25")
+    assert pd.isna(res[2])
+
+
+def test_phases(synthetic):
+    expected = synthetic["Tipo Onda"].map(_phase)
+    np.testing.assert_array_equal(stations.phases(synthetic), expected)
+
+
+@pytest.mark.parametrize("period", ["D", "ME"])
+def test_picks_per_station(synthetic, period):
+    res = stations.picks_per_station(synthetic, period)
+    counts = synthetic.groupby(["Estacao", pd.Grouper(key="Data", freq=period)]).size().unstack(0)
+    counts = counts.reindex(res.index).fillna(0)
+    np.testing.assert_array_equal(res.columns, sorted(synthetic["Estacao"].unique()))
+    np.testing.assert_array_equal(res.to_numpy(), counts[res.columns].to_numpy())
+    assert res.to_numpy().sum() == len(synthetic)
+
+
+def test_phase_counts(synthetic):
+    res = stations.phase_counts(synthetic)
+    fases = synthetic.assign(Fase=synthetic["Tipo Onda"].map(_phase))
+    expected = pd.crosstab(fases["Estacao"], fases["Fase"])
+    for phase in expected.columns:
+        np.testing.assert_array_equal(res[phase], expected[phase])
+    np.testing.assert_array_equal(res["Total"], expected.sum(axis=1))
+    np.testing.assert_array_equal(res["Eventos"], fases.groupby("Estacao")["ID"].nunique())
+    np.testing.assert_allclose(res["P/S"], expected["P"] / expected["S"])
+
+
+@pytest.mark.parametrize("by_station", [False, True])
+def test_amplitude_distance(synthetic, by_station):
+    res = stations.amplitude_distance(synthetic, by_station=by_station)
+    amp = synthetic[(synthetic["Tipo Onda"] == "IAML") & (synthetic["Amplitude"] > 0)]
+    amp = amp.assign(
+        logA=np.log10(amp["Amplitude"]),
+        Distancia=pd.cut(amp["DIS"], stations.DIST_BINS, right=False),
+    )
+    keys = ["Estacao", "Distancia"] if by_station else ["Distancia"]
+    grouped = amp.groupby(keys, observed=by_station)["logA"]
+    expected = pd.DataFrame(
+        {
+            "Count": grouped.count(),
+            "Median": grouped.median(),
+            "Q1": grouped.quantile(0.25),
+            "Q3": grouped.quantile(0.75),
+            "Min": grouped.min(),
+            "Max": grouped.max(),
+        }
+    )
+    assert res["Count"].sum() == len(amp)
+    np.testing.assert_allclose(res.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+
+
+def test_participation_and_status(synthetic):
+    res = stations.participation(synthetic)
+    months = synthetic["Data"].dt.to_period("M")
+    per_month = synthetic.groupby(months)["ID"].nunique()
+    with_station = synthetic.groupby([months, "Estacao"])["ID"].nunique().unstack(fill_value=0)
+    expected = with_station.div(per_month, axis=0)
+    np.testing.assert_allclose(res.to_numpy(), expected[res.columns].to_numpy())
+
+    status = stations.station_status(synthetic)
+    assert set(status.index) == set(res.columns)
+    np.testing.assert_allclose(status["Mediana"], res.median()[status.index])
+    np.testing.assert_allclose(status["Ultimo"], res.iloc[-1][status.index])
+
+
+def test_station_status_flags_stopped_stations(synthetic):
+    # PBOI deixa de ter leituras no ultimo mes
+    last = synthetic["Data"].dt.to_period("M") == synthetic["Data"].max().to_period("M")
+    df = synthetic[~(last & (synthetic["Estacao"] == "PBOI"))]
+    status = stations.station_status(df)
+    assert status.index[0] == "PBOI"
+    assert status.loc["PBOI", "Estado"] == "parada"
+    assert status.loc["PBOI", "Ultima Leitura"] < synthetic.loc[last, "Data"].min()
+
+
+def test_travel_times_and_curves(synthetic):
+    tt = stations.travel_times(synthetic)
+    assert set(tt["Fase"]) == {"P", "S"}
+    speed = tt["Fase"].map(SPEEDS)
+    np.testing.assert_allclose(tt["Tempo"], tt["Distancia"] / speed, atol=0.006)
+
+    curves = stations.travel_time_curves(synthetic)
+    binned = tt.assign(Classe=pd.cut(tt["Distancia"], stations.TT_BINS, right=False))
+    grouped = binned.groupby(["Fase", "Classe"], observed=False)
+    np.testing.assert_array_equal(curves["Count"], grouped.size())
+    np.testing.assert_allclose(curves["Median"], grouped["Tempo"].median())
+    np.testing.assert_allclose(curves["Distancia"], grouped["Distancia"].median())
+    np.testing.assert_allclose(curves["Max"], grouped["Tempo"].max())
+
+
+def test_travel_time_residuals_find_bad_picks(synthetic):
+    df = synthetic.copy()
+    picks = df.index[df["Tipo Onda"] == "P"][:3]
+    df.loc[picks, "Seg"] = (df.loc[picks, "Seg"] + 20) % 60
+    df.loc[picks, "Min"] = df.loc[picks, "Min"] + (synthetic.loc[picks, "Seg"] + 20 >= 60)
+
+    # classes finas: entre as medianas, as curvas sinteticas sao retas
+    res = stations.travel_time_residuals(df, bins=tuple(range(0, 305, 5)))
+    assert res.loc[picks, "Suspeita"].all()
+    worst = res["Z"].abs().sort_values(ascending=False).index[: len(picks)]
+    assert set(worst) == set(picks)
+    np.testing.assert_allclose(res.loc[picks, "Residuo"], 20, atol=0.5)
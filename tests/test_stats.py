@@ -0,0 +1,200 @@
+# pyright: basic
+
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib import cbook
+
+from tests.conftest import max_magnitudes
+from utils import catalog, filters, stats
+from utils.utils import MAG_COLUMN
+
+
+def _random_groups(ngroups: int, n: int = 3000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, ngroups, n)
+    # valores repetidos (para a moda e para empates na ordenacao) e alguns NaN
+    values = np.round(rng.normal(2, 1, n), 1)
+    values[rng.random(n) < 0.05] = np.nan
+    return codes, values
+
+
+@pytest.mark.parametrize("ngroups", [1, 7, 300, 70_000])
+def test_group_order_matches_lexsort(ngroups):
+    codes, values = _random_groups(ngroups)
+    values = np.nan_to_num(values)
+    order = stats._group_order(codes, values, ngroups)
+    expected = np.lexsort((values, codes))
+    np.testing.assert_array_equal(codes[order], codes[expected])
+    np.testing.assert_array_equal(values[order], values[expected])
+
+
+@pytest.mark.parametrize("ngroups", [1, 12, 500])
+def test_groups_match_pandas_groupby(ngroups):
+    codes, values = _random_groups(ngroups)
+    labels = pd.Index(range(ngroups))
+    g = stats.Groups.from_codes(labels, codes, values)
+    res = g.stats(stats.ZONE_STATS)
+
+    grouped = pd.Series(values).groupby(codes)
+    expected = {
+        "count": grouped.count(),
+        "mean": grouped.mean(),
+        "std": grouped.std(),
+        "var": grouped.var(ddof=0),
+        "median": grouped.median(),
+        "q1": grouped.quantile(0.25),
+        "q3": grouped.quantile(0.75),
+        "min": grouped.min(),
+        "max": grouped.max(),
+        # moda: o valor mais frequente, o menor em caso de empate
+        "mode": grouped.agg(lambda x: x.mode().min()),
+    }
+    for stat, series in expected.items():
+        full = series.reindex(labels)
+        if stat == "count":
+            full = full.fillna(0)
+        np.testing.assert_allclose(res[stat], full.to_numpy(dtype=float), err_msg=stat)
+
+    # cada grupo fica ordenado
+    for i, part in enumerate(g.split()):
+        np.testing.assert_array_equal(part, np.sort(values[(codes == i) & ~np.isnan(values)]))
+
+
+def test_empty_groups_are_nan():
+    g = stats.Groups.from_codes(pd.Index(["a", "b", "c"]), np.array([0, 0, 2]), np.array([1.0, 3.0, 5.0]))
+    res = g.stats(("count", "mean", "std", "median", "min", "max", "mode"))
+    assert list(res["count"]) == [2, 0, 1]
+    for stat in ("mean", "median", "min", "max", "mode"):
+        assert np.isnan(res[stat][1])
+    assert np.isnan(res["std"][2])
+
+
+def test_unknown_statistic_raises():
+    g = stats.Groups.from_codes(pd.Index([0]), np.array([0]), np.array([1.0]))
+    with pytest.raises(ValueError):
+        g.stats(("media",))
+
+
+def test_whiskers_match_matplotlib():
+    codes, values = _random_groups(5, n=400)
+    values[:5] = [9.0, -6.0, 8.5, -5.5, 12.0]
+    g = stats.Groups.from_codes(pd.Index(range(5)), codes, values)
+    low, high, outliers = g.whiskers()
+
+    for i, part in enumerate(g.split()):
+        bx = cbook.boxplot_stats(part, whis=stats.BOX_WHIS)[0]
+        assert low[i] == pytest.approx(bx["whislo"])
+        assert high[i] == pytest.approx(bx["whishi"])
+        start, end = g.offsets[i], g.offsets[i + 1]
+        np.testing.assert_array_equal(np.sort(part[outliers[start:end]]), np.sort(bx["fliers"]))
+
+
+def _events(df: pd.DataFrame) -> pd.DataFrame:
+    events = df.drop_duplicates(subset="ID", keep="first").set_index("Data")
+    return events.assign(**{MAG_COLUMN: events["ID"].map(max_magnitudes(df)).to_numpy()})
+
+
+def _resampled(df: pd.DataFrame, column: str, period: str) -> pd.DataFrame:
+    """Estatisticas por periodo calculadas diretamente com o `resample` do pandas"""
+    r = _events(df)[column].resample(period)
+    return pd.DataFrame(
+        {
+            "Count": r.count(),
+            "Mean": r.mean(),
+            "Std": r.std(),
+            "Median": r.median(),
+            "Q1": r.quantile(0.25),
+            "Q3": r.quantile(0.75),
+            "Min": r.min(),
+            "Max": r.max(),
+        }
+    )
+
+
+@pytest.mark.parametrize("column", ["Profundidade", MAG_COLUMN])
+@pytest.mark.parametrize("period", ["D", "W", "ME", "YE"])
+def test_aggregate_matches_resample(synthetic, column, period):
+    statistics = ("count", "mean", "std", "median", "q1", "q3", "min", "max")
+    res = stats.aggregate(synthetic, column, statistics, period)
+    expected = _resampled(synthetic, column, period)
+    pd.testing.assert_frame_equal(
+        res, expected, check_freq=False, check_names=False, check_dtype=False
+    )
+
+
+@pytest.mark.parametrize("column", ["Profundidade", MAG_COLUMN])
+def test_month_stats_on_zone_subsets(synthetic, column):
+    # o cubo responde aos subconjuntos filtrados por zona; o resultado tem de ser
+    # igual ao dos eventos do subconjunto
+    subset = filters.filter_by_zone(synthetic, "SZ", ["SZ06", "SZ07"])
+    res = stats.aggregate(subset, column, ("count", "mean", "std", "min", "max"))
+    expected = _resampled(subset, column, "ME")[["Count", "Mean", "Std", "Min", "Max"]]
+    pd.testing.assert_frame_equal(
+        res, expected, check_freq=False, check_names=False, check_dtype=False
+    )
+
+
+def test_event_counts(dados):
+    index, values = stats.events_per_period(dados, "D")
+    expected = dados.drop_duplicates(subset="ID").set_index("Data")["ID"].resample("D").count()
+    np.testing.assert_array_equal(values, expected.to_numpy())
+    np.testing.assert_array_equal(index, expected.index)
+
+
+@pytest.mark.parametrize("column", [None, "Profundidade", MAG_COLUMN])
+def test_aggregate_levels_match_aggregate(synthetic_raw, column):
+    # sem catalogo registado, `aggregate` agrupa os eventos diretamente
+    df = synthetic_raw.copy()
+    statistics = ("count", "mean", "std", "var", "min", "max", "median")
+    levels = stats.aggregate_levels(df, column, statistics)
+    for period, res in levels.items():
+        expected = stats.aggregate(df, column, statistics, period)
+        pd.testing.assert_frame_equal(res, expected, check_dtype=False, check_freq=False)
+
+
+def test_aggregate_levels_without_fill(synthetic_raw):
+    df = synthetic_raw.copy()
+    levels = stats.aggregate_levels(df, None, ("count",), ("D",), fill=False)
+    assert (levels["D"]["Count"] > 0).all()
+    assert levels["D"]["Count"].sum() == df["ID"].nunique()
+
+
+@pytest.mark.parametrize("zone", ["SZ", "VZ", "Regiao"])
+def test_compare_zones_matches_groupby(synthetic, zone):
+    res = stats.compare_zones(synthetic, zone, statistics=("count", "mean", "std", "median", "max"))
+    events = _events(synthetic).reset_index()
+    events = events[events[zone].notna()]
+
+    for column in ("Profundidade", MAG_COLUMN):
+        grouped = events.groupby(zone)[column]
+        part = res[res["Variavel"] == column].set_index("Zona")
+        np.testing.assert_array_equal(part.index, grouped.count().index)
+        np.testing.assert_allclose(part["Count"], grouped.count())
+        np.testing.assert_allclose(part["Mean"], grouped.mean())
+        np.testing.assert_allclose(part["Std"], grouped.std())
+        np.testing.assert_allclose(part["Median"], grouped.median())
+        np.testing.assert_allclose(part["Max"], grouped.max())
+
+
+def test_compare_zones_by_period(synthetic):
+    res = stats.compare_zones(synthetic, "SZ", ("Profundidade",), ("count", "mean"), "ME")
+    events = _events(synthetic).reset_index()
+    events = events[events["SZ"].notna()]
+    month = events["Data"].dt.to_period("M").dt.to_timestamp(how="end").dt.normalize()
+    expected = events.groupby(["SZ", month])["Profundidade"].agg(["count", "mean"])
+
+    np.testing.assert_allclose(res["Count"], expected["count"])
+    np.testing.assert_allclose(res["Mean"], expected["mean"])
+    assert list(zip(res["Zona"], res["Data"])) == list(expected.index)
+
+
+def test_monthly_tables_are_independent_of_registration(synthetic, synthetic_raw):
+    raw = synthetic_raw.copy()
+    assert catalog.version(raw) is None
+    pd.testing.assert_frame_equal(
+        stats.stats_mag_month(synthetic), stats.stats_mag_month(raw), check_freq=False
+    )
+    pd.testing.assert_frame_equal(
+        stats.stats_depth_month(synthetic), stats.stats_depth_month(raw), check_freq=False
+    )
@@ -0,0 +1,84 @@
+# pyright: basic
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import magnitude_lists
+from utils import catalog, filters
+from utils.utils import _magnitude_table, event_magnitudes, extract_mag_depth
+
+
+def _expected(df: pd.DataFrame, mag_type: str | None = None) -> list[tuple]:
+    return [
+        (eid, t, m)
+        for eid, mags in magnitude_lists(df).items()
+        for t, m in mags
+        if mag_type is None or t == mag_type
+    ]
+
+
+def _rows(table: pd.DataFrame) -> list[tuple]:
+    return list(zip(table["ID"], table["Tipo"], table["Magnitude"]))
+
+
+@pytest.mark.parametrize("mag_type", [None, "L", "C"])
+def test_full_catalog(synthetic, mag_type):
+    assert _rows(event_magnitudes(synthetic, mag_type)) == _expected(synthetic, mag_type)
+
+
+@pytest.mark.parametrize("mag_type", [None, "L"])
+def test_filtered_subsets(synthetic, mag_type):
+    for subset in (
+        filters.filter_by_gap(synthetic, 200),
+        filters.filter_by_zone(synthetic, "SZ", "SZ06"),
+        synthetic.iloc[100:300],
+        synthetic.drop_duplicates(subset="ID"),
+        synthetic.iloc[:0],
+    ):
+        assert _rows(event_magnitudes(subset, mag_type)) == _expected(subset, mag_type)
+
+
+def test_subset_with_as_many_events_as_the_table(synthetic):
+    # sem as magnitudes de alguns eventos, um subconjunto pode ter tantos IDs como a
+    # tabela de magnitudes sem ser o catalogo completo
+    lists = magnitude_lists(synthetic)
+    without = [eid for eid, mags in lists.items() if not mags]
+    withMags = [eid for eid, mags in lists.items() if mags]
+    assert without
+
+    subset = synthetic[~synthetic["ID"].isin(withMags[: len(without)])]
+    assert subset["ID"].nunique() == event_magnitudes(synthetic)["ID"].nunique()
+    assert _rows(event_magnitudes(subset)) == _expected(subset)
+
+
+def test_unregistered_frames(synthetic_raw):
+    df = synthetic_raw.iloc[:200].copy()
+    assert catalog.version(df) is None
+    assert _rows(event_magnitudes(df)) == _expected(df)
+
+
+def test_rows_without_magnitude_lists():
+    df = pd.DataFrame(
+        {
+            "ID": [1, 1, 2, 3],
+            "Magnitudes": [
+                [{"Magnitude": " 2.1", "Tipo": "L"}],
+                [{"Magnitude": " 2.1", "Tipo": "L"}],
+                np.nan,
+                [],
+            ],
+        }
+    )
+    assert _rows(_magnitude_table(df)) == [(1, "L", 2.1)]
+
+
+def test_extract_mag_depth_uses_first_l_magnitude(synthetic):
+    res = extract_mag_depth(synthetic)
+    events = synthetic.drop_duplicates(subset="ID")
+    first = [
+        next((m for t, m in mags if t == "L"), np.nan)
+        for mags in magnitude_lists(synthetic).values()
+    ]
+    np.testing.assert_array_equal(res["Magnitudes"].to_numpy(), first)
+    np.testing.assert_array_equal(res["Profundidade"], events["Profundidade"])
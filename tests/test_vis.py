@@ -0,0 +1,131 @@
+# pyright: basic
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import events, figcache
+from utils.spatial import SpatialIndex
+
+vis = pytest.importorskip("utils.vis")
+
+
+@pytest.mark.parametrize(
+    "box",
+    [(38.0, 39.0, -29.0, -27.5), (-10.0, 10.0, 170.0, 179.9), (38.5, 38.5001, -28.0, -28.0)],
+)
+def test_snap(box):
+    snapped, cell = vis.snap(box)
+    # lado: 360 / 2^k, com pelo menos `GRID_CELLS` celulas ao longo da largura
+    k = math.log2(360 / cell)
+    assert k == int(k) and k >= 0
+    width = max(box[3] - box[2], box[1] - box[0], 1e-6)
+    assert width / cell >= vis.GRID_CELLS / 2 or k == 0
+    assert width / cell < vis.GRID_CELLS * 2 or width <= 1e-6 * 2
+    # a caixa alargada contem a original e tem limites nas celulas
+    assert snapped[0] <= box[0] and snapped[1] >= box[1]
+    assert snapped[2] <= box[2] and snapped[3] >= box[3]
+    for v in snapped:
+        assert v / cell == pytest.approx(round(v / cell))
+
+    # vistas proximas dao a mesma grelha
+    shifted = tuple(v + cell / 10 for v in box)
+    assert vis.snap(shifted)[1] == cell
+
+
+def test_grid_density_matches_groupby():
+    rng = np.random.default_rng(0)
+    n = 5000
+    lats = rng.uniform(-5, 5, n)
+    lons = rng.uniform(-3, 3, n)
+    mags = np.where(rng.random(n) < 0.1, np.nan, rng.uniform(0, 5, n))
+    cell = 360 / 2**9
+    res = vis.grid_density(lats, lons, mags, cell)
+
+    df = pd.DataFrame({"lat": lats, "lon": lons, "mag": mags})
+    g = df.groupby([np.floor(lats / cell), np.floor(lons / cell)])
+    expected = pd.DataFrame(
+        {
+            "Latitude": g["lat"].mean(),
+            "Longitude": g["lon"].mean(),
+            "N": g.size(),
+            "Magnitude": g["mag"].max(),
+        }
+    ).reset_index(drop=True)
+    res = res.sort_values(["Latitude", "Longitude"]).reset_index(drop=True)
+    expected = expected.sort_values(["Latitude", "Longitude"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(res, expected, check_dtype=False)
+    assert res["N"].sum() == n
+
+
+def test_viewport(synthetic):
+    ev = events.event_table(synthetic)
+    assert vis.viewport(None, ev) == (
+        ev["Latitude"].min(),
+        ev["Latitude"].max(),
+        ev["Longitude"].min(),
+        ev["Longitude"].max(),
+    )
+
+    derived = {"map._derived": {"coordinates": [[-29, 39], [-27, 39], [-27, 38], [-29, 38]]}}
+    assert vis.viewport(derived, ev) == (38.0, 39.0, -29.0, -27.0)
+
+    box = vis.viewport({"map.center": {"lat": 0.0, "lon": 10.0}, "map.zoom": 2}, ev)
+    degPerPx = 360 / (512 * 4)
+    assert box == pytest.approx(
+        (
+            -vis.VIEW_PX[1] / 2 * degPerPx,
+            vis.VIEW_PX[1] / 2 * degPerPx,
+            10 - vis.VIEW_PX[0] / 2 * degPerPx,
+            10 + vis.VIEW_PX[0] / 2 * degPerPx,
+        )
+    )
+    world = vis.viewport({"map.center": {"lat": 0.0, "lon": 0.0}, "map.zoom": 0}, ev)
+    assert world[2] == -180.0 and world[3] == 180.0
+
+
+@pytest.fixture
+def maps(synthetic, tmp_path, monkeypatch):
+    ev = events.event_table(synthetic)
+    lats = ev["Latitude"].to_numpy(dtype=float)
+    lons = ev["Longitude"].to_numpy(dtype=float)
+    index = SpatialIndex(np.arange(len(ev)), lats, lons)
+    key = figcache.content_key(ev[["ID", "Latitude", "Longitude"]].to_numpy(dtype=float))
+    monkeypatch.setattr(vis, "load_catalog", lambda: (ev, index, key))
+    monkeypatch.setattr(figcache, "_default", figcache.FigureCache(str(tmp_path)))
+    return ev
+
+
+def test_view_figures_send_only_the_events_in_view(maps, monkeypatch):
+    relayout = {"map._derived": {"coordinates": [[-29, 39], [-28, 39], [-28, 38], [-29, 38]]}}
+    box, cell = vis.snap(vis.viewport(relayout, maps))
+    inside = maps["Latitude"].between(box[0], box[1]) & maps["Longitude"].between(box[2], box[3])
+
+    map2D, map3D = vis.view_figures(relayout)
+    assert len(map2D.data[0].lat) == inside.sum()
+    np.testing.assert_array_equal(
+        np.sort(np.asarray(map3D.data[0].customdata)[:, 0]), np.sort(maps.loc[inside, "ID"])
+    )
+
+    # acima de `MAX_POINTS`, um ponto por celula; no 3D, os de maior magnitude
+    monkeypatch.setattr(vis, "MAX_POINTS", 10)
+    monkeypatch.setattr(vis, "MAX_POINTS_3D", 10)
+    map2D, map3D = vis.view_figures(relayout)
+    ins = maps[inside]
+    cells = set(zip(np.floor(ins["Latitude"] / cell), np.floor(ins["Longitude"] / cell)))
+    assert len(map2D.data[0].lat) == len(cells)
+    assert sum(int(t.split()[0]) for t in map2D.data[0].hovertext) == inside.sum()
+    top = maps.loc[inside, "Magnitude"].fillna(-np.inf).nlargest(10)
+    shown = np.asarray(map3D.data[0].customdata)[:, 1]
+    np.testing.assert_allclose(np.sort(np.nan_to_num(shown, nan=-np.inf)), np.sort(top))
+
+
+def test_view_figures_use_the_figure_cache(maps):
+    first = vis.view_figures(None)
+    files = os.listdir(figcache.get_cache().root)
+    assert len([f for f in files if f.endswith(".json")]) == 2
+    again = vis.view_figures(None)
+    assert again[0].to_dict() == first[0].to_dict()
@@ -0,0 +1,146 @@
+# pyright: basic
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from utils import catalog
+
+"""Indices bitmap sobre os atributos categoricos dos eventos
+
+Para cada valor de cada coluna (ex: SZ06 na coluna SZ) e guardado um bitset com um
+bit por evento, empacotado em palavras de 64 bits. Uma pesquisa com varios valores
+por coluna, e varias colunas, e resolvida com OR entre os valores de uma coluna e
+AND entre colunas, sem comparar strings.
+
+"""
+
+CATEGORICAL_COLS = ["SZ", "VZ", "Pub", "Tipo Evento"]
+
+type Criteria = dict[str, str | Iterable[str]]
+
+
+class BitmapIndex:
+    """Bitsets por valor das colunas categoricas dos eventos"""
+
+    def __init__(self, events: pd.DataFrame, columns: list[str] = CATEGORICAL_COLS):
+        """Constroi o indice
+
+        Args:
+            events (pd.DataFrame): DataFrame com uma linha por evento
+            columns (list[str]): colunas a indexar (default: `CATEGORICAL_COLS`)
+        """
+        self.ids = events["ID"].to_numpy()
+        self.n = len(self.ids)
+        self.nwords = (self.n + 63) // 64
+        self.bitmaps: dict[str, dict[str, np.ndarray]] = {}
+
+        for col in columns:
+            if col not in events.columns:
+                continue
+            codes, uniques = pd.factorize(events[col])
+            self.bitmaps[col] = {
+                value: self._pack(codes == i) for i, value in enumerate(uniques)
+            }
+
+    @classmethod
+    def from_catalog(cls, df: pd.DataFrame) -> "BitmapIndex":
+        """Constroi o indice a partir dos eventos unicos de uma DataFrame
+
+        Args:
+            df (pd.DataFrame): DataFrame com eventos
+
+        Returns:
+            BitmapIndex: indice bitmap
+        """
+        return cls(df.drop_duplicates(subset="ID", keep="first"))
+
+    def _pack(self, mask: np.ndarray) -> np.ndarray:
+        """Empacota uma mascara booleana em palavras de 64 bits"""
+        packed = np.zeros(self.nwords * 8, dtype=np.uint8)
+        bits = np.packbits(mask, bitorder="little")
+        packed[: len(bits)] = bits
+        return packed.view(np.uint64)
+
+    def _unpack(self, words: np.ndarray) -> np.ndarray:
+        """Converte palavras de 64 bits numa mascara booleana, um valor por evento"""
+        return np.unpackbits(words.view(np.uint8), bitorder="little")[: self.n].astype(
+            bool
+        )
+
+    def values(self, column: str) -> list[str]:
+        """Valores existentes numa coluna indexada
+
+        Args:
+            column (str): nome da coluna
+
+        Returns:
+            list[str]: valores da coluna
+        """
+        return sorted(self.bitmaps[column])
+
+    def bitset(self, criteria: Criteria) -> np.ndarray:
+        """Bitset dos eventos que satisfazem os criterios
+
+        Args:
+            criteria (Criteria): valores aceites por coluna, ex:
+                `{"SZ": ["SZ06", "SZ07"], "Pub": "EPI"}`
+
+        Raises:
+            KeyError: se uma coluna nao estiver indexada
+
+        Returns:
+            np.ndarray: bitset em palavras de 64 bits
+        """
+        result = np.full(self.nwords, np.iinfo(np.uint64).max, dtype=np.uint64)
+        empty = np.zeros(self.nwords, dtype=np.uint64)
+
+        for col, values in criteria.items():
+            if col not in self.bitmaps:
+                raise KeyError(f"Coluna sem indice bitmap: {col}")
+            if isinstance(values, str):
+                values = [values]
+
+            acc = empty.copy()
+            for v in values:
+                acc |= self.bitmaps[col].get(v, empty)
+            result &= acc
+        return result
+
+    def select(self, criteria: Criteria) -> np.ndarray:
+        """IDs dos eventos que satisfazem os criterios (OR numa coluna, AND entre colunas)
+
+        Args:
+            criteria (Criteria): valores aceites por coluna
+
+        Returns:
+            np.ndarray: IDs dos eventos
+        """
+        return self.ids[self._unpack(self.bitset(criteria))]
+
+    def count(self, criteria: Criteria) -> int:
+        """Numero de eventos que satisfazem os criterios
+
+        Args:
+            criteria (Criteria): valores aceites por coluna
+
+        Returns:
+            int: numero de eventos
+        """
+        return int(np.bitwise_count(self.bitset(criteria)).sum())
+
+
+def get_index(df: pd.DataFrame) -> BitmapIndex:
+    """Retorna o indice bitmap do catalogo de `df`
+
+    Args:
+        df (pd.DataFrame): DataFrame com eventos
+
+    Returns:
+        BitmapIndex: indice bitmap
+    """
+    return catalog.derived(df, "bitmap", BitmapIndex.from_catalog)
+
+
+catalog.register_builder("bitmap", BitmapIndex.from_catalog)
@@ -0,0 +1,198 @@
+# pyright: basic
+
+import itertools
+import threading
+import weakref
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+
+"""Registo de catalogos e das suas estruturas derivadas
+
+Cada catalogo carregado recebe um numero de versao, guardado em `df.attrs`. Como o
+pandas propaga `attrs` para as DataFrames derivadas (filtros, slices, copias), qualquer
+subconjunto do catalogo sabe a que versao pertence, e pode reutilizar as estruturas
+(indices, tabelas pre-calculadas) construidas sobre o catalogo completo.
+
+As estruturas derivadas sao sempre indexadas pelo ID dos eventos, logo continuam
+validas para qualquer subconjunto do catalogo que as originou.
+
+Os catalogos sao guardados por referencia fraca, exceto o registado mais
+recentemente: depois de uma operacao CRUD, o programa pode ficar apenas com
+subconjuntos da versao nova, e o catalogo completo (com as suas estruturas) tem de
+continuar a existir enquanto esses subconjuntos forem usados.
+
+"""
+
+VERSION_ATTR = "versao"
+
+_counter = itertools.count(1)
+_roots: dict[int, weakref.ref] = {}
+# referencia forte ao catalogo registado mais recentemente
+_current: pd.DataFrame | None = None
+_derived: dict[tuple[int, str], Any] = {}
+_builders: dict[str, Callable[[pd.DataFrame], Any]] = {}
+
+# um lock por estrutura: threads que pedem a mesma estrutura esperam pela primeira
+# construcao em vez de a repetirem
+_lock = threading.Lock()
+_building: dict[tuple[int, str], threading.Lock] = {}
+
+
+def register_builder(name: str, builder: Callable[[pd.DataFrame], Any]) -> None:
+    """Regista uma estrutura derivada a construir quando um catalogo e carregado
+
+    Args:
+        name (str): nome da estrutura
+        builder (Callable[[pd.DataFrame], Any]): funcao que constroi a estrutura
+            a partir do catalogo
+    """
+    _builders[name] = builder
+
+
+def register(df: pd.DataFrame, build: bool = True) -> pd.DataFrame:
+    """Regista `df` como um catalogo novo, atribuindo-lhe uma versao
+
+    Qualquer outra informacao em `df.attrs` (ex: filtros aplicados) e descartada, visto
+    que `df` passa a ser a raiz da versao nova.
+
+    Args:
+        df (pd.DataFrame): catalogo carregado
+        build (bool): constroi de imediato as estruturas registadas (default: `True`)
+
+    Returns:
+        pd.DataFrame: o mesmo catalogo, com a versao em `df.attrs`
+    """
+    global _current
+    v = next(_counter)
+    df.attrs = {VERSION_ATTR: v}
+    _current = df
+    _roots[v] = weakref.ref(df)
+    weakref.finalize(df, _forget, v)
+
+    if build:
+        for name, builder in _builders.items():
+            derived(df, name, builder)
+    return df
+
+
+def bump(
+    df: pd.DataFrame,
+    parent: pd.DataFrame | None = None,
+    changed: Iterable[int] | None = None,
+) -> pd.DataFrame:
+    """Atribui uma versao nova a um catalogo alterado (ex: por uma operacao CRUD)
+
+    Todas as alteracoes ao catalogo tem de passar por aqui, incluindo as feitas sobre
+    `df` no proprio lugar: com a mesma versao, as estruturas derivadas e a cache dos
+    filtros continuariam a servir os dados antigos.
+
+    Se `parent` for o catalogo completo da versao anterior e `changed` os IDs dos
+    eventos alterados, as estruturas derivadas com o metodo `updated(df, changed)`
+    sao atualizadas incrementalmente para a versao nova. As restantes sao construidas
+    apenas quando pedidas.
+
+    Args:
+        df (pd.DataFrame): catalogo alterado
+        parent (pd.DataFrame | None): catalogo antes da alteracao
+        changed (Iterable[int] | None): IDs dos eventos alterados
+
+    Returns:
+        pd.DataFrame: o mesmo catalogo, com a versao nova
+    """
+    oldVersion = None if parent is None else version(parent)
+    base = None if parent is None else root(parent)
+    register(df, build=False)
+
+    if (
+        base is not None
+        and changed is not None
+        and len(parent) == len(base)  # type: ignore
+    ):
+        newVersion = version(df)
+        changed = set(changed)
+        for (v, name), value in list(_derived.items()):
+            if v == oldVersion and hasattr(value, "updated"):
+                _derived[(newVersion, name)] = value.updated(df, changed)  # type: ignore
+
+    # o catalogo da versao anterior foi alterado no proprio lugar: ja nao existe
+    if base is df:
+        _forget(oldVersion)  # type: ignore
+    return df
+
+
+def version(df: pd.DataFrame) -> int | None:
+    """Retorna a versao do catalogo a que `df` pertence
+
+    Args:
+        df (pd.DataFrame): catalogo, ou subconjunto de um catalogo
+
+    Returns:
+        int | None: versao, ou None se `df` nao vier de um catalogo registado
+    """
+    return df.attrs.get(VERSION_ATTR)
+
+
+def root(df: pd.DataFrame) -> pd.DataFrame | None:
+    """Retorna o catalogo completo de onde `df` foi derivada, se ainda existir
+
+    Args:
+        df (pd.DataFrame): catalogo, ou subconjunto de um catalogo
+
+    Returns:
+        pd.DataFrame | None: catalogo completo
+    """
+    ref = _roots.get(version(df))  # type: ignore
+    return ref() if ref is not None else None
+
+
+def derived(
+    df: pd.DataFrame, name: str, builder: Callable[[pd.DataFrame], Any] | None = None
+) -> Any:
+    """Retorna a estrutura `name` do catalogo de `df`, construindo-a se necessario
+
+    A estrutura e construida sobre o catalogo completo e guardada enquanto este
+    existir, uma so vez mesmo quando pedida por varias threads ao mesmo tempo. Para
+    DataFrames que nao vem de um catalogo registado, a estrutura e construida sobre
+    `df` e nao e guardada.
+
+    Args:
+        df (pd.DataFrame): catalogo, ou subconjunto de um catalogo
+        name (str): nome da estrutura
+        builder (Callable[[pd.DataFrame], Any] | None): funcao de construcao
+            (default: a registada com `register_builder`)
+
+    Returns:
+        Any: estrutura derivada
+    """
+    builder = builder or _builders[name]
+    v = version(df)
+    key = (v, name)
+
+    if key in _derived:
+        return _derived[key]
+
+    base = root(df)
+    if base is None:
+        return builder(df)
+
+    with _lock:
+        building = _building.setdefault(key, threading.Lock())
+    with building:
+        if key not in _derived:
+            _derived[key] = builder(base)
+        return _derived[key]
+
+
+def _forget(v: int) -> None:
+    """Funcao privada que liberta as estruturas de uma versao ja sem catalogo
+
+    Args:
+        v (int): versao
+    """
+    _roots.pop(v, None)
+    for key in [k for k in _derived if k[0] == v]:
+        del _derived[key]
+    with _lock:
+        for key in [k for k in _building if k[0] == v]:
+            del _building[key]
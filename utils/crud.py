@@ -4,6 +4,8 @@ from typing import Any
 
 import pandas as pd
 
+from utils import catalog
+
 pd.set_option("display.max_rows", 500)
 pd.set_option("display.max_columns", 500)
 pd.set_option("display.width", 150)
@@ -133,7 +135,7 @@ def delete_event(df: pd.DataFrame, event_id: int) -> pd.DataFrame:
     Returns:
         pd.DataFrame: DataFrame sem o evento.
     """
-    new_df = df.drop(df[df["ID"] == event_id].index)
+    new_df = catalog.bump(df.drop(df[df["ID"] == event_id].index), df, [event_id])
     print(f"Evento {event_id} apagado!")
     return new_df
 
@@ -161,7 +163,7 @@ def delete_table_row(df: pd.DataFrame, event_id: int, row_number: int) -> pd.Dat
         )
         return df
 
-    new_df = df.drop([row_number]).reset_index(drop=True)
+    new_df = catalog.bump(df.drop([row_number]).reset_index(drop=True), df, [event_id])
     print(f"Linha {row_number} apagada com sucesso!")
     return new_df
 
@@ -204,7 +206,9 @@ def create_table_row(
     df_before = df.iloc[:insertion_point]
     df_after = df.iloc[insertion_point:]
 
-    new_df = pd.concat([df_before, new_row_df, df_after], ignore_index=True)
+    new_df = catalog.bump(
+        pd.concat([df_before, new_row_df, df_after], ignore_index=True), df, [event_id]
+    )
     print(f"Linha inserida com sucesso na posição {insertion_point}")
 
     return new_df
@@ -230,6 +234,7 @@ def update_header(df, event_id, new_data):
         if key in df.columns:
             # Atualiza todas as linhas deste evento (ID == event_id) com o novo valor
             df.loc[(df["ID"] == event_id) | df.iloc[0], key] = value
+    catalog.bump(df, df, [event_id, new_data.get("ID", event_id)])
     return f"Header do evento {event_id} atualizado com sucesso."
 
 
@@ -289,6 +294,8 @@ def create_blank_event(df: pd.DataFrame, event_id: int) -> pd.DataFrame:
         pd.DataFrame: Nova DataFrame
     """
     # Primeiro, avança os IDs de todos os eventos seguintes para arranjar espaço
+    # (numa copia: `df` continua a ser a versao anterior do catalogo)
+    df = df.copy()
     df.loc[df["ID"] >= event_id, "ID"] += 1
 
     # Cria 2 linhas novas: uma para o cabeçalho e outra vazia para dados
@@ -301,7 +308,8 @@ def create_blank_event(df: pd.DataFrame, event_id: int) -> pd.DataFrame:
     # Ordena por ID para garantir que fica tudo na ordem certa (mergesort é estável)
     new_df = new_df.sort_values(by="ID", kind="mergesort").reset_index(drop=True)
 
-    return new_df
+    # os IDs mudaram: as estruturas derivadas sao construidas de novo
+    return catalog.bump(new_df)
 
 
 def update_table_row(df: pd.DataFrame, row_line: int, new_data: dict[str, Any]) -> str:
@@ -315,9 +323,12 @@ def update_table_row(df: pd.DataFrame, row_line: int, new_data: dict[str, Any])
     Returns:
         str: AWK de atualização da linha
     """
+    changed = [df.loc[row_line, "ID"]]
     for key, value in new_data.items():
         if key in df.columns:
             df.loc[row_line, key] = value
+    changed.append(df.loc[row_line, "ID"])
+    catalog.bump(df, df, changed)
     return f"Linha {row_line} do evento atualizada com sucesso."
 
 
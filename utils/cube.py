@@ -0,0 +1,281 @@
+# pyright: basic
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from utils import catalog, filters
+from utils.utils import MAG_COLUMN, event_magnitudes
+
+"""Cubo de agregados mensais, materializado
+
+Para cada celula (mes, SZ, VZ, tipo de evento) sao guardados o numero de eventos e,
+para a profundidade e a magnitude, as estatisticas suficientes: n, soma, M2 (soma dos
+quadrados dos desvios), minimo e maximo. Contagens, medias, desvios padrao, minimos
+e maximos de qualquer agrupamento destas dimensoes sao calculados a partir das
+celulas, sem voltar a percorrer o catalogo.
+
+O cubo e construido quando o catalogo e carregado. Uma operacao CRUD atualiza apenas
+as celulas dos eventos alterados (ver `RollupCube.updated`).
+
+"""
+
+CUBE_DIMS = ["Mes", "SZ", "VZ", "Tipo Evento"]
+CUBE_COLUMNS = ["Profundidade", MAG_COLUMN]
+CUBE_STATS = {"count", "mean", "std", "min", "max"}
+
+# valor das dimensoes categoricas quando o evento nao tem zona
+NO_ZONE = "-"
+
+# filtros que correspondem a restricoes sobre as dimensoes do cubo
+_ZONE_FILTERS = {"filter_by_zone", "filter_by_categories"}
+
+
+def _max_magnitude(magnitudes) -> float:
+    """Funcao privada com a maior magnitude da lista de magnitudes de um evento"""
+    if not isinstance(magnitudes, list) or not magnitudes:
+        return np.nan
+    return max(float(m["Magnitude"]) for m in magnitudes)
+
+
+def _event_table(df: pd.DataFrame, from_rows: bool = False) -> pd.DataFrame:
+    """Funcao privada que retorna, por evento, as dimensoes e os valores do cubo
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        from_rows (bool): le as magnitudes diretamente das linhas dos eventos, em
+            vez da tabela de magnitudes do catalogo (que, numa versao nova do
+            catalogo, seria construida de novo para todos os eventos)
+            (default: False)
+
+    Returns:
+        pd.DataFrame: Dataframe indexada pelo ID
+    """
+    events = df.drop_duplicates(subset="ID", keep="first")
+    if from_rows:
+        mags = pd.Series(
+            events["Magnitudes"].map(_max_magnitude).to_numpy(dtype=float),
+            index=events["ID"].to_numpy(),
+        )
+    else:
+        mags = event_magnitudes(events).groupby("ID")["Magnitude"].max()
+
+    table = pd.DataFrame(
+        {
+            "Mes": pd.PeriodIndex(events["Data"], freq="M").asi8,
+            "SZ": events["SZ"].fillna(NO_ZONE).to_numpy(),
+            "VZ": events["VZ"].fillna(NO_ZONE).to_numpy(),
+            "Tipo Evento": events["Tipo Evento"].fillna(NO_ZONE).to_numpy(),
+            "Profundidade": events["Profundidade"].to_numpy(dtype=float),
+            MAG_COLUMN: events["ID"].map(mags).to_numpy(dtype=float),
+        },
+        index=pd.Index(events["ID"].to_numpy(), name="ID"),
+    )
+    return table
+
+
+def _cells(events: pd.DataFrame) -> pd.DataFrame:
+    """Funcao privada que agrega a tabela de eventos nas celulas do cubo"""
+    grouped = events.groupby(CUBE_DIMS, sort=True)
+    cells = pd.DataFrame({"Count": grouped.size()})
+
+    for col in CUBE_COLUMNS:
+        g = grouped[col]
+        cells[f"{col}_n"] = g.count()
+        cells[f"{col}_sum"] = g.sum()
+        dev = events[col] - g.transform("mean")
+        cells[f"{col}_m2"] = (dev * dev).groupby(
+            [events[d] for d in CUBE_DIMS], sort=True
+        ).sum()
+        cells[f"{col}_min"] = g.min()
+        cells[f"{col}_max"] = g.max()
+    return cells
+
+
+class RollupCube:
+    """Agregados por (mes, SZ, VZ, tipo de evento)"""
+
+    def __init__(self, events: pd.DataFrame, cells: pd.DataFrame | None = None):
+        """
+        Args:
+            events (pd.DataFrame): tabela por evento (ver `_event_table`)
+            cells (pd.DataFrame | None): celulas ja calculadas (default: calcula-as)
+        """
+        self.events = events
+        self.cells = _cells(events) if cells is None else cells
+
+    @classmethod
+    def from_catalog(cls, df: pd.DataFrame) -> "RollupCube":
+        """Constroi o cubo a partir de uma DataFrame
+
+        Args:
+            df (pd.DataFrame): Dataframe com eventos
+
+        Returns:
+            RollupCube: cubo
+        """
+        return cls(_event_table(df))
+
+    def updated(self, df: pd.DataFrame, changed: Iterable[int]) -> "RollupCube":
+        """Retorna um cubo novo para o catalogo alterado `df`, recalculando apenas as
+        celulas dos eventos `changed` (antes e depois da alteracao)
+
+        Args:
+            df (pd.DataFrame): catalogo depois da alteracao
+            changed (Iterable[int]): IDs dos eventos alterados
+
+        Returns:
+            RollupCube: cubo atualizado
+        """
+        changed = list(changed)
+        old = self.events[self.events.index.isin(changed)]
+        new = _event_table(df[df["ID"].isin(changed)], from_rows=True)
+
+        events = pd.concat([self.events.drop(old.index), new])
+        keys = pd.MultiIndex.from_frame(pd.concat([old, new])[CUBE_DIMS]).unique()
+
+        affected = events[
+            pd.MultiIndex.from_frame(events[CUBE_DIMS]).isin(keys)
+        ]
+        cells = pd.concat([self.cells.drop(keys, errors="ignore"), _cells(affected)])
+        return RollupCube(events, cells.sort_index())
+
+    def select(self, where: dict[str, Iterable[str]] | None = None) -> pd.DataFrame:
+        """Celulas que satisfazem as restricoes `where`
+
+        Args:
+            where (dict[str, Iterable[str]] | None): valores aceites por dimensao
+
+        Returns:
+            pd.DataFrame: celulas selecionadas
+        """
+        cells = self.cells
+        for dim, values in (where or {}).items():
+            cells = cells[cells.index.get_level_values(dim).isin(list(values))]
+        return cells
+
+    def rollup(
+        self,
+        column: str | None,
+        by: list[str],
+        where: dict[str, Iterable[str]] | None = None,
+    ) -> pd.DataFrame:
+        """Agrega as celulas pelas dimensoes `by`
+
+        Args:
+            column (str | None): coluna, ou None para apenas contar eventos
+            by (list[str]): dimensoes do resultado, de entre `CUBE_DIMS`
+            where (dict[str, Iterable[str]] | None): valores aceites por dimensao
+
+        Returns:
+            pd.DataFrame: Count, e Mean, Std (ddof=1), Min e Max de `column`
+        """
+        cells = self.select(where)
+        keys = [cells.index.get_level_values(d) for d in by]
+        grouped = cells.groupby(keys, sort=True)
+        out = pd.DataFrame({"Count": grouped["Count"].sum()})
+        if column is None:
+            return out
+
+        n = grouped[f"{column}_n"].sum()
+        mean = grouped[f"{column}_sum"].sum() / n.replace(0, np.nan)
+
+        # M2 do grupo = soma dos M2 das celulas + n_i * (media_i - media)^2
+        cellN = cells[f"{column}_n"]
+        cellMean = cells[f"{column}_sum"] / cellN.replace(0, np.nan)
+        groupMean = grouped[f"{column}_sum"].transform("sum") / grouped[
+            f"{column}_n"
+        ].transform("sum")
+        spread = (cellN * (cellMean - groupMean) ** 2).fillna(0)
+        m2 = (cells[f"{column}_m2"] + spread).groupby(keys, sort=True).sum()
+
+        out["Mean"] = mean
+        out["Std"] = np.sqrt(m2 / (n - 1).where(n > 1))
+        out["Min"] = grouped[f"{column}_min"].min()
+        out["Max"] = grouped[f"{column}_max"].max()
+        return out
+
+    def month_stats(
+        self,
+        column: str | None,
+        statistics: Iterable[str],
+        where: dict[str, Iterable[str]] | None = None,
+    ) -> pd.DataFrame:
+        """Estatisticas por mes, no formato de `stats.aggregate`
+
+        Args:
+            column (str | None): coluna, ou None para apenas contar eventos
+            statistics (Iterable[str]): estatisticas, de entre `CUBE_STATS`
+            where (dict[str, Iterable[str]] | None): valores aceites por dimensao
+
+        Returns:
+            pd.DataFrame: uma linha por mes, entre o primeiro e o ultimo mes com eventos;
+                com `column`, `Count` e o numero de eventos com valor
+        """
+        res = self.rollup(column, ["Mes"], where)
+        res = res[res["Count"] > 0]
+
+        if len(res):
+            first, last = int(res.index.min()), int(res.index.max())
+            months = np.arange(first, last + 1)
+        else:
+            months = np.empty(0, dtype=np.int64)
+        res = res.reindex(months)
+        if column is not None:
+            # como em `stats.aggregate`, a contagem de uma coluna ignora os NaN
+            n = self.select(where)[f"{column}_n"].groupby(level="Mes").sum()
+            res["Count"] = n.reindex(months)
+        res["Count"] = res["Count"].fillna(0).astype(np.int64)
+
+        periods = pd.PeriodIndex.from_ordinals(months, freq="M")
+        res.index = pd.DatetimeIndex(
+            periods.to_timestamp(how="end").normalize(), name="Data"
+        )
+        return res[[s.capitalize() for s in statistics]]
+
+
+def get_cube(df: pd.DataFrame) -> RollupCube:
+    """Retorna o cubo do catalogo de `df`
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+
+    Returns:
+        RollupCube: cubo
+    """
+    return catalog.derived(df, "cube", RollupCube.from_catalog)
+
+
+def where_from(df: pd.DataFrame) -> dict[str, set[str]] | None:
+    """Converte os filtros aplicados a `df` em restricoes sobre as dimensoes do cubo
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+
+    Returns:
+        dict[str, set[str]] | None: valores aceites por dimensao, ou None se os
+            filtros aplicados nao puderem ser respondidos pelo cubo
+    """
+    chain = filters.applied_filters(df)
+    if chain is None:
+        return None
+
+    where: dict[str, set[str]] = {}
+    for name, params in chain:
+        if name not in _ZONE_FILTERS:
+            return None
+        if name == "filter_by_zone":
+            criteria = [params]
+        else:
+            criteria = params[0]
+
+        for dim, values in criteria:
+            if dim not in CUBE_DIMS:
+                return None
+            values = {values} if isinstance(values, str) else set(values)
+            where[dim] = where.get(dim, values) & values
+    return where
+
+
+catalog.register_builder("cube", RollupCube.from_catalog)
@@ -0,0 +1,332 @@
+# pyright: basic
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils import catalog, spatial
+from utils.utils import event_magnitudes
+
+"""Declustering: separacao entre sismos principais e eventos dependentes (replicas,
+precursores, enxames)
+
+Metodos:
+    - `gk`: janelas de Gardner & Knopoff (1974). Os eventos sao percorridos por
+      magnitude decrescente; cada evento ainda livre agrupa os eventos livres dentro
+      da sua janela de distancia L(M) e de tempo T(M)
+    - `reasenberg`: ligacao de Reasenberg (1985), simplificada. Os eventos sao
+      percorridos por ordem temporal; cada evento liga-se aos seguintes dentro de um
+      tempo de espera (que cresce com o tempo desde o maior evento do cluster) e de
+      uma distancia de interacao (raio de rutura do maior evento do cluster)
+
+Em ambos os casos os eventos estao ordenados por tempo, e os candidatos de cada
+evento sao uma slice encontrada com `searchsorted`; a distancia so e calculada
+dentro dessa slice. Quando a slice temporal e grande, os candidatos vem do indice
+espacial. O custo total e proporcional ao numero de pares proximos no tempo, e nao
+ao quadrado do numero de eventos.
+
+O resultado e calculado sobre o catalogo completo (a pertenca a um cluster nao
+depende dos filtros aplicados) e guardado por versao do catalogo.
+
+"""
+
+CLUSTER_COL = "Cluster"
+METHODS = ("gk", "reasenberg")
+
+# fracao da janela temporal usada antes do evento (precursores)
+FORESHOCK_RATIO = 1.0
+
+# Reasenberg (1985): fator do raio de interacao, tempos de espera minimo e maximo
+# (dias), probabilidade de observar o evento seguinte, e magnitude de completude
+RFACT = 10.0
+TAU_MIN = 1.0
+TAU_MAX = 10.0
+P_NEXT = 0.95
+XK = 0.5
+XMEFF = 1.5
+
+# acima deste numero de candidatos na janela temporal usa-se o indice espacial
+SPATIAL_MIN = 2048
+
+
+def gk_windows(mags: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Janelas de Gardner & Knopoff (1974)
+
+    Args:
+        mags (np.ndarray): magnitudes
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: distancia (km) e tempo (dias) de cada janela
+    """
+    dist = 10 ** (0.1238 * mags + 0.983)
+    days = np.where(mags >= 6.5, 10 ** (0.032 * mags + 2.7389), 10 ** (0.5409 * mags - 0.547))
+    return dist, days
+
+
+def crack_radius(mags: np.ndarray) -> np.ndarray:
+    """Raio de rutura (km) usado por Reasenberg (Kanamori & Anderson, 1975)
+
+    Args:
+        mags (np.ndarray): magnitudes
+
+    Returns:
+        np.ndarray: raio em km, 0 para eventos sem magnitude
+    """
+    return np.nan_to_num(0.011 * 10 ** (0.4 * mags), nan=0.0)
+
+
+class _Events:
+    """Eventos ordenados por tempo, com as pesquisas de vizinhos da varredura"""
+
+    def __init__(self, df: pd.DataFrame):
+        events = df.drop_duplicates(subset="ID", keep="first").sort_values(
+            "Data", kind="stable"
+        )
+        mags = event_magnitudes(events).groupby("ID")["Magnitude"].max()
+
+        self.ids = events["ID"].to_numpy()
+        self.days = (events["Data"] - events["Data"].min()).dt.total_seconds().to_numpy()
+        self.days = self.days / 86400
+        self.lats = events["Latitude"].to_numpy(dtype=float)
+        self.lons = events["Longitude"].to_numpy(dtype=float)
+        self.mags = events["ID"].map(mags).to_numpy(dtype=float)
+        self._index: spatial.SpatialIndex | None = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def neighbours(
+        self, i: int, start: float, end: float, radius_km: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Eventos entre os tempos `start` e `end` (dias) a menos de `radius_km` do
+        evento `i`
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: posicoes (por ordem temporal) e distancias
+        """
+        lo = np.searchsorted(self.days, start, "left")
+        hi = np.searchsorted(self.days, end, "right")
+
+        if hi - lo > SPATIAL_MIN:
+            if self._index is None:
+                self._index = spatial.SpatialIndex(np.arange(len(self)), self.lats, self.lons)
+            pos = self._index.radius(self.lats[i], self.lons[i], radius_km)
+            pos = np.sort(pos[(pos >= lo) & (pos < hi)])
+        else:
+            pos = np.arange(lo, hi)
+
+        dist = spatial.haversine(self.lats[i], self.lons[i], self.lats[pos], self.lons[pos])
+        keep = dist <= radius_km
+        return pos[keep], dist[keep]
+
+
+def _gardner_knopoff(ev: _Events, foreshock_ratio: float) -> np.ndarray:
+    """Funcao privada com as janelas de Gardner & Knopoff
+
+    Returns:
+        np.ndarray: cluster de cada evento (0 para eventos independentes)
+    """
+    clusters = np.zeros(len(ev), dtype=np.int64)
+    dist, days = gk_windows(ev.mags)
+    nextId = 1
+
+    # magnitudes decrescentes; eventos sem magnitude nao iniciam clusters
+    for i in np.argsort(-ev.mags, kind="stable"):
+        if np.isnan(ev.mags[i]):
+            break
+        if clusters[i]:
+            continue
+
+        t = ev.days[i]
+        pos, _ = ev.neighbours(i, t - foreshock_ratio * days[i], t + days[i], dist[i])
+        pos = pos[clusters[pos] == 0]
+        if len(pos) > 1:
+            clusters[pos] = nextId
+            nextId += 1
+    return clusters
+
+
+def _reasenberg(ev: _Events) -> np.ndarray:
+    """Funcao privada com a ligacao de Reasenberg, com union-find sobre os eventos
+
+    Returns:
+        np.ndarray: cluster de cada evento (0 para eventos independentes)
+    """
+    n = len(ev)
+    parent = np.arange(n)
+    size = np.ones(n, dtype=np.int64)
+    mags = np.nan_to_num(ev.mags, nan=-np.inf)
+    crack = crack_radius(ev.mags)
+    crackMax = float(crack.max()) if n else 0.0
+    # maior evento de cada cluster (indexado pela raiz)
+    big = np.arange(n)
+
+    def _find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def _union(a, b):
+        a, b = _find(a), _find(b)
+        if a == b:
+            return
+        if size[a] < size[b]:
+            a, b = b, a
+        parent[b] = a
+        size[a] += size[b]
+        if mags[big[b]] > mags[big[a]]:
+            big[a] = big[b]
+
+    lnP = -math.log(1 - P_NEXT)
+    for i in range(n):
+        root = _find(i)
+        b = big[root]
+        if size[root] > 1:
+            dm = (1 - XK) * mags[b] - XMEFF
+            elapsed = ev.days[i] - ev.days[b]
+            with np.errstate(over="ignore", invalid="ignore"):
+                tau = lnP * elapsed / 10 ** (2 * (dm - 1) / 3)
+            tau = TAU_MAX if np.isnan(tau) else min(max(tau, TAU_MIN), TAU_MAX)
+        else:
+            tau = TAU_MIN
+
+        reach = RFACT * crack[b]
+        pos, dist = ev.neighbours(i, ev.days[i], ev.days[i] + tau, reach + crackMax)
+        later = pos > i
+        linked = pos[later][dist[later] <= reach + crack[pos[later]]]
+        for j in linked:
+            _union(i, j)
+
+    roots = np.array([_find(i) for i in range(n)])
+    clustered = size[roots] > 1
+    clusters = np.zeros(n, dtype=np.int64)
+    codes, _ = pd.factorize(roots[clustered])
+    clusters[clustered] = codes + 1
+    return clusters
+
+
+def decluster(
+    df: pd.DataFrame, method: str = "gk", foreshock_ratio: float = FORESHOCK_RATIO
+) -> pd.DataFrame:
+    """Agrupa os eventos em clusters e identifica o sismo principal de cada um
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        method (str): metodo, de entre `METHODS` (default: `gk`)
+        foreshock_ratio (float): fracao da janela temporal de Gardner & Knopoff usada
+            antes do evento (default: `FORESHOCK_RATIO`)
+
+    Raises:
+        ValueError: se o metodo for desconhecido
+
+    Returns:
+        pd.DataFrame: indexada pelo ID, com `Cluster` (0 para eventos independentes)
+            e `Principal` (True para eventos independentes e para o maior evento de
+            cada cluster)
+    """
+    ev = _Events(df)
+    match method:
+        case "gk":
+            clusters = _gardner_knopoff(ev, foreshock_ratio)
+        case "reasenberg":
+            clusters = _reasenberg(ev)
+        case _:
+            raise ValueError(f"Metodo de declustering desconhecido: {method}")
+
+    # principal: maior magnitude do cluster, e o mais antigo em caso de empate
+    main = clusters == 0
+    order = np.lexsort((ev.days, -np.nan_to_num(ev.mags, nan=-np.inf), clusters))
+    ordered = clusters[order]
+    first = np.r_[True, ordered[1:] != ordered[:-1]]
+    main[order[first & (ordered != 0)]] = True
+
+    return pd.DataFrame(
+        {CLUSTER_COL: clusters, "Principal": main},
+        index=pd.Index(ev.ids, name="ID"),
+    )
+
+
+def get_clusters(df: pd.DataFrame, method: str = "gk") -> pd.DataFrame:
+    """Retorna o declustering do catalogo de `df`, calculado uma vez por versao
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        method (str): metodo, de entre `METHODS` (default: `gk`)
+
+    Returns:
+        pd.DataFrame: ver `decluster`
+    """
+    if method not in METHODS:
+        raise ValueError(f"Metodo de declustering desconhecido: {method}")
+    return catalog.derived(
+        df, f"clusters_{method}", lambda base: decluster(base, method)
+    )
+
+
+def add_clusters(df: pd.DataFrame, method: str = "gk") -> pd.DataFrame:
+    """Retorna uma copia de `df` com a coluna `Cluster` (0 para eventos independentes)
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        method (str): metodo, de entre `METHODS` (default: `gk`)
+
+    Returns:
+        pd.DataFrame: Dataframe com a coluna `Cluster`
+    """
+    clusters = get_clusters(df, method)[CLUSTER_COL]
+    return df.assign(**{CLUSTER_COL: df["ID"].map(clusters).to_numpy()})
+
+
+def cluster_stats(df: pd.DataFrame, method: str = "gk") -> pd.DataFrame:
+    """Estatisticas de cada cluster com eventos em `df`
+
+    Os clusters sao os do catalogo completo; as estatisticas usam apenas os eventos
+    de `df` (ex: depois de aplicados filtros).
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        method (str): metodo, de entre `METHODS` (default: `gk`)
+
+    Returns:
+        pd.DataFrame: indexada pelo `Cluster` (sem os eventos independentes), com `N`,
+            `Principal` (ID do sismo principal), `Inicio`, `Fim`, `Dias`,
+            `Magnitude` (maxima) e `Profundidade` (media)
+    """
+    events = add_clusters(df.drop_duplicates(subset="ID", keep="first"), method)
+    events = events[events[CLUSTER_COL].to_numpy() > 0]
+    mags = event_magnitudes(events).groupby("ID")["Magnitude"].max()
+    events = events.assign(Magnitude=events["ID"].map(mags).to_numpy(dtype=float))
+
+    clusters = get_clusters(df, method)
+    main = clusters[clusters["Principal"] & (clusters[CLUSTER_COL] > 0)]
+    g = events.groupby(CLUSTER_COL, sort=True)
+    res = pd.DataFrame(
+        {
+            "N": g.size(),
+            "Inicio": g["Data"].min(),
+            "Fim": g["Data"].max(),
+            "Magnitude": g["Magnitude"].max(),
+            "Profundidade": g["Profundidade"].mean(),
+        }
+    )
+    res.insert(1, "Principal", res.index.map(pd.Series(main.index, main[CLUSTER_COL])))
+    res.insert(4, "Dias", (res["Fim"] - res["Inicio"]) / pd.Timedelta(days=1))
+    return res
+
+
+def mainshock_ids(df: pd.DataFrame, method: str = "gk") -> np.ndarray:
+    """IDs dos sismos principais (independentes ou o maior de cada cluster)
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        method (str): metodo, de entre `METHODS` (default: `gk`)
+
+    Returns:
+        np.ndarray: IDs
+    """
+    clusters = get_clusters(df, method)
+    return clusters.index[clusters["Principal"]].to_numpy()
@@ -0,0 +1,116 @@
+# pyright: basic
+
+import os
+
+import pandas as pd
+
+from utils import parser
+from utils.utils import MAG_COLUMN, event_magnitudes
+
+"""Catalogo de eventos pre-construido, uma linha por evento
+
+O parse do ficheiro de dados produz uma linha por leitura de estacao. Para os mapas
+(ver `utils/vis.py`) so interessam os eventos: o catalogo de eventos e construido uma
+vez a partir do ficheiro de dados e guardado em `ARTIFACT` (pickle do pandas), com o
+caminho, o tamanho e a data de modificacao do ficheiro de origem e a versao do
+formato do catalogo. Enquanto nada disto mudar, `load` le diretamente o catalogo
+guardado, sem voltar a fazer o parse.
+
+O catalogo pode ser construido antecipadamente com
+`python earthquakes.py -e [-f dados.txt]`.
+
+"""
+
+# na raiz do projeto, ao lado da cache de figuras (ver `figcache.CACHE_DIR`)
+ARTIFACT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "eventos.pkl"
+)
+
+# colunas do catalogo de eventos, alem de `Magnitude` (a maxima do evento)
+EVENT_COLS = [
+    "ID",
+    "Data",
+    "Latitude",
+    "Longitude",
+    "Profundidade",
+    "Gap",
+    "Tipo Evento",
+    "Regiao",
+    "SZ",
+    "VZ",
+]
+
+# muda sempre que o conteudo do catalogo (`EVENT_COLS`, `event_table`) muda, para
+# invalidar os catalogos ja guardados
+SCHEMA_VERSION = 1
+
+
+def _stamp(src: str) -> tuple:
+    """Funcao privada que identifica o catalogo construido a partir de `src`: versao
+    do formato, colunas, caminho do ficheiro de origem e versao do ficheiro"""
+    st = os.stat(src)
+    return (
+        SCHEMA_VERSION,
+        tuple(EVENT_COLS),
+        os.path.abspath(src),
+        st.st_size,
+        st.st_mtime_ns,
+    )
+
+
+def event_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Uma linha por evento, com a magnitude maxima de cada evento
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+
+    Returns:
+        pd.DataFrame: colunas `EVENT_COLS` e `Magnitude`, pela ordem do catalogo
+    """
+    mags = event_magnitudes(df).groupby("ID")[MAG_COLUMN].max()
+    events = df.drop_duplicates(subset="ID", keep="first")[EVENT_COLS]
+    events = events.reset_index(drop=True)
+    events[MAG_COLUMN] = events["ID"].map(mags).to_numpy(dtype=float)
+    return events
+
+
+def build(src: str, dest: str = ARTIFACT) -> pd.DataFrame:
+    """Faz o parse do ficheiro de dados e guarda o catalogo de eventos
+
+    Args:
+        src (str): ficheiro de dados
+        dest (str): ficheiro do catalogo de eventos (default: `ARTIFACT`)
+
+    Returns:
+        pd.DataFrame: catalogo de eventos (ver `event_table`)
+    """
+    stamp = _stamp(src)
+    events = event_table(parser.parse(src))
+
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    pd.to_pickle({"fonte": stamp, "eventos": events}, tmp)
+    os.replace(tmp, dest)
+    return events
+
+
+def load(src: str, dest: str = ARTIFACT) -> pd.DataFrame:
+    """Catalogo de eventos guardado, ou construido de novo se tiver sido construido
+    a partir de outro ficheiro, de outra versao do ficheiro ou com outro formato (ou
+    se ainda nao existir)
+
+    Args:
+        src (str): ficheiro de dados
+        dest (str): ficheiro do catalogo de eventos (default: `ARTIFACT`)
+
+    Returns:
+        pd.DataFrame: catalogo de eventos (ver `event_table`)
+    """
+    try:
+        saved = pd.read_pickle(dest)
+    except (FileNotFoundError, EOFError):
+        return build(src, dest)
+
+    if saved.get("fonte") != _stamp(src):
+        return build(src, dest)
+    return saved["eventos"]
@@ -0,0 +1,260 @@
+# pyright: basic
+
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+from typing import Any, Callable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import catalog
+
+"""Cache de figuras em disco, enderecada pelo conteudo
+
+A chave de uma figura e um hash da funcao de plot e dos seus argumentos (os dados ja
+preparados: contagens, estatisticas, coordenadas), e nao do catalogo completo. Duas
+vistas com os mesmos dados partilham a mesma imagem, entre sessoes e entre a escrita
+de graficos para ficheiros (`visuals.draw`, `render.py`) e a app Dash (`vis.py`).
+
+Dentro de uma sessao, a preparacao dos dados tambem e evitada: para a mesma versao do
+catalogo e os mesmos eventos (ver `catalog.py`), o resultado da preparacao e
+reutilizado (`prepared`). O menu T6 usa apenas esta parte: as figuras interativas
+sao sempre desenhadas de novo, a partir dos dados ja preparados.
+
+Os ficheiros ficam em `CACHE_DIR` (`<chave>.<ext>`: png, svg, pdf, ou json para
+figuras plotly). Quando o tamanho total passa de `MAX_BYTES`, os ficheiros usados ha
+mais tempo sao apagados.
+
+"""
+
+# na raiz do projeto, qualquer que seja o diretorio de onde o programa e corrido
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "figuras"
+)
+MAX_BYTES = 256 * 2**20
+
+# muda sempre que o desenho das figuras muda, para invalidar a cache
+CACHE_VERSION = 1
+
+# numero de preparacoes de dados guardadas em memoria
+MEMO_SIZE = 64
+
+
+def _feed(h, obj: Any) -> None:
+    """Funcao privada que junta um valor ao hash, de forma canonica"""
+    if isinstance(obj, (pd.Index, pd.Series)):
+        obj = obj.to_numpy()
+    if isinstance(obj, np.ndarray):
+        h.update(f"a{obj.dtype}{obj.shape}".encode())
+        if obj.dtype == object:
+            for x in obj:
+                _feed(h, x)
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(f"d{len(obj)}".encode())
+        for k in sorted(obj, key=str):
+            _feed(h, k)
+            _feed(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"l{len(obj)}".encode())
+        for x in obj:
+            _feed(h, x)
+    elif callable(obj):
+        h.update(f"f{obj.__module__}.{obj.__qualname__}".encode())
+    else:
+        h.update(f"v{type(obj).__name__}:{obj!r}".encode())
+
+
+def content_key(*parts: Any) -> str:
+    """Chave de uma figura a partir da funcao de plot e dos seus argumentos
+
+    Args:
+        *parts (Any): partes da chave (funcoes, arrays, dicts, escalares); devem
+            incluir a versao da biblioteca que desenha a figura
+
+    Returns:
+        str: hash sha256, em hexadecimal
+    """
+    h = hashlib.sha256()
+    _feed(h, (CACHE_VERSION, parts))
+    return h.hexdigest()
+
+
+def data_key(df: pd.DataFrame) -> tuple | None:
+    """Identifica os dados de `df` dentro da sessao: versao do catalogo e eventos
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+
+    Returns:
+        tuple | None: chave, ou None se `df` nao vier de um catalogo registado
+    """
+    v = catalog.version(df)
+    if v is None:
+        return None
+    ids = pd.util.hash_array(df["ID"].to_numpy())
+    return (v, len(df), hashlib.sha1(ids.tobytes()).hexdigest())
+
+
+class FigureCache:
+    """Ficheiros de figuras num diretorio, com limite de tamanho"""
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        """
+        Args:
+            root (str): diretorio da cache (default: `CACHE_DIR`)
+            max_bytes (int): tamanho maximo (default: `MAX_BYTES`)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self._memo: OrderedDict[tuple, Any] = OrderedDict()
+
+    def path(self, key: str, ext: str) -> str:
+        """Caminho do ficheiro de uma figura na cache"""
+        return os.path.join(self.root, f"{key}.{ext}")
+
+    def get(self, key: str, ext: str) -> str | None:
+        """Caminho da figura, se estiver na cache (e marca-a como usada)
+
+        Args:
+            key (str): chave (ver `content_key`)
+            ext (str): formato
+
+        Returns:
+            str | None: caminho, ou None se a figura nao estiver na cache
+        """
+        path = self.path(key, ext)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(
+        self, key: str, exts: Sequence[str], write: Callable[[list[str]], None]
+    ) -> list[str]:
+        """Guarda uma figura na cache, num ou mais formatos
+
+        A figura e escrita em ficheiros temporarios, que depois sao renomeados, para
+        que processos em paralelo nunca leiam um ficheiro incompleto.
+
+        Args:
+            key (str): chave (ver `content_key`)
+            exts (Sequence[str]): formatos
+            write (Callable[[list[str]], None]): funcao que escreve a figura nos
+                ficheiros dados, um por formato
+
+        Returns:
+            list[str]: caminhos da figura na cache, um por formato
+        """
+        os.makedirs(self.root, exist_ok=True)
+        tmps = [
+            os.path.join(self.root, f"{key}.{os.getpid()}.tmp.{ext}") for ext in exts
+        ]
+        write(tmps)
+        paths = [self.path(key, ext) for ext in exts]
+        for tmp, path in zip(tmps, paths):
+            os.replace(tmp, path)
+        return paths
+
+    def copy(self, key: str, ext: str, dest: str) -> bool:
+        """Copia uma figura da cache para `dest`
+
+        Returns:
+            bool: True se a figura estava na cache
+        """
+        path = self.get(key, ext)
+        if path is None:
+            return False
+        shutil.copyfile(path, dest)
+        return True
+
+    def evict(self) -> int:
+        """Apaga as figuras usadas ha mais tempo ate a cache caber em `max_bytes`
+
+        Returns:
+            int: numero de ficheiros apagados
+        """
+        try:
+            entries = [e for e in os.scandir(self.root) if e.is_file()]
+        except FileNotFoundError:
+            return 0
+
+        stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+        total = sum(size for _, size, _ in stats)
+        removed = 0
+        for _, size, path in sorted(stats):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def prepared(
+        self, df: pd.DataFrame, name: str, args: tuple, prepare: Callable[..., Any]
+    ) -> Any:
+        """Resultado de `prepare(df, *args)`, reutilizado enquanto os dados de `df`
+        (versao do catalogo e eventos) nao mudarem
+
+        Args:
+            df (pd.DataFrame): Dataframe com eventos
+            name (str): nome da preparacao
+            args (tuple): restantes argumentos de `prepare`
+            prepare (Callable[..., Any]): funcao que prepara os dados
+
+        Returns:
+            Any: resultado de `prepare`
+        """
+        dk = data_key(df)
+        if dk is None:
+            return prepare(df, *args)
+
+        key = (dk, name, args)
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            return self._memo[key]
+
+        value = prepare(df, *args)
+        self._memo[key] = value
+        if len(self._memo) > MEMO_SIZE:
+            self._memo.popitem(last=False)
+        return value
+
+    def plotly(self, key: str, build: Callable[[], Any]) -> Any:
+        """Figura plotly da cache (a sua especificacao JSON), ou construida e guardada
+
+        Args:
+            key (str): chave (ver `content_key`)
+            build (Callable[[], Any]): funcao que constroi a figura
+
+        Returns:
+            Any: `plotly.graph_objects.Figure`
+        """
+        import plotly.io as pio
+
+        path = self.get(key, "json")
+        if path is not None:
+            return pio.read_json(path)
+
+        fig = build()
+        self.put(key, ("json",), lambda tmps: pio.write_json(fig, tmps[0]))
+        self.evict()
+        return fig
+
+
+_default: FigureCache | None = None
+
+
+def get_cache() -> FigureCache:
+    """Cache por omissao, em `CACHE_DIR`"""
+    global _default
+    if _default is None:
+        _default = FigureCache()
+    return _default
@@ -1,26 +1,292 @@
+import functools
+import inspect
 import os
+import re
 import sys
+from collections import OrderedDict
 from datetime import datetime
+from typing import Any, Callable
 
+import numpy as np
 import pandas as pd
 
+from utils import bitmap, catalog, declustering, spatial
+from utils.utils import event_magnitudes
 
-def filter_by_date(df: pd.DataFrame, start_date: str, end_date: str) -> pd.DataFrame:
-    """Retorna uma nova DataFrame filtrada por datas de inicio e fim
+# -- cache de resultados
+
+FILTERS_ATTR = "filtros"
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# filtros cujo resultado depende dos filtros aplicados antes (nao comutam)
+ORDERED_FILTERS = {"filter_by_nearest"}
+
+type Step = tuple[str, tuple[Any, ...]]
+
+
+class FilterCache:
+    """Cache LRU dos resultados dos filtros, limitada em memoria.
+
+    Cada entrada associa (versao do catalogo, cadeia de filtros normalizada) as
+    posicoes das linhas selecionadas no catalogo completo. Resultados contiguos
+    (ex: intervalos de datas) sao guardados como `slice`.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, np.ndarray | slice] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _size(value: np.ndarray | slice) -> int:
+        return value.nbytes if isinstance(value, np.ndarray) else 64
+
+    def get(self, key: tuple) -> np.ndarray | slice | None:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: tuple, value: np.ndarray | slice) -> None:
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self.nbytes -= self._size(self._entries.pop(key))
+
+        self._entries[key] = value
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.nbytes -= self._size(old)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = self.hits = self.misses = 0
+
+
+_cache = FilterCache()
+
+
+def _normalize_value(value: Any) -> Any:
+    """Funcao privada que torna um argumento de um filtro hashable e comparavel"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize_value(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(_normalize_value(v) for v in value)
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def normalize_chain(chain: tuple[Step, ...]) -> tuple[Step, ...]:
+    """Normaliza uma cadeia de filtros.
+
+    Filtros que comutam sao ordenados e repeticoes sao removidas; a ordem so e
+    mantida em torno dos filtros de `ORDERED_FILTERS`.
+
+    Args:
+        chain (tuple[Step, ...]): cadeia de filtros pela ordem aplicada
+
+    Returns:
+        tuple[Step, ...]: cadeia normalizada
+    """
+    normalized: list[Step] = []
+    segment: set[Step] = set()
+
+    for step in chain:
+        if step[0] in ORDERED_FILTERS:
+            normalized.extend(sorted(segment, key=repr))
+            normalized.append(step)
+            segment = set()
+        else:
+            segment.add(step)
+    normalized.extend(sorted(segment, key=repr))
+    return tuple(normalized)
+
+
+def applied_filters(df: pd.DataFrame) -> tuple[Step, ...] | None:
+    """Retorna a cadeia normalizada de filtros aplicados ao catalogo para obter `df`.
+
+    Retorna None se `df` nao for o resultado de filtros sobre um catalogo registado
+    (ex: tabela de eventos unicos, ou com colunas acrescentadas), caso em que a cache
+    nao e usada.
+
+    Args:
+        df (pd.DataFrame): DataFrame filtrada
+
+    Returns:
+        tuple[Step, ...] | None: cadeia de filtros, vazia para o catalogo completo
+    """
+    base = catalog.root(df)
+    if base is None or not df.columns.equals(base.columns):
+        return None
+
+    chain, nrows = df.attrs.get(FILTERS_ATTR, ((), len(base)))
+    return chain if nrows == len(df) else None
+
+
+def _positions(base: pd.DataFrame, df: pd.DataFrame) -> np.ndarray | slice | None:
+    """Funcao privada que retorna as posicoes das linhas de `df` no catalogo `base`"""
+    pos = base.index.get_indexer(df.index)
+    if len(pos) and pos.min() < 0:
+        return None
+    if len(pos) == 0 or pos[-1] - pos[0] + 1 == len(pos) and np.all(np.diff(pos) == 1):
+        start = int(pos[0]) if len(pos) else 0
+        return slice(start, start + len(pos))
+    return pos
+
+
+def memoized(func: Callable[..., pd.DataFrame]) -> Callable[..., pd.DataFrame]:
+    """Decorador que guarda os resultados de um filtro na cache LRU.
+
+    A chave e a versao do catalogo mais a cadeia normalizada de filtros ja aplicados,
+    incluindo o atual. Operacoes CRUD mudam a versao, invalidando os resultados antigos.
+
+    Args:
+        func (Callable[..., pd.DataFrame]): filtro, com a DataFrame como 1o argumento
+
+    Returns:
+        Callable[..., pd.DataFrame]: filtro com cache
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(df: pd.DataFrame, *args, **kwargs) -> pd.DataFrame:
+        bound = signature.bind(df, *args, **kwargs)
+        bound.apply_defaults()
+        params = tuple(_normalize_value(v) for v in list(bound.arguments.values())[1:])
+
+        chain = applied_filters(df)
+        if chain is None:
+            return func(df, *args, **kwargs)
+
+        newChain = normalize_chain(chain + ((func.__name__, params),))
+        key = (catalog.version(df), newChain)
+        base = catalog.root(df)
+
+        cached = _cache.get(key)
+        if cached is not None and base is not None:
+            result = base.iloc[cached]
+        else:
+            result = func(df, *args, **kwargs)
+            pos = _positions(base, result) if base is not None else None
+            if pos is None:
+                return result
+            _cache.put(key, pos)
+
+        result.attrs = {**result.attrs, FILTERS_ATTR: (newChain, len(result))}
+        return result
+
+    return wrapper
+
+
+# -- filtros
+
+type DateLike = str | datetime | pd.Timestamp
+
+WINDOW_UNITS = {
+    "h": "hours",
+    "hora": "hours",
+    "hour": "hours",
+    "d": "days",
+    "dia": "days",
+    "day": "days",
+    "w": "weeks",
+    "semana": "weeks",
+    "week": "weeks",
+    "m": "months",
+    "mes": "months",
+    "month": "months",
+    "y": "years",
+    "ano": "years",
+    "year": "years",
+}
+
+_WINDOW_RE = re.compile(
+    r"^(?:last|ultim[oa]s?|últim[oa]s?)?\s*(\d+)\s*([a-zçê]+?)(?:e?s)?$"
+)
+
+
+def parse_window(window: str) -> pd.DateOffset:
+    """Converte uma janela relativa (ex: `7d`, `24h`, `last 7 days`, `ultimos 2 meses`)
+    num `pd.DateOffset`
+
+    Args:
+        window (str): janela relativa
+
+    Raises:
+        ValueError: se a janela nao for reconhecida
+
+    Returns:
+        pd.DateOffset: deslocamento correspondente a janela
+    """
+    match = _WINDOW_RE.match(window.strip().lower())
+    unit = match and WINDOW_UNITS.get(match.group(2).replace("ê", "e"))
+    if not unit:
+        raise ValueError(f"Janela temporal desconhecida: {window}")
+    return pd.DateOffset(**{unit: int(match.group(1))})
+
+
+@memoized
+def filter_by_date(
+    df: pd.DataFrame, start_date: DateLike, end_date: DateLike
+) -> pd.DataFrame:
+    """Retorna uma DataFrame filtrada por datas de inicio e fim (inclusive)
+
+    As datas sao convertidas uma unica vez. Se o catalogo estiver ordenado pela
+    hora de origem (como retornado pelo `parser.parse`), os limites sao encontrados
+    por pesquisa binaria e o resultado e uma slice da DataFrame original, sem copia.
 
     Args:
         df (pd.DataFrame): DataFrame a filtrar
-        start_date (str): data de inicio, em formato ISO
-        end_date (str): data de fim, em formato ISO
+        start_date (DateLike): data de inicio, em formato ISO
+        end_date (DateLike): data de fim, em formato ISO
 
     Returns:
         pd.DataFrame: DataFrame filtrada
     """
-    # FIX: filtragem por datas usando datetime
-    mask = (df["Data"] >= start_date) & (df["Data"] <= end_date)
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    dates = df["Data"]
+
+    if dates.is_monotonic_increasing:
+        lo = dates.searchsorted(start, side="left")
+        hi = dates.searchsorted(end, side="right")
+        return df.iloc[lo:hi]
+
+    mask = (dates >= start) & (dates <= end)
     return df.loc[mask]
 
 
+def filter_by_last(
+    df: pd.DataFrame, window: str, reference: DateLike | None = None
+) -> pd.DataFrame:
+    """Retorna uma DataFrame com os eventos de uma janela relativa (ex: "last 7 days")
+
+    Args:
+        df (pd.DataFrame): DataFrame a filtrar
+        window (str): janela relativa, ver `parse_window`
+        reference (DateLike | None): fim da janela (default: agora)
+
+    Returns:
+        pd.DataFrame: DataFrame filtrada
+    """
+    end = pd.Timestamp.now() if reference is None else pd.Timestamp(reference)
+    return filter_by_date(df, end - parse_window(window), end)
+
+
+@memoized
 def filter_by_depth(
     df: pd.DataFrame, min_depth: float, max_depth: float
 ) -> pd.DataFrame:
@@ -38,39 +304,76 @@ def filter_by_depth(
     return df.loc[mask]
 
 
+@memoized
+def filter_by_range(
+    df: pd.DataFrame, column: str, min_val: float, max_val: float
+) -> pd.DataFrame:
+    """Retorna uma nova DataFrame, filtrada entre um intervalo de valores de uma coluna
+
+    Args:
+        df (pd.DataFrame): DataFrame a filtrar
+        column (str): coluna numerica (ex: Gap, Latitude)
+        min_val (float): valor minimo
+        max_val (float): valor maximo
+
+    Returns:
+        pd.DataFrame: DataFrame filtrada
+    """
+    mask = (df[column] >= min_val) & (df[column] <= max_val)
+    return df.loc[mask]
+
+
+@memoized
 def filter_by_magnitude(
-    df: pd.DataFrame, min_mag: float, max_mag: float, mag_type: str = "L"
+    df: pd.DataFrame,
+    min_mag: float,
+    max_mag: float,
+    mag_type: str = "L",
+    mode: str = "max",
 ) -> pd.DataFrame:
     """Retorna uma nova DataFrame, filtrada entre um intervalo de magnitudes.
 
-    [description]
+    A comparacao e feita de forma vetorizada sobre a tabela de magnitudes por
+    evento, sendo o resultado propagado para as linhas das estacoes pelo ID.
+
+    Modos disponiveis:
+        - `max`: o maximo das magnitudes do tipo `mag_type` esta no intervalo
+        - `type`: qualquer magnitude do tipo `mag_type` esta no intervalo
+        - `any`: qualquer magnitude, de qualquer tipo, esta no intervalo
 
     Args:
         df (pd.DataFrame): DataFrame a filtrar
         min_mag (float): magnitude minima
         max_mag (float): magnitude maxima
         mag_type (str): Tipo de magnitude a filtrar (default: `'L'`)
+        mode (str): Modo de comparacao, `max`, `type` ou `any` (default: `'max'`)
 
     Returns:
         pd.DataFrame: DataFrame filtrada
     """
+    mags = event_magnitudes(df)
 
-    def _filter_mag(mags):
-        # Filtrar por tipo de magnitude específico
-        vals = [float(m["Magnitude"]) for m in mags if m.get("Tipo") == mag_type]
-        if not vals:
-            return False
-        # Se houver múltiplas magnitudes do mesmo tipo, usa o máximo para filtragem
-        mx = max(vals)
-        return min_mag <= mx <= max_mag
+    if mode != "any":
+        mags = mags[mags["Tipo"] == mag_type]
 
-    mask = df["Magnitudes"].apply(_filter_mag)
+    if mode == "max":
+        # Se houver múltiplas magnitudes do mesmo tipo, usa o máximo para filtragem
+        mx = mags.groupby("ID")["Magnitude"].max()
+        ids = mx.index[(mx >= min_mag) & (mx <= max_mag)]
+    elif mode in ("type", "any"):
+        inRange = (mags["Magnitude"] >= min_mag) & (mags["Magnitude"] <= max_mag)
+        ids = mags.loc[inRange, "ID"].unique()
+    else:
+        raise ValueError(f"Modo de magnitude desconhecido: {mode}")
+
+    mask = df["ID"].isin(ids)
     return df.loc[mask]
 
 
 # -- t7 filters
 
 
+@memoized
 def filter_by_gap(df: pd.DataFrame, max_gap: float) -> pd.DataFrame:
     """Retorna uma nova DataFrame, filtrada por valores do GAP inferiores a `max_gap`
 
@@ -85,45 +388,232 @@ def filter_by_gap(df: pd.DataFrame, max_gap: float) -> pd.DataFrame:
     return df[df["Gap"] <= max_gap]
 
 
-def filter_by_quality(df: pd.DataFrame, quality: str) -> pd.DataFrame:
+@memoized
+def filter_by_quality(df: pd.DataFrame, quality: str | list[str]) -> pd.DataFrame:
     """Retorna uma nova DataFrame para eventos apenas com qualidade especificada
 
     Args:
         df (pd.DataFrame): DataFrame a filtrar
-        quality (str): Qualidade a filtrar
+        quality (str | list[str]): Qualidade, ou lista de qualidades, a filtrar
 
     Returns:
         pd.DataFrame: DataFrame filtrada
     """
-    return df[df["Pub"] == quality]
+    return _select_categories(df, {"Pub": quality})
 
 
-def filter_by_zone(df: pd.DataFrame, zone_type: str, zone_val: str) -> pd.DataFrame:
-    """Retorna uma nova DataFrame para eventos de uma certa zona
+@memoized
+def filter_by_zone(
+    df: pd.DataFrame, zone_type: str, zone_val: str | list[str]
+) -> pd.DataFrame:
+    """Retorna uma nova DataFrame para eventos de uma certa zona, ou de uma de varias zonas
 
     Args:
         df (pd.DataFrame): DataFrame a filtrar
         zone_type (str): Tipo da zona, (ex: VZ, SZ)
-        zone_val (str): Valor da zona
+        zone_val (str | list[str]): Valor da zona, ou lista de zonas
+
+    Returns:
+        pd.DataFrame: DataFrame filtrada
+    """
+    return _select_categories(df, {zone_type: zone_val})
+
+
+@memoized
+def filter_by_categories(
+    df: pd.DataFrame, criteria: dict[str, str | list[str]]
+) -> pd.DataFrame:
+    """Retorna uma nova DataFrame filtrada por varias colunas categoricas.
+
+    Usa os indices bitmap do catalogo: um evento e aceite se, em todas as colunas,
+    tiver um dos valores pedidos. Ex: `{"SZ": ["SZ06", "SZ07"], "Pub": "EPI",
+    "Tipo Evento": "Quake"}`
+
+    Args:
+        df (pd.DataFrame): DataFrame a filtrar
+        criteria (dict[str, str | list[str]]): valores aceites por coluna; as
+            colunas de `bitmap.CATEGORICAL_COLS` usam o indice bitmap
 
     Returns:
         pd.DataFrame: DataFrame filtrada
     """
-    return df[df[zone_type] == zone_val]
+    return _select_categories(df, criteria)
+
+
+def _select_categories(
+    df: pd.DataFrame, criteria: dict[str, str | list[str]]
+) -> pd.DataFrame:
+    """Funcao privada que seleciona as linhas dos eventos que satisfazem `criteria`,
+    atraves do indice bitmap
+
+    As colunas sem indice bitmap (ex: `Regiao`) sao filtradas com uma mascara
+    booleana sobre as linhas.
+
+    Args:
+        df (pd.DataFrame): DataFrame a filtrar
+        criteria (dict[str, str | list[str]]): valores aceites por coluna
+
+    Returns:
+        pd.DataFrame: DataFrame filtrada
+    """
+    index = bitmap.get_index(df)
+    indexed = {col: v for col, v in criteria.items() if col in index.bitmaps}
+
+    mask = np.ones(len(df), dtype=bool)
+    if indexed:
+        mask &= df["ID"].isin(index.select(indexed)).to_numpy()
+    for col, values in criteria.items():
+        if col not in indexed:
+            values = [values] if isinstance(values, str) else list(values)
+            mask &= df[col].isin(values).to_numpy()
+    return df.loc[mask]
+
+
+@memoized
+def filter_by_mainshocks(df: pd.DataFrame, method: str = "gk") -> pd.DataFrame:
+    """Retorna uma nova DataFrame apenas com os sismos principais: eventos
+    independentes e o maior evento de cada cluster (replicas, enxames)
+
+    Args:
+        df (pd.DataFrame): DataFrame a filtrar
+        method (str): metodo de declustering, de entre `declustering.METHODS`
+            (default: `gk`)
+
+    Returns:
+        pd.DataFrame: DataFrame filtrada
+    """
+    return df.loc[df["ID"].isin(declustering.mainshock_ids(df, method))]
+
+
+def _parse_list(text: str) -> list[str]:
+    """Funcao privada que le uma lista de valores separados por virgulas
+
+    Args:
+        text (str): texto com os valores (ex: `SZ06, SZ07`)
+
+    Returns:
+        list[str]: valores
+    """
+    return [v.strip() for v in text.split(",") if v.strip()]
+
+
+# -- filtros espaciais
+
+
+@memoized
+def filter_by_bbox(
+    df: pd.DataFrame, lat_min: float, lat_max: float, lon_min: float, lon_max: float
+) -> pd.DataFrame:
+    """Retorna uma nova DataFrame com os eventos dentro de uma caixa de coordenadas
+
+    Args:
+        df (pd.DataFrame): DataFrame a filtrar
+        lat_min (float): latitude minima
+        lat_max (float): latitude maxima
+        lon_min (float): longitude minima
+        lon_max (float): longitude maxima
+
+    Returns:
+        pd.DataFrame: DataFrame filtrada
+    """
+    ids = spatial.get_index(df).bbox(lat_min, lat_max, lon_min, lon_max)
+    return df.loc[df["ID"].isin(ids)]
+
+
+@memoized
+def filter_by_radius(
+    df: pd.DataFrame, lat: float, lon: float, radius_km: float
+) -> pd.DataFrame:
+    """Retorna uma nova DataFrame com os eventos a menos de `radius_km` de um ponto
+
+    Args:
+        df (pd.DataFrame): DataFrame a filtrar
+        lat (float): latitude do centro
+        lon (float): longitude do centro
+        radius_km (float): raio, em km
+
+    Returns:
+        pd.DataFrame: DataFrame filtrada
+    """
+    ids = spatial.get_index(df).radius(lat, lon, radius_km)
+    return df.loc[df["ID"].isin(ids)]
+
+
+@memoized
+def filter_by_nearest(df: pd.DataFrame, lat: float, lon: float, k: int) -> pd.DataFrame:
+    """Retorna uma nova DataFrame com os `k` eventos mais proximos de um ponto
+
+    Args:
+        df (pd.DataFrame): DataFrame a filtrar
+        lat (float): latitude do ponto
+        lon (float): longitude do ponto
+        k (int): numero de eventos
+
+    Returns:
+        pd.DataFrame: DataFrame filtrada
+    """
+    ids = spatial.get_index(df).nearest(lat, lon, k, df["ID"].unique())
+    return df.loc[df["ID"].isin(ids)]
+
+
+@memoized
+def filter_by_polygon(
+    df: pd.DataFrame, polygon: list[tuple[float, float]]
+) -> pd.DataFrame:
+    """Retorna uma nova DataFrame com os eventos dentro de um poligono
+
+    Args:
+        df (pd.DataFrame): DataFrame a filtrar
+        polygon (list[tuple[float, float]]): vertices (lat, lon) do poligono
+
+    Returns:
+        pd.DataFrame: DataFrame filtrada
+    """
+    ids = spatial.get_index(df).polygon(polygon)
+    return df.loc[df["ID"].isin(ids)]
+
+
+def _parse_point(text: str) -> tuple[float, float]:
+    """Funcao privada que le um ponto no formato `lat lon` ou `lat,lon`
+
+    Args:
+        text (str): texto com o ponto
+
+    Returns:
+        tuple[float, float]: (latitude, longitude)
+    """
+    lat, lon = text.replace(",", " ").split()
+    return (float(lat), float(lon))
 
 
 FILTER_MENU = """[1] Filtrar por Data (Inicio:Fim)
+[1R] Filtrar por Período Relativo (ex: 7d, 24h, last 7 days)
 [2] Filtrar por Gap (< Valor)
 [3] Filtrar por Qualidade (EPI)
-[4] Filtrar por Zona SZ
-[5] Filtrar por Zona VZ
+[4] Filtrar por Zonas SZ
+[5] Filtrar por Zonas VZ
 [6] Filtrar por Magnitude (Min:Max)
 [7] Filtrar por Profundidade (Min:Max)
+[8] Filtrar por Área (Lat Min:Max, Lon Min:Max)
+[9] Filtrar por Raio (Ponto, km)
+[10] Filtrar pelos K eventos mais próximos
+[11] Filtrar por Polígono
+[12] Filtro Combinado (Zonas SZ/VZ, Qualidade, Tipo de Evento)
+[13] Apenas Sismos Principais (Declustering)
 [R] Reset Filtros
 
 [Q] Voltar
 """
 
+MAG_MODES = {"m": "max", "t": "type", "q": "any"}
+
+COMBINED_PROMPTS = {
+    "SZ": "Zonas SZ (ex: SZ06,SZ07): ",
+    "VZ": "Zonas VZ (ex: VZ14): ",
+    "Pub": "Qualidade (ex: EPI): ",
+    "Tipo Evento": "Tipo de Evento (ex: Quake,Volcanic): ",
+}
+
 
 def filter_menu(db: pd.DataFrame, original_db: pd.DataFrame) -> pd.DataFrame:
     """Menu de filtragem da DataFrame, com base em datas, magnitudes, profundidades, zonas, GAP e qualidades,
@@ -147,10 +637,15 @@ def filter_menu(db: pd.DataFrame, original_db: pd.DataFrame) -> pd.DataFrame:
 
         match usrIn:
             case "1":
-                start = input("Data Inicio (YYYY-MM-DD): ")
-                end = input("Data Fim    (YYYY-MM-DD): ")
+                start = pd.Timestamp(input("Data Inicio (YYYY-MM-DD): "))
+                end = pd.Timestamp(input("Data Fim    (YYYY-MM-DD): "))
                 currDb = filter_by_date(currDb, start, end)
 
+            case "1r":
+                window = input("Período (ex: 7d, 24h, last 7 days): ")
+                ref = input("Até (YYYY-MM-DD, Enter para agora): ")
+                currDb = filter_by_last(currDb, window, ref or None)
+
             case "2":
                 val = float(input("Gap Máximo: "))
                 currDb = filter_by_gap(currDb, val)
@@ -165,25 +660,63 @@ def filter_menu(db: pd.DataFrame, original_db: pd.DataFrame) -> pd.DataFrame:
                     print("Filtro não aplicado.")
 
             case "4":
-                val = input("Zona SZ (ex: SZ31): ")
+                val = _parse_list(input("Zonas SZ (ex: SZ31 ou SZ06,SZ07): "))
                 currDb = filter_by_zone(currDb, "SZ", val)
 
             case "5":
-                val = input("Zona VZ (ex: VZ14): ")
+                val = _parse_list(input("Zonas VZ (ex: VZ14 ou VZ14,VZ15): "))
                 currDb = filter_by_zone(currDb, "VZ", val)
 
             case "6":
-                print("Filtrar por Magnitude Tipo 'L'")
-                min_m = float(input("Min Mag L: "))
-                max_m = float(input("Max Mag L: "))
+                mag_type = input("Tipo de Magnitude (L por defeito): ").upper() or "L"
+                min_m = float(input(f"Min Mag {mag_type}: "))
+                max_m = float(input(f"Max Mag {mag_type}: "))
+                mode = MAG_MODES.get(
+                    input("Modo [M]áximo do tipo, [T]ipo, [Q]ualquer tipo: ").lower(),
+                    "max",
+                )
 
-                currDb = filter_by_magnitude(currDb, min_m, max_m, "L")
+                currDb = filter_by_magnitude(currDb, min_m, max_m, mag_type, mode)
 
             case "7":
                 min_d = float(input("Min Profundidade: "))
                 max_d = float(input("Max Profundidade: "))
                 currDb = filter_by_depth(currDb, min_d, max_d)
 
+            case "8":
+                lat_min, lat_max = map(float, input("Latitude Min:Max: ").split(":"))
+                lon_min, lon_max = map(float, input("Longitude Min:Max: ").split(":"))
+                currDb = filter_by_bbox(currDb, lat_min, lat_max, lon_min, lon_max)
+
+            case "9":
+                lat, lon = _parse_point(input("Centro (lat lon): "))
+                radius = float(input("Raio (km): "))
+                currDb = filter_by_radius(currDb, lat, lon, radius)
+
+            case "10":
+                lat, lon = _parse_point(input("Ponto (lat lon): "))
+                k = int(input("Número de eventos: "))
+                currDb = filter_by_nearest(currDb, lat, lon, k)
+
+            case "11":
+                vertices = input("Vértices (lat lon; lat lon; ...): ")
+                polygon = [_parse_point(v) for v in vertices.split(";") if v.strip()]
+                currDb = filter_by_polygon(currDb, polygon)
+
+            case "12":
+                print("Valores separados por vírgulas. Enter para não filtrar.")
+                criteria = {}
+                for col, prompt in COMBINED_PROMPTS.items():
+                    values = _parse_list(input(prompt))
+                    if values:
+                        criteria[col] = values
+                currDb = filter_by_categories(currDb, criteria)
+
+            case "13":
+                method = input("Método [G]ardner-Knopoff, [R]easenberg: ").lower()
+                method = "reasenberg" if method == "r" else "gk"
+                currDb = filter_by_mainshocks(currDb, method)
+
             case "r":
                 currDb = original_db.copy()
 
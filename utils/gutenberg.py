@@ -0,0 +1,392 @@
+# pyright: basic
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.utils import event_magnitudes
+
+"""Lei de Gutenberg-Richter: distribuicao frequencia-magnitude, magnitude de
+completude (Mc) e b-value
+
+    log10 N(M >= m) = a - b * m
+
+As magnitudes sao agrupadas em classes de largura `MAG_BIN`. Todos os ajustes partem
+do histograma das classes, e sao vetorizados sobre varios histogramas de uma vez
+(uma linha por subconjunto), pelo que ajustar milhares de subconjuntos (meses, zonas,
+amostras bootstrap) custa o mesmo que umas poucas operacoes numpy.
+
+Metodos para o Mc:
+    - `maxc`: maxima curvatura, a classe com mais eventos (+ `MAXC_CORRECTION`)
+    - `gof`: goodness of fit (Wiemer & Wyss, 2000), a menor Mc cujo ajuste explica
+      pelo menos 95% (ou 90%) da distribuicao observada
+
+O b-value e a estimativa de maxima verosimilhanca de Aki-Utsu, com a incerteza de
+Shi & Bolt (1982). Os intervalos de confianca bootstrap reamostram o histograma
+(multinomial, equivalente a reamostrar os eventos com reposicao) num pool de
+processos.
+
+"""
+
+MAG_BIN = 0.1
+MAXC_CORRECTION = 0.2
+GOF_LEVELS = (95.0, 90.0)
+MIN_EVENTS = 10
+MC_METHODS = ("maxc", "gof")
+
+BOOT_SAMPLES = 1000
+BOOT_CI = (2.5, 97.5)
+
+# amostras bootstrap por bloco; cada bloco tem a sua semente, independente do numero
+# de processos
+BOOT_BLOCK = 250
+
+GR_COLUMNS = ["N", "Mc", "b", "b_std", "a"]
+
+
+def magnitudes(df: pd.DataFrame, mag_type: str | None = "L") -> pd.Series:
+    """Magnitude de cada evento
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        mag_type (str | None): tipo de magnitude (default: `L`); None para a maior
+            magnitude de qualquer tipo
+
+    Returns:
+        pd.Series: magnitude, indexada pelo ID do evento
+    """
+    return event_magnitudes(df, mag_type).groupby("ID")["Magnitude"].max()
+
+
+def _bins(mags: np.ndarray, bin_width: float) -> tuple[np.ndarray, np.ndarray]:
+    """Funcao privada que converte magnitudes em classes
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: classe de cada magnitude (0, 1, ...) e o
+            centro de cada classe
+    """
+    codes = np.round(np.asarray(mags, dtype=float) / bin_width).astype(np.int64)
+    if len(codes) == 0:
+        return codes, np.empty(0)
+    first = codes.min()
+    centers = np.round(np.arange(first, codes.max() + 1) * bin_width, 10)
+    return codes - first, centers
+
+
+def _fit(
+    counts: np.ndarray,
+    centers: np.ndarray,
+    bin_width: float,
+    method: str,
+    min_events: int,
+) -> dict[str, np.ndarray]:
+    """Funcao privada que ajusta a lei de Gutenberg-Richter a cada linha de `counts`
+
+    Args:
+        counts (np.ndarray): histogramas, uma linha por subconjunto
+        centers (np.ndarray): centro de cada classe
+        bin_width (float): largura das classes
+        method (str): metodo do Mc, de entre `MC_METHODS`
+        min_events (int): numero minimo de eventos acima do Mc
+
+    Returns:
+        dict[str, np.ndarray]: `GR_COLUMNS`, um valor por linha
+    """
+    counts = np.atleast_2d(counts).astype(float)
+    rows, nbins = counts.shape
+    if nbins == 0:
+        out = {c: np.full(rows, np.nan) for c in GR_COLUMNS}
+        out["N"] = np.zeros(rows, dtype=np.int64)
+        return out
+
+    def _tail(x):
+        return x[:, ::-1].cumsum(axis=1)[:, ::-1]
+
+    # para cada Mc candidata k: numero, soma e soma dos quadrados das magnitudes >= k
+    ncum = _tail(counts)
+    s1 = _tail(counts * centers)
+    s2 = _tail(counts * centers**2)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s1 / ncum
+        b = math.log10(math.e) / (mean - (centers - bin_width / 2))
+        a = np.log10(ncum) + b * centers
+        b_std = 2.3 * b**2 * np.sqrt((s2 - s1 * mean) / (ncum * (ncum - 1)))
+
+        # as linhas partilham as classes: cada ajuste usa apenas as classes entre a
+        # primeira e a ultima com eventos dessa linha
+        occupied = counts > 0
+        first = occupied.argmax(axis=1)
+        last = nbins - 1 - occupied[:, ::-1].argmax(axis=1)
+        bins = np.arange(nbins)
+
+        match method:
+            case "maxc":
+                shift = int(round(MAXC_CORRECTION / bin_width))
+                k = np.minimum(counts.argmax(axis=1) + shift, last)
+            case "gof":
+                # R[g, k] = 100 - 100 * sum_j |obs_j - syn_j| / sum_j obs_j, k <= j <= last
+                syn = 10 ** (a[:, :, None] - b[:, :, None] * centers[None, None, :])
+                upper = (bins[None, :, None] <= bins[None, None, :]) & (
+                    bins[None, None, :] <= last[:, None, None]
+                )
+                diff = np.where(upper, np.abs(ncum[:, None, :] - syn), 0).sum(axis=2)
+                obs = np.where(upper, ncum[:, None, :], 0).sum(axis=2)
+                valid = (ncum >= min_events) & (bins >= first[:, None])
+                r = np.where(valid, 100 - 100 * diff / obs, -np.inf)
+
+                k = np.nanargmax(np.where(np.isnan(r), -np.inf, r), axis=1)
+                for level in GOF_LEVELS[::-1]:
+                    ok = r >= level
+                    k = np.where(ok.any(axis=1), ok.argmax(axis=1), k)
+            case _:
+                raise ValueError(f"Metodo de Mc desconhecido: {method}")
+
+    idx = np.arange(rows)
+    n = ncum[idx, k]
+    valid = n >= min_events
+    out = {
+        "N": n,
+        "Mc": centers[k],
+        "b": b[idx, k],
+        "b_std": b_std[idx, k],
+        "a": a[idx, k],
+    }
+    for col in GR_COLUMNS[1:]:
+        out[col] = np.where(valid, out[col], np.nan)
+    out["N"] = n.astype(np.int64)
+    return out
+
+
+def fmd(mags: np.ndarray, bin_width: float = MAG_BIN) -> pd.DataFrame:
+    """Distribuicao frequencia-magnitude
+
+    Args:
+        mags (np.ndarray): magnitudes
+        bin_width (float): largura das classes (default: `MAG_BIN`)
+
+    Returns:
+        pd.DataFrame: por classe, o numero de eventos (`N`) e o numero acumulado de
+            eventos com magnitude maior ou igual (`Ncum`)
+    """
+    codes, centers = _bins(mags, bin_width)
+    counts = np.bincount(codes, minlength=len(centers))
+    return pd.DataFrame(
+        {"N": counts, "Ncum": counts[::-1].cumsum()[::-1]},
+        index=pd.Index(centers, name="Magnitude"),
+    )
+
+
+def b_value(
+    mags: np.ndarray,
+    method: str = "maxc",
+    bin_width: float = MAG_BIN,
+    min_events: int = MIN_EVENTS,
+) -> dict[str, float]:
+    """Magnitude de completude e b-value de maxima verosimilhanca
+
+    Args:
+        mags (np.ndarray): magnitudes
+        method (str): metodo do Mc, de entre `MC_METHODS` (default: `maxc`)
+        bin_width (float): largura das classes (default: `MAG_BIN`)
+        min_events (int): numero minimo de eventos acima do Mc (default: `MIN_EVENTS`)
+
+    Returns:
+        dict[str, float]: N (eventos acima do Mc), Mc, b, b_std e a. Os valores sao NaN
+            se houver menos de `min_events` eventos
+    """
+    codes, centers = _bins(mags, bin_width)
+    counts = np.bincount(codes, minlength=len(centers))
+    res = _fit(counts, centers, bin_width, method, min_events)
+    return {k: v[0].item() for k, v in res.items()}
+
+
+def _bootstrap_chunk(
+    counts: np.ndarray,
+    centers: np.ndarray,
+    samples: int,
+    seed: np.random.SeedSequence,
+    method: str,
+    bin_width: float,
+    min_events: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Funcao privada que ajusta `samples` reamostragens de um histograma
+
+    Corre num processo do pool, pelo que recebe apenas arrays e valores simples.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Mc e b de cada amostra
+    """
+    rng = np.random.default_rng(seed)
+    total = int(counts.sum())
+    resampled = rng.multinomial(total, counts / total, size=samples)
+    res = _fit(resampled, centers, bin_width, method, min_events)
+    return res["Mc"], res["b"]
+
+
+def bootstrap(
+    mags: np.ndarray,
+    samples: int = BOOT_SAMPLES,
+    method: str = "maxc",
+    bin_width: float = MAG_BIN,
+    min_events: int = MIN_EVENTS,
+    seed: int | None = None,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    """Distribuicao bootstrap do Mc e do b-value
+
+    As amostras sao divididas em blocos de `BOOT_BLOCK`, cada um com a sua semente
+    (derivada de `seed`), e os blocos sao distribuidos pelos processos. Cada bloco e
+    gerado de uma so vez (reamostragem multinomial do histograma) e ajustado com
+    `_fit`. Como os blocos nao dependem do numero de processos, a mesma semente da
+    sempre as mesmas amostras.
+
+    Args:
+        mags (np.ndarray): magnitudes
+        samples (int): numero de amostras (default: `BOOT_SAMPLES`)
+        method (str): metodo do Mc, de entre `MC_METHODS` (default: `maxc`)
+        bin_width (float): largura das classes (default: `MAG_BIN`)
+        min_events (int): numero minimo de eventos acima do Mc (default: `MIN_EVENTS`)
+        seed (int | None): semente, para resultados reprodutiveis (em qualquer
+            maquina e com qualquer numero de processos)
+        workers (int | None): numero de processos (default: numero de CPUs);
+            com 1, ou com um so bloco, corre no processo atual
+
+    Returns:
+        pd.DataFrame: colunas `Mc` e `b`, uma linha por amostra
+    """
+    codes, centers = _bins(mags, bin_width)
+    if len(codes) == 0:
+        return pd.DataFrame({"Mc": np.full(samples, np.nan), "b": np.nan})
+    counts = np.bincount(codes, minlength=len(centers))
+
+    workers = workers or os.cpu_count() or 1
+    sizes = [BOOT_BLOCK] * (samples // BOOT_BLOCK)
+    if samples % BOOT_BLOCK:
+        sizes.append(samples % BOOT_BLOCK)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    options = (method, bin_width, min_events)
+
+    if workers == 1 or len(sizes) <= 1:
+        parts = [
+            _bootstrap_chunk(counts, centers, size, s, *options)
+            for size, s in zip(sizes, seeds)
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            futures = [
+                pool.submit(_bootstrap_chunk, counts, centers, size, s, *options)
+                for size, s in zip(sizes, seeds)
+            ]
+            parts = [f.result() for f in futures]
+
+    if not parts:
+        return pd.DataFrame({"Mc": np.empty(0), "b": np.empty(0)})
+
+    return pd.DataFrame(
+        {
+            "Mc": np.concatenate([p[0] for p in parts]),
+            "b": np.concatenate([p[1] for p in parts]),
+        }
+    )
+
+
+def _group_keys(df: pd.DataFrame, ids: pd.Index, by: str) -> pd.Series:
+    """Funcao privada que retorna o grupo de cada evento
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        ids (pd.Index): IDs dos eventos
+        by (str): `month` para agrupar por mes, ou uma coluna (ex: `SZ`, `VZ`)
+
+    Returns:
+        pd.Series: grupo, indexado pelo ID
+    """
+    events = df.drop_duplicates(subset="ID", keep="first").set_index("ID")
+    if by == "month":
+        return events["Data"].dt.to_period("M").reindex(ids)
+    return events[by].reindex(ids)
+
+
+def gr_table(
+    df: pd.DataFrame,
+    by: str = "month",
+    mag_type: str | None = "L",
+    method: str = "maxc",
+    bin_width: float = MAG_BIN,
+    min_events: int = MIN_EVENTS,
+    samples: int = 0,
+    seed: int | None = None,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    """Mc e b-value de cada grupo de eventos (ex: por mes ou por zona sismica)
+
+    Todos os grupos partilham as mesmas classes de magnitude, e sao ajustados de uma
+    so vez. Com `samples > 0`, calcula tambem o intervalo de confianca bootstrap do
+    b-value de cada grupo, distribuindo os grupos por um pool de processos.
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        by (str): `month`, ou uma coluna dos eventos (ex: `SZ`, `VZ`) (default: `month`)
+        mag_type (str | None): tipo de magnitude (default: `L`)
+        method (str): metodo do Mc, de entre `MC_METHODS` (default: `maxc`)
+        bin_width (float): largura das classes (default: `MAG_BIN`)
+        min_events (int): numero minimo de eventos acima do Mc (default: `MIN_EVENTS`)
+        samples (int): amostras bootstrap por grupo (default: 0, sem bootstrap)
+        seed (int | None): semente, para resultados reprodutiveis
+        workers (int | None): numero de processos para o bootstrap
+            (default: numero de CPUs); com 1, ou com um so grupo, corre no
+            processo atual
+
+    Returns:
+        pd.DataFrame: uma linha por grupo, com `GR_COLUMNS` e, com bootstrap,
+            `b_low` e `b_high`
+    """
+    mags = magnitudes(df, mag_type)
+    groups = _group_keys(df, mags.index, by)
+    valid = groups.notna().to_numpy()
+
+    codes, centers = _bins(mags.to_numpy()[valid], bin_width)
+    gcodes, labels = pd.factorize(groups[valid], sort=True)
+    nbins = len(centers)
+
+    counts = np.bincount(
+        gcodes * nbins + codes, minlength=len(labels) * nbins
+    ).reshape(len(labels), nbins)
+    res = pd.DataFrame(
+        _fit(counts, centers, bin_width, method, min_events),
+        index=pd.Index(labels, name=by),
+    )
+
+    if samples > 0 and len(labels):
+        workers = workers or os.cpu_count() or 1
+        seeds = np.random.SeedSequence(seed).spawn(len(labels))
+        options = (method, bin_width, min_events)
+
+        if workers == 1 or len(labels) == 1:
+            boot = [
+                _bootstrap_chunk(row, centers, samples, s, *options)[1]
+                for row, s in zip(counts, seeds)
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(labels))) as pool:
+                futures = [
+                    pool.submit(_bootstrap_chunk, row, centers, samples, s, *options)
+                    for row, s in zip(counts, seeds)
+                ]
+                boot = [f.result()[1] for f in futures]
+
+        with np.errstate(all="ignore"):
+            low, high = np.array(
+                [
+                    np.nanpercentile(b, BOOT_CI) if np.isfinite(b).any() else [np.nan] * 2
+                    for b in boot
+                ]
+            ).T
+        res["b_low"] = np.where(res["b"].notna(), low, np.nan)
+        res["b_high"] = np.where(res["b"].notna(), high, np.nan)
+
+    return res
@@ -0,0 +1,307 @@
+# pyright: basic
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.stations import AMPLITUDE_PHASE, DIST_COL, phases
+from utils.stats import STAT_LABELS, Groups
+from utils.utils import event_magnitudes
+
+"""Magnitude local (ML) recalculada a partir das amplitudes das leituras IAML
+
+A magnitude de cada leitura e
+
+    ML = log10(A) + a * log10(r) + b * r + c + correcao da estacao
+
+com A a amplitude (nm, Wood-Anderson) e r a distancia hipocentral (km), calculada a
+partir da distancia epicentral (`DIS`) e da profundidade do evento. Os coeficientes
+(a, b, c) sao a lei de atenuacao, escolhida pelo nome (`LAWS`) ou dada diretamente.
+
+A magnitude de cada evento e a mediana das magnitudes das suas leituras, e a
+dispersao e o desvio absoluto mediano (MAD). Todas as leituras sao calculadas numa
+so operacao vetorizada, e as medianas por evento e por estacao com uma so ordenacao
+(ver `stats.Groups`), o que permite recalcular catalogos inteiros depois de uma
+alteracao de calibracao.
+
+"""
+
+# ML = log10(A) + a * log10(r) + b * r + c
+LAWS = {
+    # Hutton & Boore (1987), normalizada a 100 km (IASPEI, A em nm)
+    "iaspei": (1.11, 0.00189, -2.09),
+}
+DEFAULT_LAW = "iaspei"
+
+# tipo de magnitude do catalogo com que a ML recalculada e comparada
+ML_TYPE = "L"
+
+# correcoes de estacao: iteracoes (ate variarem menos que `TOLERANCE`), e numero
+# minimo de leituras de uma estacao
+ITERATIONS = 5
+TOLERANCE = 0.005
+MIN_STATION_PICKS = 3
+
+MAGNITUDE_HEADER = """=== Terramotos ===
+ == Magnitude local (ML) ==
+"""
+
+MAGNITUDE_MENU = """[1] ML recalculada vs. catálogo
+[2] Correções de estação (mediana da rede)
+[3] Correções de estação (referência: ML do catálogo)
+[4] Resíduos por estação
+
+[Q] Voltar ao menu principal
+"""
+
+type Law = str | tuple[float, float, float]
+
+
+def attenuation(law: Law) -> tuple[float, float, float]:
+    """Coeficientes de uma lei de atenuacao
+
+    Args:
+        law (Law): nome, de entre `LAWS`, ou os coeficientes (a, b, c)
+
+    Raises:
+        ValueError: se a lei for desconhecida
+
+    Returns:
+        tuple[float, float, float]: coeficientes (a, b, c)
+    """
+    if isinstance(law, str):
+        try:
+            return LAWS[law]
+        except KeyError:
+            raise ValueError(f"Lei de atenuacao desconhecida: {law}") from None
+    a, b, c = law
+    return float(a), float(b), float(c)
+
+
+def station_magnitudes(
+    df: pd.DataFrame, law: Law = DEFAULT_LAW, corrections: pd.Series | None = None
+) -> pd.DataFrame:
+    """Magnitude de cada leitura IAML com amplitude e distancia validas
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        law (Law): lei de atenuacao (default: `DEFAULT_LAW`)
+        corrections (pd.Series | None): correcao de cada estacao, indexada pela
+            estacao (default: sem correcoes)
+
+    Returns:
+        pd.DataFrame: uma linha por leitura, com `ID`, `Estacao`, `Componente`,
+            `Amplitude`, `Distancia` (hipocentral, km) e `ML`
+    """
+    a, b, c = attenuation(law)
+    amp = df["Amplitude"].to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        dist = np.hypot(
+            df[DIST_COL].to_numpy(dtype=float),
+            df["Profundidade"].fillna(0).to_numpy(dtype=float),
+        )
+        keep = (phases(df).to_numpy() == AMPLITUDE_PHASE) & (amp > 0) & (dist > 0)
+
+    amp, dist = amp[keep], dist[keep]
+    res = pd.DataFrame(
+        {
+            "ID": df["ID"].to_numpy()[keep],
+            "Estacao": df["Estacao"].to_numpy()[keep],
+            "Componente": df["Componente"].to_numpy()[keep],
+            "Amplitude": amp,
+            "Distancia": dist,
+            "ML": np.log10(amp) + a * np.log10(dist) + b * dist + c,
+        }
+    )
+    if corrections is not None:
+        res["ML"] += res["Estacao"].map(corrections).fillna(0).to_numpy()
+    return res
+
+
+def _median_mad(
+    labels: pd.Index, codes: np.ndarray, values: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Funcao privada com a mediana, o desvio absoluto mediano e o numero de valores
+    de cada grupo
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: medianas, MAD e contagens
+    """
+    g = Groups.from_codes(labels, codes, values)
+    median = g.quantile(0.5)
+    dev = Groups.from_codes(labels, codes, np.abs(values - median[codes]))
+    return median, dev.quantile(0.5), g.counts
+
+
+def event_ml(picks: pd.DataFrame) -> pd.DataFrame:
+    """Magnitude de cada evento, a mediana das magnitudes das suas leituras
+
+    Args:
+        picks (pd.DataFrame): resultado de `station_magnitudes`
+
+    Returns:
+        pd.DataFrame: indexada pelo ID, com `ML`, `MAD` e `N` (numero de leituras)
+    """
+    codes, ids = pd.factorize(picks["ID"], sort=True)
+    labels = pd.Index(ids, name="ID")
+    median, mad, counts = _median_mad(labels, codes, picks["ML"].to_numpy())
+    return pd.DataFrame({"ML": median, "MAD": mad, "N": counts}, index=labels)
+
+
+def _reference(df: pd.DataFrame, mag_type: str) -> pd.Series:
+    """Funcao privada com a magnitude de catalogo de cada evento (a primeira do tipo)"""
+    mags = event_magnitudes(df, mag_type).drop_duplicates(subset="ID", keep="first")
+    return mags.set_index("ID")["Magnitude"]
+
+
+def station_corrections(
+    df: pd.DataFrame,
+    law: Law = DEFAULT_LAW,
+    reference: str | None = None,
+    iterations: int = ITERATIONS,
+    min_picks: int = MIN_STATION_PICKS,
+) -> pd.Series:
+    """Correcao de cada estacao, o simetrico da mediana dos seus residuos
+
+    Sem referencia, o residuo de uma leitura e a diferenca para a ML do evento
+    (mediana da rede), e as correcoes sao iteradas com mediana 0, para nao mudarem
+    o nivel da escala. Com referencia, o residuo e a diferenca para a magnitude do
+    catalogo desse tipo, e basta uma iteracao.
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        law (Law): lei de atenuacao (default: `DEFAULT_LAW`)
+        reference (str | None): tipo de magnitude do catalogo usado como referencia
+            (ex: `L`), ou None para a mediana da rede (default: None)
+        iterations (int): numero maximo de iteracoes sem referencia
+            (default: `ITERATIONS`)
+        min_picks (int): estacoes com menos leituras ficam com correcao 0
+            (default: `MIN_STATION_PICKS`)
+
+    Returns:
+        pd.Series: correcao (unidades de magnitude), indexada pela estacao
+    """
+    picks = station_magnitudes(df, law)
+    raw = picks["ML"].to_numpy()
+    ecodes, ids = pd.factorize(picks["ID"], sort=True)
+    scodes, stations = pd.factorize(picks["Estacao"], sort=True)
+    slabels = pd.Index(stations, name="Estacao")
+    corr = np.zeros(len(stations))
+
+    if reference is not None:
+        ref = pd.Series(ids).map(_reference(df, reference)).to_numpy(dtype=float)
+        iterations = 1
+
+    for _ in range(iterations):
+        ml = raw + corr[scodes]
+        if reference is None:
+            ref = Groups.from_codes(pd.Index(ids), ecodes, ml).quantile(0.5)
+        g = Groups.from_codes(slabels, scodes, ml - ref[ecodes])
+        median, counts = g.quantile(0.5), g.counts
+        new = np.where(counts >= min_picks, corr - np.nan_to_num(median), 0.0)
+        if reference is None and (counts >= min_picks).any():
+            new[counts >= min_picks] -= np.median(new[counts >= min_picks])
+
+        done = np.abs(new - corr).max(initial=0) < TOLERANCE
+        corr = new
+        if done:
+            break
+
+    return pd.Series(corr, index=slabels, name="Correcao")
+
+
+def residuals(
+    df: pd.DataFrame, law: Law = DEFAULT_LAW, corrections: pd.Series | None = None
+) -> pd.DataFrame:
+    """Estatisticas dos residuos (ML da leitura - ML do evento) de cada estacao
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        law (Law): lei de atenuacao (default: `DEFAULT_LAW`)
+        corrections (pd.Series | None): correcoes de estacao (default: sem correcoes)
+
+    Returns:
+        pd.DataFrame: uma linha por estacao, com `Count`, `Mean`, `Std`, `Median`,
+            `Q1`, `Q3` e `Correcao`
+    """
+    picks = station_magnitudes(df, law, corrections)
+    events = event_ml(picks)
+    res = picks["ML"].to_numpy() - picks["ID"].map(events["ML"]).to_numpy()
+
+    codes, stations = pd.factorize(picks["Estacao"], sort=True)
+    labels = pd.Index(stations, name="Estacao")
+    st = Groups.from_codes(labels, codes, res).stats(
+        ("count", "mean", "std", "median", "q1", "q3")
+    )
+    table = pd.DataFrame({STAT_LABELS[k]: v for k, v in st.items()}, index=labels)
+    table["Correcao"] = (
+        0.0 if corrections is None else labels.map(corrections).fillna(0).to_numpy()
+    )
+    return table
+
+
+def remagnitude(
+    df: pd.DataFrame,
+    law: Law = DEFAULT_LAW,
+    corrections: pd.Series | None = None,
+    mag_type: str = ML_TYPE,
+) -> pd.DataFrame:
+    """Recalcula a ML de todos os eventos e compara-a com a do catalogo
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        law (Law): lei de atenuacao (default: `DEFAULT_LAW`)
+        corrections (pd.Series | None): correcoes de estacao (default: sem correcoes)
+        mag_type (str): tipo de magnitude do catalogo a comparar (default: `ML_TYPE`)
+
+    Returns:
+        pd.DataFrame: indexada pelo ID, com `ML`, `MAD`, `N`, `Catalogo` e
+            `Diferenca` (ML - Catalogo)
+    """
+    res = event_ml(station_magnitudes(df, law, corrections))
+    res["Catalogo"] = res.index.map(_reference(df, mag_type)).to_numpy(dtype=float)
+    res["Diferenca"] = res["ML"] - res["Catalogo"]
+    return res
+
+
+def magnitude_menu(df: pd.DataFrame):
+    """Menu da magnitude local recalculada
+
+    As correcoes calculadas nas opcoes 2 e 3 sao usadas nas opcoes 1 e 4.
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+    """
+    corrections = None
+    while True:
+        os.system("cls" if sys.platform == "windows" else "clear")
+        print(MAGNITUDE_HEADER + "\n" + MAGNITUDE_MENU)
+        if corrections is not None:
+            print("(com correções de estação)\n")
+        usrIn = input("Opção: ").lower()
+
+        match usrIn:
+            case "1":
+                res = remagnitude(df, corrections=corrections)
+                print(res.round(2).to_string())
+                print(
+                    f"\nDiferença para o catálogo: média {res['Diferenca'].mean():.3f}"
+                    f", desvio padrão {res['Diferenca'].std():.3f}"
+                )
+
+            case "2" | "3":
+                reference = ML_TYPE if usrIn == "3" else None
+                corrections = station_corrections(df, reference=reference)
+                print(corrections.round(3).to_string())
+
+            case "4":
+                print(residuals(df, corrections=corrections).round(3).to_string())
+
+            case "q":
+                return
+            case _:
+                pass
+
+        input("\n[Enter] para continuar...")
@@ -0,0 +1,372 @@
+# pyright: basic
+
+import math
+from collections import defaultdict
+from typing import Any, Mapping
+
+import numpy as np
+import pandas as pd
+
+from utils.stats import MAG_COLUMN, MONTH_STATS, STAT_LABELS
+
+"""Estatisticas online, atualizadas um evento de cada vez
+
+Para cada coluna (profundidade e magnitude), globalmente e por mes, sao mantidos:
+    - numero de eventos, media e variancia (algoritmo de Welford), minimo e maximo
+    - um sketch de quantis (mediana, Q1, Q3) com erro relativo garantido em cada
+      estatistica de ordem
+
+Todos os acumuladores podem ser juntos (`merge`), pelo que varios processos podem
+tratar partes do catalogo em paralelo e combinar os resultados no fim.
+
+A magnitude de cada evento e, por defeito, a sua primeira magnitude L, a mesma base
+de `stats._mag_depth`; com `mag_type=None` e a maior magnitude de qualquer tipo, a
+base de `stats_mag_month`. As comparacoes abaixo pressupoem a mesma base.
+
+Erro face as funcoes de `stats.py`:
+    - contagem, minimo e maximo sao exatos; media e variancia sao exatas a menos de
+      erros de arredondamento (~1e-12 relativo)
+    - os quantis sao interpolados linearmente entre as estatisticas de ordem
+      `floor(q * (n - 1))` e `ceil(q * (n - 1))`, como no pandas e no `np.quantile`.
+      O erro relativo garantido, `alpha` (1% por defeito), e o de cada uma dessas
+      estatisticas de ordem, e nao o do quantil interpolado: a diferenca para o
+      quantil em lote e no maximo `alpha * max(|x_floor|, |x_ceil|)`, que so e
+      relativa ao quantil quando as duas estatisticas de ordem tem o mesmo sinal
+
+"""
+
+SKETCH_ALPHA = 0.01
+
+
+class RunningMoments:
+    """Contagem, media, variancia (Welford), minimo e maximo de uma serie de valores"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, x: float) -> None:
+        """Acrescenta um valor
+
+        Args:
+            x (float): valor
+        """
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def merge(self, other: "RunningMoments") -> None:
+        """Junta os valores de outro acumulador (formula de Chan et al.)
+
+        Args:
+            other (RunningMoments): acumulador a juntar
+        """
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def variance(self, ddof: int = 0) -> float:
+        """Variancia
+
+        Args:
+            ddof (int): graus de liberdade a descontar (default: 0, como `np.var`)
+
+        Returns:
+            float: variancia, NaN se nao houver valores suficientes
+        """
+        if self.count <= ddof:
+            return math.nan
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof: int = 0) -> float:
+        """Desvio padrao
+
+        Args:
+            ddof (int): graus de liberdade a descontar (default: 0, como `np.std`)
+
+        Returns:
+            float: desvio padrao
+        """
+        return math.sqrt(self.variance(ddof))
+
+
+class QuantileSketch:
+    """Sketch de quantis com erro relativo `alpha`, em buckets logaritmicos.
+
+    Cada valor e contado no bucket `ceil(log_gamma(|x|))`, com
+    `gamma = (1 + alpha) / (1 - alpha)`. Dois sketches com o mesmo `alpha` juntam-se
+    somando as contagens dos buckets.
+    """
+
+    def __init__(self, alpha: float = SKETCH_ALPHA):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._logGamma = math.log(self.gamma)
+        self.positive: defaultdict[int, int] = defaultdict(int)
+        self.negative: defaultdict[int, int] = defaultdict(int)
+        self.zeros = 0
+        self.count = 0
+
+    def _key(self, x: float) -> int:
+        return math.ceil(math.log(x) / self._logGamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma**key / (self.gamma + 1)
+
+    def update(self, x: float) -> None:
+        """Acrescenta um valor
+
+        Args:
+            x (float): valor
+        """
+        self.count += 1
+        if x > 0:
+            self.positive[self._key(x)] += 1
+        elif x < 0:
+            self.negative[self._key(-x)] += 1
+        else:
+            self.zeros += 1
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Junta as contagens de outro sketch
+
+        Args:
+            other (QuantileSketch): sketch com o mesmo `alpha`
+
+        Raises:
+            ValueError: se os `alpha` forem diferentes
+        """
+        if other.alpha != self.alpha:
+            raise ValueError("Sketches com alpha diferentes nao podem ser juntos")
+        for k, c in other.positive.items():
+            self.positive[k] += c
+        for k, c in other.negative.items():
+            self.negative[k] += c
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def _order_statistic(self, rank: int) -> float:
+        """Valor estimado da estatistica de ordem `rank` (a partir de 0)"""
+        seen = 0
+        for k in sorted(self.negative, reverse=True):
+            seen += self.negative[k]
+            if seen > rank:
+                return -self._value(k)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.positive):
+            seen += self.positive[k]
+            if seen > rank:
+                return self._value(k)
+        return self._value(max(self.positive))
+
+    def quantile(self, q: float) -> float:
+        """Quantil `q` estimado, interpolado linearmente entre as duas estatisticas de
+        ordem vizinhas (como o pandas)
+
+        Args:
+            q (float): quantil, entre 0 e 1
+
+        Returns:
+            float: valor estimado, NaN se o sketch estiver vazio
+        """
+        if self.count == 0:
+            return math.nan
+
+        h = q * (self.count - 1)
+        lo = math.floor(h)
+        low = self._order_statistic(lo)
+        if h == lo:
+            return low
+        high = self._order_statistic(min(lo + 1, self.count - 1))
+        return low + (h - lo) * (high - low)
+
+
+class ColumnStats:
+    """Momentos e sketch de quantis de uma coluna"""
+
+    def __init__(self, alpha: float = SKETCH_ALPHA):
+        self.moments = RunningMoments()
+        self.sketch = QuantileSketch(alpha)
+
+    def update(self, x: float) -> None:
+        if math.isnan(x):
+            return
+        self.moments.update(x)
+        self.sketch.update(x)
+
+    def merge(self, other: "ColumnStats") -> None:
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+
+    def summary(self) -> dict[str, float]:
+        """Estatisticas com os mesmos nomes das tabelas mensais de `stats.py`
+
+        Returns:
+            dict[str, float]: Count, Mean, Std (ddof=1), Median, Q1, Q3, Min e Max
+        """
+        m = self.moments
+        empty = m.count == 0
+        return {
+            "Count": m.count,
+            "Mean": math.nan if empty else m.mean,
+            "Std": m.std(ddof=1),
+            "Median": self.sketch.quantile(0.5),
+            "Q1": self.sketch.quantile(0.25),
+            "Q3": self.sketch.quantile(0.75),
+            "Min": math.nan if empty else m.min,
+            "Max": math.nan if empty else m.max,
+        }
+
+
+def _event_value(event: Mapping[str, Any], column: str, mag_type: str | None) -> float:
+    """Funcao privada que le o valor de uma coluna de um evento
+
+    Para `MAG_COLUMN`, usa a primeira magnitude do tipo `mag_type` (como
+    `extract_mag_depth`) ou, sem tipo, a maior magnitude de qualquer tipo
+    """
+    if column != MAG_COLUMN:
+        value = event.get(column)
+        return math.nan if value is None else float(value)
+
+    mags = [
+        float(m["Magnitude"])
+        for m in event.get("Magnitudes", [])
+        if mag_type is None or m["Tipo"] == mag_type
+    ]
+    if not mags:
+        return math.nan
+    return max(mags) if mag_type is None else mags[0]
+
+
+class OnlineStats:
+    """Estatisticas globais e mensais, atualizadas evento a evento"""
+
+    def __init__(
+        self,
+        columns: tuple[str, ...] = ("Profundidade", MAG_COLUMN),
+        mag_type: str | None = "L",
+        alpha: float = SKETCH_ALPHA,
+    ):
+        """
+        Args:
+            columns (tuple[str, ...]): colunas a acompanhar
+                (default: profundidade e magnitude)
+            mag_type (str | None): tipo de magnitude para `MAG_COLUMN` (default: `L`,
+                a primeira magnitude L do evento, como em `stats._mag_depth`); None
+                para a maior magnitude de qualquer tipo, como em `stats_mag_month`
+            alpha (float): erro relativo dos quantis (default: `SKETCH_ALPHA`)
+        """
+        self.columns = columns
+        self.mag_type = mag_type
+        self.alpha = alpha
+        self.seen: set[int] = set()
+        self.total = {c: ColumnStats(alpha) for c in columns}
+        self.monthly: dict[pd.Period, dict[str, ColumnStats]] = {}
+
+    def update(self, event: Mapping[str, Any]) -> bool:
+        """Acrescenta um evento. Eventos com um ID ja visto sao ignorados, pelo que
+        podem ser passadas diretamente as linhas (estacoes) do catalogo.
+
+        Args:
+            event (Mapping[str, Any]): evento, com `ID`, `Data` e as colunas
+
+        Returns:
+            bool: True se o evento foi contado
+        """
+        eid = event.get("ID")
+        if eid is not None:
+            if eid in self.seen:
+                return False
+            self.seen.add(eid)
+
+        month = pd.Timestamp(event["Data"]).to_period("M")
+        if month not in self.monthly:
+            self.monthly[month] = {c: ColumnStats(self.alpha) for c in self.columns}
+
+        for c in self.columns:
+            x = _event_value(event, c, self.mag_type)
+            self.total[c].update(x)
+            self.monthly[month][c].update(x)
+        return True
+
+    def update_frame(self, df: pd.DataFrame) -> None:
+        """Acrescenta todos os eventos de uma DataFrame
+
+        Args:
+            df (pd.DataFrame): Dataframe com eventos
+        """
+        events = df.drop_duplicates(subset="ID", keep="first")
+        for event in events.to_dict("records"):
+            self.update(event)
+
+    def merge(self, other: "OnlineStats") -> None:
+        """Junta as estatisticas de outro objeto (ex: de outro processo).
+
+        Os eventos de cada objeto devem ser disjuntos: os IDs repetidos nao sao
+        descontados dos acumuladores.
+
+        Args:
+            other (OnlineStats): estatisticas com as mesmas colunas
+        """
+        self.seen |= other.seen
+        for c in self.columns:
+            self.total[c].merge(other.total[c])
+        for month, cols in other.monthly.items():
+            if month not in self.monthly:
+                self.monthly[month] = {c: ColumnStats(self.alpha) for c in self.columns}
+            for c in self.columns:
+                self.monthly[month][c].merge(cols[c])
+
+    def summary(self, column: str) -> list[tuple[str, float]]:
+        """Estatisticas globais de uma coluna, no formato de `stats._mag_depth`
+
+        Args:
+            column (str): coluna
+
+        Returns:
+            list[tuple[str, float]]: media, desvio padrao, variancia, maximo e minimo
+        """
+        m = self.total[column].moments
+        return [
+            ("Media\t", m.mean),
+            ("Desvio-Padrao", m.std()),
+            ("Variancia", m.variance()),
+            ("Valor Maximo", m.max),
+            ("Valor Minimo", m.min),
+        ]
+
+    def month_table(self, column: str) -> pd.DataFrame:
+        """Tabela mensal de uma coluna, no formato de `stats.stats_depth_month`
+
+        Args:
+            column (str): coluna
+
+        Returns:
+            pd.DataFrame: uma linha por mes (todos os meses entre o primeiro e o ultimo)
+        """
+        cols = [STAT_LABELS[s] for s in MONTH_STATS]
+        if not self.monthly:
+            return pd.DataFrame(columns=cols, index=pd.DatetimeIndex([], name="Data"))
+
+        months = pd.period_range(min(self.monthly), max(self.monthly), freq="M")
+        rows = []
+        for month in months:
+            cs = self.monthly.get(month, {}).get(column)
+            rows.append(cs.summary() if cs else ColumnStats(self.alpha).summary())
+
+        index = months.to_timestamp(how="end").normalize().rename("Data")
+        return pd.DataFrame(rows, index=index)[cols].astype(np.float64)
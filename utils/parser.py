@@ -3,6 +3,7 @@ from collections import defaultdict
 from datetime import datetime
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
 """Parser de dados
@@ -18,6 +19,8 @@ para cada estacao
 # --- variáveis globais ---
 DIST_IND = {"L": "Local", "R": "Regional", "D": "Distante"}
 TYPE = {"Q": "Quake", "V": "Volcanic", "U": "Unknown", "E": "Explosion"}
+# uma leitura esta a menos de meio dia da hora de origem (viragem da meia-noite)
+DAY = pd.Timedelta(days=1)
 
 
 # --- funções auxiliares ---
@@ -119,9 +122,47 @@ def parse(fname: str) -> pd.DataFrame:
         aux = pd.concat([df, a], axis=0, ignore_index=True)
         df = aux
     fp.close()
+
+    # Mantem o catalogo ordenado pela hora de origem; o sort estavel garante que
+    # as linhas de cada evento continuam seguidas
+    if not df.empty:
+        df = df.sort_values(by="Data", kind="mergesort").reset_index(drop=True)
     return df
 
 
+def arrival_times(df: pd.DataFrame) -> pd.Series:
+    """Hora absoluta de chegada de cada leitura
+
+    As linhas das estacoes guardam apenas a hora, o minuto e o segundo da leitura. A
+    data e a do dia da hora de origem; se a diferenca para a origem passar de meio
+    dia, a leitura e do dia seguinte (ou anterior), e e corrigida em um dia.
+
+    Args:
+        df (pd.DataFrame): DataFrame com leituras
+
+    Returns:
+        pd.Series: hora de chegada (NaT se a leitura nao tiver hora)
+    """
+    dates = pd.to_datetime(df["Data"]).to_numpy(dtype="datetime64[ns]")
+    origin = dates.view(np.int64)
+    seconds = (
+        df["Hora"].to_numpy(dtype=float) * 3600
+        + df["Min"].to_numpy(dtype=float) * 60
+        + df["Seg"].to_numpy(dtype=float)
+    )
+    day, half = DAY.value, DAY.value // 2
+
+    missing = np.isnan(seconds) | np.isnat(dates)
+    offset = np.round(np.where(missing, 0, seconds) * 1e9).astype(np.int64)
+
+    # diferenca para a origem, reduzida a [-12h, 12h[
+    diff = origin // day * day + offset - origin
+    diff = (diff + half) % day - half
+    arrival = (origin + diff).view("datetime64[ns]")
+    arrival[missing] = np.datetime64("NaT")
+    return pd.Series(arrival, index=df.index, name="Chegada")
+
+
 def boundaries(data: list[str]) -> list[tuple[int, int]]:
     """Procura e guarda a posicao de cada evento.
 
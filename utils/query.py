@@ -0,0 +1,341 @@
+# pyright: basic
+
+import re
+import time
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from utils import declustering, filters
+
+"""Linguagem de expressoes para os filtros (T7), sem menus interativos
+
+Uma expressao e analisada uma unica vez e compilada numa lista de chamadas aos
+filtros vetorizados de `filters.py`. Condicoes sobre o mesmo campo sao juntas num
+so intervalo, e as condicoes categoricas (sz, vz, pub, type) numa so pesquisa
+bitmap. Os filtros mais baratos (datas, bitmaps) sao aplicados primeiro.
+
+Exemplo:
+    date>=2014-01-01 and sz in (SZ06,SZ07) and magL between 2 and 4 and gap<180
+
+Gramatica:
+    query  := clause ("and" clause)*
+    clause := field op value
+            | field "in" "(" value ("," value)* ")"
+            | field "between" value "and" value
+            | "last" window
+            | "within" "(" lat "," lon "," km ")"
+            | "bbox" "(" lat_min "," lat_max "," lon_min "," lon_max ")"
+            | "mainshocks" ["(" ("gk" | "reasenberg") ")"]
+    op     := "<" | "<=" | ">" | ">=" | "=" | "=="
+
+Campos:
+    date, depth, gap, lat, lon, mag (magnitude L), mag<Tipo> (ex: magC, com o
+    tipo em `MAG_TYPES`), sz, vz, pub, type
+
+Uma data sem horas representa o dia inteiro: `date<=2014-12-31` inclui os eventos
+de 31 de dezembro, e `date>2014-12-31` comeca em 1 de janeiro.
+
+"""
+
+NUMERIC_FIELDS = {
+    "depth": "Profundidade",
+    "prof": "Profundidade",
+    "gap": "Gap",
+    "lat": "Latitude",
+    "lon": "Longitude",
+}
+CATEGORICAL_FIELDS = {
+    "sz": "SZ",
+    "vz": "VZ",
+    "pub": "Pub",
+    "quality": "Pub",
+    "type": "Tipo Evento",
+    "tipo": "Tipo Evento",
+}
+DATE_FIELDS = {"date", "data"}
+
+# tipos de magnitude do formato Nordic (ex: `magC` para a magnitude de coda)
+MAG_TYPES = {"L", "C", "B", "S", "W"}
+
+_TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<op>>=|<=|==|!=|=|<|>)
+      | (?P<punct>[(),])
+      | (?P<str>"[^"]*"|'[^']*')
+      | (?P<word>[^\s(),<>=!"']+)
+    )""",
+    re.VERBOSE,
+)
+
+type Step = tuple[Callable[..., pd.DataFrame], tuple[Any, ...]]
+
+
+def tokenize(source: str) -> list[str]:
+    """Divide uma expressao em tokens
+
+    Args:
+        source (str): expressao
+
+    Raises:
+        ValueError: se existirem caracteres invalidos
+
+    Returns:
+        list[str]: tokens
+    """
+    tokens = []
+    pos = 0
+    source = source.rstrip()
+    while pos < len(source):
+        match = _TOKEN_RE.match(source, pos)
+        if match is None or match.end() == pos:
+            raise ValueError(f"Expressao invalida perto de: {source[pos:]!r}")
+        token = match.group(match.lastgroup)  # type: ignore
+        if match.lastgroup == "str":
+            token = token[1:-1]
+        tokens.append(token)
+        pos = match.end()
+    return tokens
+
+
+class Query:
+    """Expressao compilada, pronta a correr sobre qualquer catalogo"""
+
+    def __init__(self, source: str, steps: list[Step], compile_ms: float):
+        self.source = source
+        self.steps = steps
+        self.compile_ms = compile_ms
+        self.run_ms: float | None = None
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Aplica os filtros compilados a `df`
+
+        Args:
+            df (pd.DataFrame): DataFrame a filtrar
+
+        Returns:
+            pd.DataFrame: DataFrame filtrada
+        """
+        start = time.perf_counter()
+        for func, args in self.steps:
+            df = func(df, *args)
+        self.run_ms = (time.perf_counter() - start) * 1e3
+        return df
+
+    def explain(self) -> str:
+        """Descricao dos filtros compilados, pela ordem em que sao aplicados
+
+        Returns:
+            str: um filtro por linha
+        """
+        return "\n".join(
+            f"{func.__name__}({', '.join(map(repr, args))})" for func, args in self.steps
+        )
+
+    def __repr__(self) -> str:
+        return f"Query({self.source!r})"
+
+
+class _Parser:
+    """Parser recursivo descendente das expressoes"""
+
+    def __init__(self, tokens: list[str]):
+        self.tokens = tokens
+        self.pos = 0
+        self.intervals: dict[tuple[str, str], list[Any]] = {}
+        self.categories: dict[str, set[str]] = {}
+        self.extra: list[Step] = []
+
+    def _peek(self) -> str | None:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise ValueError("Expressao incompleta")
+        self.pos += 1
+        return token
+
+    def _expect(self, expected: str) -> None:
+        token = self._next()
+        if token.lower() != expected:
+            raise ValueError(f"Esperado {expected!r}, encontrado {token!r}")
+
+    def _numbers(self, count: int) -> list[float]:
+        self._expect("(")
+        values = [float(self._next())]
+        for _ in range(count - 1):
+            self._expect(",")
+            values.append(float(self._next()))
+        self._expect(")")
+        return values
+
+    def parse(self) -> None:
+        self._clause()
+        while self._peek() is not None:
+            self._expect("and")
+            self._clause()
+
+    def _clause(self) -> None:
+        name = self._next().lower()
+
+        if name == "last":
+            window = self._next()
+            nxt = self._peek()
+            if window.isdigit() and nxt is not None and nxt.lower() != "and":
+                window = f"{window} {self._next()}"
+            self.extra.append((filters.filter_by_last, (window,)))
+            return
+        if name == "within":
+            self.extra.append((filters.filter_by_radius, tuple(self._numbers(3))))
+            return
+        if name == "bbox":
+            self.extra.append((filters.filter_by_bbox, tuple(self._numbers(4))))
+            return
+        if name == "mainshocks":
+            method = "gk"
+            if self._peek() == "(":
+                self._next()
+                method = self._next().lower()
+                self._expect(")")
+            if method not in declustering.METHODS:
+                raise ValueError(f"Metodo de declustering desconhecido: {method}")
+            self.extra.append((filters.filter_by_mainshocks, (method,)))
+            return
+
+        op = self._next().lower()
+        if name in CATEGORICAL_FIELDS:
+            self._categorical(name, op)
+        elif op == "between":
+            lo = self._next()
+            self._expect("and")
+            self._range(name, ">=", lo)
+            self._range(name, "<=", self._next())
+        else:
+            self._range(name, op, self._next())
+
+    def _categorical(self, name: str, op: str) -> None:
+        if op in ("=", "=="):
+            values = {self._next()}
+        elif op == "in":
+            self._expect("(")
+            values = {self._next()}
+            while self._peek() == ",":
+                self._next()
+                values.add(self._next())
+            self._expect(")")
+        else:
+            raise ValueError(f"Operador {op!r} nao suportado para {name}")
+
+        if name in ("type", "tipo"):
+            values = {v.capitalize() for v in values}
+        else:
+            values = {v.upper() for v in values}
+
+        col = CATEGORICAL_FIELDS[name]
+        self.categories[col] = self.categories.get(col, values) & values
+
+    def _range(self, name: str, op: str, raw: str) -> None:
+        if name in DATE_FIELDS:
+            key = ("date", "Data")
+            value: Any = pd.Timestamp(raw)
+            step: Any = pd.Timedelta(1, "ns")
+            lo, hi = pd.Timestamp.min, pd.Timestamp.max
+            bareDate = value == value.normalize() and len(raw) <= 10
+            if bareDate and op in ("=", "==", "<=", ">"):
+                # uma data sem horas representa o dia inteiro: os limites que incluem
+                # (<=) ou excluem (>) o dia sao o inicio do dia seguinte
+                nextDay = str((value + pd.Timedelta(1, "D")).date())
+                if op != ">":
+                    self._range(name, "<", nextDay)
+                if op != "<=":
+                    self._range(name, ">=", nextDay if op == ">" else raw)
+                return
+        elif name in NUMERIC_FIELDS:
+            key = ("num", NUMERIC_FIELDS[name])
+            value, step, lo, hi = float(raw), None, -np.inf, np.inf
+        elif name == "mag" or name[:3] == "mag" and name[3:].upper() in MAG_TYPES:
+            key = ("mag", name[3:].upper() or "L")
+            value, step, lo, hi = float(raw), None, -np.inf, np.inf
+        else:
+            raise ValueError(f"Campo desconhecido: {name}")
+
+        interval = self.intervals.setdefault(key, [lo, hi])
+
+        def _after(v):
+            return v + step if step is not None else float(np.nextafter(v, np.inf))
+
+        def _before(v):
+            return v - step if step is not None else float(np.nextafter(v, -np.inf))
+
+        match op:
+            case ">=":
+                interval[0] = max(interval[0], value)
+            case ">":
+                interval[0] = max(interval[0], _after(value))
+            case "<=":
+                interval[1] = min(interval[1], value)
+            case "<":
+                interval[1] = min(interval[1], _before(value))
+            case "=" | "==":
+                interval[0] = max(interval[0], value)
+                interval[1] = min(interval[1], value)
+            case _:
+                raise ValueError(f"Operador {op!r} nao suportado para {name}")
+
+    def steps(self) -> list[Step]:
+        """Lista de filtros, dos mais baratos para os mais caros"""
+        steps: list[Step] = []
+        ranges: list[Step] = []
+        mags: list[Step] = []
+
+        for (kind, col), (lo, hi) in self.intervals.items():
+            if kind == "date":
+                steps.append((filters.filter_by_date, (lo, hi)))
+            elif kind == "mag":
+                mags.append((filters.filter_by_magnitude, (lo, hi, col, "max")))
+            elif col == "Profundidade":
+                ranges.append((filters.filter_by_depth, (lo, hi)))
+            elif col == "Gap" and lo == -np.inf:
+                ranges.append((filters.filter_by_gap, (hi,)))
+            else:
+                ranges.append((filters.filter_by_range, (col, lo, hi)))
+
+        if self.categories:
+            criteria = {k: sorted(v) for k, v in self.categories.items()}
+            steps.append((filters.filter_by_categories, (criteria,)))
+
+        return steps + self.extra + ranges + mags
+
+
+def compile_query(source: str) -> Query:
+    """Analisa e compila uma expressao
+
+    Args:
+        source (str): expressao, ex: `date>=2014-01-01 and sz in (SZ06,SZ07)`
+
+    Raises:
+        ValueError: se a expressao for invalida
+
+    Returns:
+        Query: expressao compilada
+    """
+    start = time.perf_counter()
+    parser = _Parser(tokenize(source))
+    parser.parse()
+    steps = parser.steps()
+    return Query(source, steps, (time.perf_counter() - start) * 1e3)
+
+
+def run_query(df: pd.DataFrame, source: str) -> pd.DataFrame:
+    """Compila e aplica uma expressao a `df`
+
+    Args:
+        df (pd.DataFrame): DataFrame a filtrar
+        source (str): expressao
+
+    Returns:
+        pd.DataFrame: DataFrame filtrada
+    """
+    return compile_query(source).run(df)
@@ -0,0 +1,274 @@
+# pyright: basic
+
+import numpy as np
+import pandas as pd
+
+from utils import catalog
+from utils.utils import event_magnitudes
+
+"""Taxas de eventos e de libertacao de energia em janelas deslizantes
+
+Os tempos de origem (um por evento) sao ordenados uma vez. Para uma grelha de fins
+de janela `t` (de `step` em `step`), o numero de eventos em `]t - window, t]` e a
+diferenca entre duas pesquisas binarias (`searchsorted`) nos tempos, e a soma dos
+momentos sismicos e a diferenca entre duas posicoes da soma acumulada dos momentos.
+O custo e O((eventos + janelas) * log(eventos)), independente do tamanho da janela.
+
+Cada janela e comparada com uma taxa de referencia (a taxa media do catalogo, ou a
+taxa numa janela de referencia imediatamente anterior) e marcada como anomala se o
+numero de eventos exceder o esperado em mais de `ANOMALY_Z` desvios padrao
+(aproximacao de Poisson). Janelas cuja referencia nao tem eventos nao tem taxa
+esperada (NaN) e nunca sao marcadas.
+
+Os tempos e momentos ordenados sao construidos uma vez por versao do catalogo (ver
+`catalog.py`), e os subconjuntos usam apenas os seus eventos.
+
+"""
+
+DEFAULT_WINDOWS = ("1h", "6h", "24h")
+DEFAULT_STEP = "1min"
+
+ANOMALY_Z = 3.0
+ANOMALY_MIN_COUNT = 3
+
+RATE_COLUMNS = ["Count", "Moment", "Expected", "Anomaly"]
+
+
+def seismic_moment(mags: np.ndarray) -> np.ndarray:
+    """Momento sismico, M0 = 10^(1.5 M + 9.1) N.m (Hanks & Kanamori, 1979)
+
+    Args:
+        mags (np.ndarray): magnitudes
+
+    Returns:
+        np.ndarray: momentos, 0 para eventos sem magnitude
+    """
+    return np.nan_to_num(10 ** (1.5 * np.asarray(mags, dtype=float) + 9.1), nan=0.0)
+
+
+class EventTimes:
+    """Tempos de origem ordenados e soma acumulada dos momentos sismicos"""
+
+    def __init__(self, times: np.ndarray, mags: np.ndarray, ids: np.ndarray):
+        """
+        Args:
+            times (np.ndarray): tempos de origem, em `datetime64[ns]`
+            mags (np.ndarray): magnitude de cada evento (NaN se nao tiver)
+            ids (np.ndarray): ID de cada evento
+        """
+        order = np.argsort(times, kind="stable")
+        self.ids = ids[order]
+        self.mags = mags[order]
+        self.times = times[order].astype("datetime64[ns]").view(np.int64)
+        self.cumMoment = np.r_[0.0, np.cumsum(seismic_moment(self.mags))]
+
+    @classmethod
+    def from_catalog(cls, df: pd.DataFrame) -> "EventTimes":
+        """Constroi a partir dos eventos unicos de uma DataFrame, usando a maior
+        magnitude de cada evento
+
+        Args:
+            df (pd.DataFrame): Dataframe com eventos
+
+        Returns:
+            EventTimes: tempos e momentos
+        """
+        events = df.drop_duplicates(subset="ID", keep="first")
+        mags = event_magnitudes(events).groupby("ID")["Magnitude"].max()
+        return cls(
+            events["Data"].to_numpy(dtype="datetime64[ns]"),
+            events["ID"].map(mags).to_numpy(dtype=float),
+            events["ID"].to_numpy(),
+        )
+
+    def subset(self, ids: np.ndarray) -> "EventTimes":
+        """Tempos e momentos apenas dos eventos `ids`
+
+        Args:
+            ids (np.ndarray): IDs dos eventos
+
+        Returns:
+            EventTimes: tempos e momentos do subconjunto
+        """
+        mask = np.isin(self.ids, ids)
+        return EventTimes(
+            self.times[mask].view("datetime64[ns]"), self.mags[mask], self.ids[mask]
+        )
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def window(self, ends: np.ndarray, length: int) -> tuple[np.ndarray, np.ndarray]:
+        """Numero de eventos e soma dos momentos em `]end - length, end]`
+
+        Args:
+            ends (np.ndarray): fins das janelas, em ns
+            length (int): duracao da janela, em ns
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: contagens e momentos
+        """
+        hi = np.searchsorted(self.times, ends, "right")
+        lo = np.searchsorted(self.times, ends - length, "right")
+        return hi - lo, self.cumMoment[hi] - self.cumMoment[lo]
+
+
+def event_times(df: pd.DataFrame) -> EventTimes:
+    """Tempos e momentos dos eventos de `df`, a partir dos do catalogo completo
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+
+    Returns:
+        EventTimes: tempos e momentos
+    """
+    ev = catalog.derived(df, "event_times", EventTimes.from_catalog)
+    base = catalog.root(df)
+    if base is None or df is base:
+        return ev
+    return ev.subset(df["ID"].unique())
+
+
+def _expected(
+    ev: EventTimes, ends: np.ndarray, length: int, baseline: int | None
+) -> np.ndarray:
+    """Funcao privada com o numero de eventos esperado em cada janela
+
+    Args:
+        ev (EventTimes): tempos dos eventos
+        ends (np.ndarray): fins das janelas, em ns
+        length (int): duracao da janela, em ns
+        baseline (int | None): duracao da janela de referencia, em ns, anterior a
+            cada janela; None para a taxa media do catalogo
+
+    Returns:
+        np.ndarray: numero esperado de eventos, NaN se a janela de referencia nao
+            tiver eventos
+    """
+    if baseline is None:
+        span = max(int(ev.times[-1] - ev.times[0]), length) if len(ev) else length
+        return np.full(len(ends), len(ev) * length / span)
+    counts, _ = ev.window(ends - length, baseline)
+    return np.where(counts > 0, counts * length / baseline, np.nan)
+
+
+def sliding_rates(
+    df: pd.DataFrame,
+    window: str | pd.Timedelta = "24h",
+    step: str | pd.Timedelta = DEFAULT_STEP,
+    baseline: str | pd.Timedelta | None = "30D",
+    start: pd.Timestamp | None = None,
+    end: pd.Timestamp | None = None,
+) -> pd.DataFrame:
+    """Numero de eventos e momento sismico libertado em janelas deslizantes
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        window (str | pd.Timedelta): duracao da janela (default: `24h`)
+        step (str | pd.Timedelta): intervalo entre janelas (default: `DEFAULT_STEP`)
+        baseline (str | pd.Timedelta | None): duracao da janela de referencia anterior
+            a cada janela (default: `30D`); None para a taxa media do catalogo
+        start (pd.Timestamp | None): fim da primeira janela (default: primeiro evento)
+        end (pd.Timestamp | None): fim da ultima janela (default: ultimo evento)
+
+    Returns:
+        pd.DataFrame: uma linha por janela, indexada pelo fim da janela, com
+            `Count`, `Moment` (N.m), `Expected` e `Anomaly`
+    """
+    ev = event_times(df)
+    length = pd.Timedelta(window).value
+    stepNs = pd.Timedelta(step).value
+    base = None if baseline is None else pd.Timedelta(baseline).value
+
+    if len(ev) == 0 and (start is None or end is None):
+        empty = pd.DataFrame(columns=RATE_COLUMNS, index=pd.DatetimeIndex([], name="Data"))
+        return empty.astype({"Count": np.int64, "Moment": float, "Expected": float, "Anomaly": bool})
+
+    first = pd.Timestamp(start).value if start is not None else int(ev.times[0])
+    last = pd.Timestamp(end).value if end is not None else int(ev.times[-1])
+    # fins alinhados a `step`, com o primeiro e o ultimo evento dentro da grelha
+    first = -(-first // stepNs) * stepNs
+    ends = np.arange(first, last + stepNs, stepNs, dtype=np.int64)
+
+    counts, moments = ev.window(ends, length)
+    expected = _expected(ev, ends, length, base)
+    # sem eventos na referencia (`expected` NaN), a comparacao e sempre falsa
+    anomaly = (counts >= ANOMALY_MIN_COUNT) & (
+        counts > expected + ANOMALY_Z * np.sqrt(expected)
+    )
+
+    return pd.DataFrame(
+        {"Count": counts, "Moment": moments, "Expected": expected, "Anomaly": anomaly},
+        index=pd.DatetimeIndex(ends.view("datetime64[ns]"), name="Data"),
+    )
+
+
+def latest_rates(
+    df: pd.DataFrame,
+    windows: tuple[str, ...] = DEFAULT_WINDOWS,
+    baseline: str | pd.Timedelta | None = "30D",
+    at: pd.Timestamp | None = None,
+) -> pd.DataFrame:
+    """Taxas nas janelas que terminam em `at`, para acompanhar cada evento novo
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        windows (tuple[str, ...]): duracoes das janelas (default: `DEFAULT_WINDOWS`)
+        baseline (str | pd.Timedelta | None): janela de referencia (default: `30D`)
+        at (pd.Timestamp | None): fim das janelas (default: ultimo evento)
+
+    Returns:
+        pd.DataFrame: uma linha por janela, com `RATE_COLUMNS`
+    """
+    ev = event_times(df)
+    if at is not None:
+        end = pd.Timestamp(at).value
+    elif len(ev):
+        end = int(ev.times[-1])
+    else:
+        end = 0
+    ends = np.array([end], dtype=np.int64)
+    base = None if baseline is None else pd.Timedelta(baseline).value
+
+    rows = {}
+    for w in windows:
+        length = pd.Timedelta(w).value
+        counts, moments = ev.window(ends, length)
+        expected = _expected(ev, ends, length, base) if len(ev) else np.zeros(1)
+        rows[w] = {
+            "Count": int(counts[0]),
+            "Moment": float(moments[0]),
+            "Expected": float(expected[0]),
+            "Anomaly": bool(
+                counts[0] >= ANOMALY_MIN_COUNT
+                and counts[0] > expected[0] + ANOMALY_Z * np.sqrt(expected[0])
+            ),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")[RATE_COLUMNS]
+
+
+def anomalies(rates: pd.DataFrame) -> pd.DataFrame:
+    """Junta as janelas anomalas consecutivas em episodios
+
+    Args:
+        rates (pd.DataFrame): resultado de `sliding_rates`
+
+    Returns:
+        pd.DataFrame: um episodio por linha, com `Inicio`, `Fim` (fins da primeira e
+            da ultima janela anomala), o maximo de eventos numa janela (`Count`) e o
+            maximo de momento libertado numa janela (`Moment`)
+    """
+    flags = rates["Anomaly"].to_numpy()
+    changes = np.diff(np.r_[0, flags.astype(np.int8), 0])
+    starts, stops = np.flatnonzero(changes == 1), np.flatnonzero(changes == -1)
+
+    counts = rates["Count"].to_numpy()
+    moments = rates["Moment"].to_numpy()
+    return pd.DataFrame(
+        {
+            "Inicio": rates.index[starts],
+            "Fim": rates.index[stops - 1],
+            "Count": [counts[a:b].max() for a, b in zip(starts, stops)],
+            "Moment": [moments[a:b].max() for a, b in zip(starts, stops)],
+        }
+    )
@@ -0,0 +1,156 @@
+# pyright: basic
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+import matplotlib
+import pandas as pd
+
+from utils import figcache, filters, query, report, visuals
+
+"""Desenho dos graficos T6 para ficheiros, sem display
+
+Cada grafico e preparado no processo principal: os dados (contagens, estatisticas
+por mes) saem do motor de agregacao e sao pequenos. So o desenho, que e a parte
+lenta, e feito numa pool de processos, com o backend `Agg` (nao interativo). Cada
+processo recebe apenas a funcao de plot e os seus argumentos, e nao o catalogo.
+
+Os graficos sao desenhados para o catalogo completo, para cada subconjunto definido
+por uma expressao de filtros (ver `report.PRESETS`) e, opcionalmente, para cada zona
+de um tipo (ex: cada SZ). Os ficheiros ficam em `<diretorio>/<variante>/<grafico>.<ext>`.
+
+Os graficos ja desenhados com os mesmos dados sao copiados da cache de figuras (ver
+`utils/figcache.py`), sem passar pela pool.
+
+"""
+
+FORMATS = ("png", "svg", "pdf")
+BACKEND = "Agg"
+
+# resolucao das imagens raster
+DPI = 100
+
+
+def _init_worker() -> None:
+    """Funcao privada que prepara cada processo para desenhar sem display"""
+    matplotlib.use(BACKEND, force=True)
+    matplotlib.rcParams["savefig.dpi"] = DPI
+
+
+def _draw(plot: Callable[..., None], kwargs: dict[str, Any], fnames: list[str]) -> list[str]:
+    """Funcao privada que desenha um grafico (ou o copia da cache) e o guarda em
+    todos os formatos
+
+    Returns:
+        list[str]: ficheiros escritos
+    """
+    visuals.draw(plot, kwargs, fnames)
+    return fnames
+
+
+def variants(
+    df: pd.DataFrame,
+    presets: dict[str, str] | None = None,
+    zone: str | None = None,
+) -> dict[str, pd.DataFrame]:
+    """Subconjuntos do catalogo a desenhar
+
+    Args:
+        df (pd.DataFrame): catalogo
+        presets (dict[str, str] | None): nome -> expressao de filtros
+            (default: `report.PRESETS`)
+        zone (str | None): tipo de zona (ex: `SZ`) para uma variante por zona
+            (default: sem variantes por zona)
+
+    Raises:
+        ValueError: se alguma expressao for invalida
+
+    Returns:
+        dict[str, pd.DataFrame]: nome da variante -> eventos
+    """
+    presets = report.PRESETS if presets is None else presets
+    subsets = {
+        name: query.run_query(df, expr) if expr.strip() else df
+        for name, expr in presets.items()
+    }
+    if zone is not None:
+        for value in sorted(df[zone].dropna().unique()):
+            subsets[f"{zone}_{value}"] = filters.filter_by_zone(df, zone, value)
+    return subsets
+
+
+def render_all(
+    df: pd.DataFrame,
+    outdir: str,
+    formats: tuple[str, ...] = ("png",),
+    presets: dict[str, str] | None = None,
+    zone: str | None = None,
+    workers: int | None = None,
+) -> dict[str, Any]:
+    """Desenha os seis graficos T6 de cada variante do catalogo para ficheiros
+
+    Args:
+        df (pd.DataFrame): catalogo
+        outdir (str): diretorio de saida
+        formats (tuple[str, ...]): formatos, de entre `FORMATS` (default: png)
+        presets (dict[str, str] | None): ver `variants`
+        zone (str | None): ver `variants`
+        workers (int | None): numero de processos (default: o do
+            `ProcessPoolExecutor`)
+
+    Raises:
+        ValueError: se algum formato for desconhecido
+
+    Returns:
+        dict[str, Any]: `ficheiros` escritos, `graficos` (numero de graficos),
+            `cache` (graficos copiados da cache) e `tempos` (ms) da preparacao dos
+            dados e do desenho
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"Formato desconhecido: {', '.join(sorted(unknown))}")
+
+    cache = figcache.get_cache()
+    start = time.perf_counter()
+    jobs = []
+    written = []
+    cached = 0
+    for name, subset in variants(df, presets, zone).items():
+        if subset.empty:
+            continue
+        folder = os.path.join(outdir, name)
+        os.makedirs(folder, exist_ok=True)
+
+        for plotName, (prepare, args) in visuals.T6_PLOTS.items():
+            plot, kwargs = cache.prepared(subset, prepare.__name__, args, prepare)
+            kwargs = {**kwargs, "title": f"{kwargs['title']} ({name})"}
+            fnames = [os.path.join(folder, f"{plotName}.{ext}") for ext in formats]
+
+            key = visuals.figure_key(plot, kwargs, DPI)
+            if all(cache.get(key, ext) for ext in formats):
+                for ext, f in zip(formats, fnames):
+                    cache.copy(key, ext, f)
+                written.extend(fnames)
+                cached += 1
+            else:
+                jobs.append((plot, kwargs, fnames))
+    prepareMs = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for files in pool.map(_draw, *zip(*jobs)):
+                written.extend(files)
+    cache.evict()
+
+    return {
+        "ficheiros": written,
+        "graficos": len(jobs) + cached,
+        "cache": cached,
+        "tempos": {
+            "dados": prepareMs,
+            "desenho": (time.perf_counter() - start) * 1000,
+        },
+    }
@@ -0,0 +1,229 @@
+# pyright: basic
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from utils import query, stats
+from utils.stations import DIST_COL
+from utils.utils import event_magnitudes
+
+"""Relatorio estatistico completo, sem menus
+
+Calcula uma vez todas as estatisticas dos menus T3 (media, variancia, desvio padrao,
+maximo, minimo e moda de magnitudes, distancias e profundidades) e T5 (eventos por dia
+e por mes, estatisticas de profundidade e magnitude por mes), para o catalogo completo
+e para cada subconjunto definido por uma expressao de filtros (ver `utils/query.py`).
+
+Os subconjuntos sao filtrados primeiro, no processo principal (os filtros reutilizam
+os indices do catalogo). As seccoes de cada subconjunto sao independentes entre si e
+sao calculadas em paralelo, numa pool de threads (o trabalho e feito pelo numpy e
+pandas, que libertam o GIL).
+
+O resultado e escrito num diretorio com:
+    - `relatorio.md`: todas as tabelas, em Markdown
+    - `<subconjunto>_<seccao>.csv`: uma tabela por ficheiro
+    - `relatorio.json`: todas as tabelas e os tempos de calculo
+
+"""
+
+# subconjuntos por omissao: nome -> expressao de filtros ("" para o catalogo completo)
+PRESETS = {
+    "catalogo": "",
+    "principais": "mainshocks",
+    "gap180": "gap<180",
+}
+
+# estatisticas T3; desvio padrao e variancia com ddof=0, como `np.std` e `np.var`
+T3_STATS = ("count", "mean", "var", "std", "min", "max", "mode", "median")
+
+SECTION_TITLES = {
+    "t3": "Estatísticas (T3)",
+    "eventos_dia": "Número de eventos por dia",
+    "eventos_mes": "Número de eventos por mês",
+    "profundidade_mes": "Estatísticas Profundidade por mês",
+    "magnitude_mes": "Estatísticas Magnitude por mês",
+}
+
+
+def t3_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Estatisticas T3 de todas as variaveis, com uma so ordenacao
+
+    As magnitudes sao todas as magnitudes dos eventos, e tambem cada tipo em separado.
+    A distancia e a distancia epicentral de cada leitura (coluna `DIS`; a coluna
+    `Distancia` do parser e a classe Local/Regional).
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+
+    Returns:
+        pd.DataFrame: uma linha por variavel, com `T3_STATS`
+    """
+    mags = event_magnitudes(df)
+    series = {"Magnitudes": mags["Magnitude"].to_numpy(dtype=float)}
+    for magType, group in mags.groupby("Tipo", sort=True)["Magnitude"]:
+        series[f"Magnitudes {magType}"] = group.to_numpy(dtype=float)
+    series["Distancia"] = df[DIST_COL].to_numpy(dtype=float)
+    events = df.drop_duplicates(subset="ID", keep="first")
+    series["Profundidade"] = events["Profundidade"].to_numpy(dtype=float)
+
+    labels = pd.Index(list(series), name="Variavel")
+    codes = np.repeat(np.arange(len(series)), [len(v) for v in series.values()])
+    values = np.concatenate(list(series.values()))
+    g = stats.Groups.from_codes(labels, codes, values)
+
+    res = g.stats(T3_STATS)
+    with np.errstate(invalid="ignore"):
+        res["std"] = np.sqrt(res["var"])
+    return pd.DataFrame(
+        {stats.STAT_LABELS[k]: res[k] for k in T3_STATS}, index=labels
+    )
+
+
+def _event_counts(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Funcao privada com o numero de eventos por dia e por mes, numa so passagem"""
+    levels = stats.aggregate_levels(df, None, ("count",), periods=("D", "ME"))
+    return {"eventos_dia": levels["D"], "eventos_mes": levels["ME"]}
+
+
+# seccoes de cada subconjunto: nome -> funcao que retorna uma ou mais tabelas
+SECTIONS: dict[str, Callable[[pd.DataFrame], dict[str, pd.DataFrame]]] = {
+    "t3": lambda df: {"t3": t3_table(df)},
+    "eventos": _event_counts,
+    "profundidade_mes": lambda df: {"profundidade_mes": stats.stats_depth_month(df)},
+    "magnitude_mes": lambda df: {"magnitude_mes": stats.stats_mag_month(df)},
+}
+
+
+def build_report(
+    df: pd.DataFrame, presets: dict[str, str] = PRESETS, workers: int | None = None
+) -> dict:
+    """Calcula todas as seccoes do relatorio, para cada subconjunto
+
+    Args:
+        df (pd.DataFrame): catalogo
+        presets (dict[str, str]): nome -> expressao de filtros (default: `PRESETS`)
+        workers (int | None): numero de threads (default: o do `ThreadPoolExecutor`)
+
+    Raises:
+        ValueError: se alguma expressao for invalida (antes de qualquer calculo)
+
+    Returns:
+        dict: `tabelas` (subconjunto -> seccao -> DataFrame), `eventos` (numero de
+            eventos de cada subconjunto), `expressoes` e `tempos` (ms)
+    """
+    compiled = {
+        name: query.compile_query(expr) if expr.strip() else None
+        for name, expr in presets.items()
+    }
+
+    start = time.perf_counter()
+    subsets = {
+        name: df if q is None else q.run(df) for name, q in compiled.items()
+    }
+    filterMs = (time.perf_counter() - start) * 1000
+
+    def _run(section, subset):
+        t = time.perf_counter()
+        return SECTIONS[section](subset), (time.perf_counter() - t) * 1000
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            (name, section): pool.submit(_run, section, subset)
+            for name, subset in subsets.items()
+            for section in SECTIONS
+        }
+        tables: dict[str, dict[str, pd.DataFrame]] = {name: {} for name in subsets}
+        times: dict[str, float] = {"filtros": filterMs}
+        for (name, section), future in futures.items():
+            result, ms = future.result()
+            tables[name].update(result)
+            times[f"{name}/{section}"] = ms
+
+    times["total"] = (time.perf_counter() - start) * 1000
+    return {
+        "tabelas": tables,
+        "eventos": {
+            name: int(subset["ID"].nunique()) for name, subset in subsets.items()
+        },
+        "expressoes": dict(presets),
+        "tempos": times,
+    }
+
+
+def _cell(v) -> str:
+    """Funcao privada que formata um valor de uma tabela"""
+    if pd.isna(v):
+        return ""
+    if isinstance(v, pd.Timestamp):
+        return str(v.date()) if v == v.normalize() else v.strftime("%Y-%m-%d %H:%M")
+    if isinstance(v, float):
+        return f"{v:.4f}"
+    return str(v)
+
+
+def _markdown(table: pd.DataFrame) -> str:
+    """Funcao privada que formata uma tabela em Markdown"""
+    table = table.reset_index()
+    rows = [[str(c) for c in table.columns]]
+    for record in table.itertuples(index=False):
+        rows.append([_cell(v) for v in record])
+
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + "---|" * len(rows[0])]
+    lines += ["| " + " | ".join(r) + " |" for r in rows[1:]]
+    return "\n".join(lines)
+
+
+def write_report(report: dict, outdir: str) -> list[str]:
+    """Escreve o relatorio em Markdown, CSV e JSON
+
+    Args:
+        report (dict): resultado de `build_report`
+        outdir (str): diretorio de saida (criado se nao existir)
+
+    Returns:
+        list[str]: ficheiros escritos
+    """
+    os.makedirs(outdir, exist_ok=True)
+    written = []
+
+    md = ["# Relatório estatístico", ""]
+    data = {
+        "expressoes": report["expressoes"],
+        "eventos": report["eventos"],
+        "tempos_ms": report["tempos"],
+        "tabelas": {},
+    }
+
+    for name, tables in report["tabelas"].items():
+        expr = report["expressoes"][name] or "catálogo completo"
+        md += [f"## {name}", "", f"`{expr}` — {report['eventos'][name]} eventos", ""]
+        data["tabelas"][name] = {}
+
+        for section, title in SECTION_TITLES.items():
+            table = tables[section]
+            md += [f"### {title}", "", _markdown(table), ""]
+
+            fname = os.path.join(outdir, f"{name}_{section}.csv")
+            table.to_csv(fname)
+            written.append(fname)
+
+            data["tabelas"][name][section] = json.loads(
+                table.reset_index().to_json(orient="records", date_format="iso")
+            )
+
+    fname = os.path.join(outdir, "relatorio.md")
+    with open(fname, "w", encoding="utf-8") as f:
+        f.write("\n".join(md))
+    written.append(fname)
+
+    fname = os.path.join(outdir, "relatorio.json")
+    with open(fname, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    written.append(fname)
+    return written
@@ -0,0 +1,289 @@
+# pyright: basic
+
+import math
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import catalog
+
+"""Indice espacial dos epicentros
+
+Os epicentros (um por evento) sao distribuidos por uma grelha regular de
+latitude/longitude. Os eventos sao ordenados pela celula a que pertencem, e um
+array de offsets (como numa matriz CSR) indica onde comeca cada celula. Como as
+celulas de uma mesma linha da grelha sao consecutivas, uma caixa de pesquisa
+corresponde a uma slice por cada linha da grelha, sem percorrer o catalogo.
+
+Todas as pesquisas retornam os IDs dos eventos encontrados.
+
+"""
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+
+# numero medio de eventos por celula, e numero maximo de celulas da grelha
+EVENTS_PER_CELL = 16
+MAX_CELLS = 1 << 22
+
+
+def haversine(
+    lat: float, lon: float, lats: np.ndarray, lons: np.ndarray
+) -> np.ndarray:
+    """Distancia de circulo maximo, em km, entre um ponto e um array de pontos
+
+    Args:
+        lat (float): latitude do ponto
+        lon (float): longitude do ponto
+        lats (np.ndarray): latitudes
+        lons (np.ndarray): longitudes
+
+    Returns:
+        np.ndarray: distancias em km
+    """
+    p1 = np.radians(lat)
+    p2 = np.radians(lats)
+    dp = p2 - p1
+    dl = np.radians(lons - lon)
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def points_in_polygon(
+    lats: np.ndarray, lons: np.ndarray, polygon: Sequence[tuple[float, float]]
+) -> np.ndarray:
+    """Teste vetorizado de ponto-em-poligono (regra par-impar / ray casting)
+
+    Args:
+        lats (np.ndarray): latitudes dos pontos
+        lons (np.ndarray): longitudes dos pontos
+        polygon (Sequence[tuple[float, float]]): vertices (lat, lon) do poligono
+
+    Returns:
+        np.ndarray: mascara booleana dos pontos dentro do poligono
+    """
+    inside = np.zeros(len(lats), dtype=bool)
+    n = len(polygon)
+
+    for i in range(n):
+        y1, x1 = polygon[i]
+        y2, x2 = polygon[(i + 1) % n]
+        if y1 == y2:
+            continue
+        crosses = (y1 > lats) != (y2 > lats)
+        xCross = x1 + (lats - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (lons < xCross)
+    return inside
+
+
+class SpatialIndex:
+    """Grelha regular sobre os epicentros dos eventos"""
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        cell_size: float | None = None,
+    ):
+        """Constroi o indice
+
+        Args:
+            ids (np.ndarray): IDs dos eventos
+            lats (np.ndarray): latitudes dos epicentros
+            lons (np.ndarray): longitudes dos epicentros
+            cell_size (float | None): lado da celula, em graus
+                (default: escolhido para ~`EVENTS_PER_CELL` eventos por celula)
+        """
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        ids, lats, lons = ids[valid], lats[valid], lons[valid]
+
+        if len(ids) == 0:
+            self.lat0, self.lon0, self.cell = 0.0, 0.0, 1.0
+            self.nrows = self.ncols = 1
+        else:
+            self.lat0, self.lon0 = float(lats.min()), float(lons.min())
+            height = max(float(lats.max()) - self.lat0, 1e-6)
+            width = max(float(lons.max()) - self.lon0, 1e-6)
+
+            if cell_size is None:
+                cells = max(len(ids) / EVENTS_PER_CELL, 1)
+                cell_size = math.sqrt(height * width / cells)
+            cell_size = max(cell_size, math.sqrt(height * width / MAX_CELLS))
+
+            self.cell = cell_size
+            self.nrows = int(height // cell_size) + 1
+            self.ncols = int(width // cell_size) + 1
+
+        keys = self._rows(lats) * self.ncols + self._cols(lons)
+        order = np.argsort(keys, kind="stable")
+
+        self.ids = ids[order]
+        self.lats = lats[order]
+        self.lons = lons[order]
+        self.offsets = np.searchsorted(
+            keys[order], np.arange(self.nrows * self.ncols + 1)
+        )
+
+    @classmethod
+    def from_catalog(cls, df: pd.DataFrame) -> "SpatialIndex":
+        """Constroi o indice a partir dos eventos unicos de uma DataFrame
+
+        Args:
+            df (pd.DataFrame): DataFrame com eventos
+
+        Returns:
+            SpatialIndex: indice espacial
+        """
+        events = df.drop_duplicates(subset="ID", keep="first")
+        return cls(
+            events["ID"].to_numpy(),
+            events["Latitude"].to_numpy(dtype=float),
+            events["Longitude"].to_numpy(dtype=float),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _rows(self, lats):
+        return np.clip(((lats - self.lat0) // self.cell).astype(int), 0, self.nrows - 1)
+
+    def _cols(self, lons):
+        return np.clip(((lons - self.lon0) // self.cell).astype(int), 0, self.ncols - 1)
+
+    def _candidates(
+        self, lat_min: float, lat_max: float, lon_min: float, lon_max: float
+    ) -> np.ndarray:
+        """Posicoes dos eventos nas celulas que intersetam a caixa"""
+        if len(self) == 0 or lat_min > lat_max or lon_min > lon_max:
+            return np.empty(0, dtype=int)
+
+        r0, r1 = self._rows(np.array([lat_min, lat_max]))
+        c0, c1 = self._cols(np.array([lon_min, lon_max]))
+        rows = np.arange(r0, r1 + 1) * self.ncols
+        starts = self.offsets[rows + c0]
+        ends = self.offsets[rows + c1 + 1]
+
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=int)
+
+        # concatena as slices [start, end) de cada linha da grelha
+        shift = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.arange(total) + shift
+
+    def bbox(
+        self, lat_min: float, lat_max: float, lon_min: float, lon_max: float
+    ) -> np.ndarray:
+        """Eventos dentro de uma caixa de latitudes/longitudes (inclusive)
+
+        Args:
+            lat_min (float): latitude minima
+            lat_max (float): latitude maxima
+            lon_min (float): longitude minima
+            lon_max (float): longitude maxima
+
+        Returns:
+            np.ndarray: IDs dos eventos
+        """
+        pos = self._candidates(lat_min, lat_max, lon_min, lon_max)
+        lats, lons = self.lats[pos], self.lons[pos]
+        keep = (lats >= lat_min) & (lats <= lat_max)
+        keep &= (lons >= lon_min) & (lons <= lon_max)
+        return self.ids[pos[keep]]
+
+    def _radius_positions(
+        self, lat: float, lon: float, radius_km: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Posicoes e distancias dos eventos a menos de `radius_km` do ponto"""
+        dlat = radius_km / KM_PER_DEG
+        coslat = math.cos(math.radians(min(abs(lat) + dlat, 89.999)))
+        dlon = min(dlat / coslat, 180.0)
+
+        pos = self._candidates(lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+        dist = haversine(lat, lon, self.lats[pos], self.lons[pos])
+        keep = dist <= radius_km
+        return pos[keep], dist[keep]
+
+    def radius(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Eventos a uma distancia de circulo maximo de (lat, lon) inferior a `radius_km`
+
+        Args:
+            lat (float): latitude do centro
+            lon (float): longitude do centro
+            radius_km (float): raio em km
+
+        Returns:
+            np.ndarray: IDs dos eventos
+        """
+        pos, _ = self._radius_positions(lat, lon, radius_km)
+        return self.ids[pos]
+
+    def nearest(
+        self, lat: float, lon: float, k: int, allowed: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Os `k` eventos mais proximos de (lat, lon), do mais proximo para o mais longe
+
+        A pesquisa comeca num raio de uma celula e duplica-o ate encontrar `k` eventos.
+
+        Args:
+            lat (float): latitude do ponto
+            lon (float): longitude do ponto
+            k (int): numero de eventos
+            allowed (np.ndarray | None): IDs a considerar (default: todos)
+
+        Returns:
+            np.ndarray: IDs dos eventos
+        """
+        ok = None if allowed is None else np.isin(self.ids, allowed)
+        available = len(self) if ok is None else int(ok.sum())
+        k = min(k, available)
+        if k <= 0:
+            return np.empty(0, dtype=self.ids.dtype)
+
+        radius = self.cell * KM_PER_DEG
+        while True:
+            pos, dist = self._radius_positions(lat, lon, radius)
+            if ok is not None:
+                keep = ok[pos]
+                pos, dist = pos[keep], dist[keep]
+            if len(pos) >= k or radius > math.pi * EARTH_RADIUS_KM:
+                break
+            radius *= 2
+
+        best = np.argsort(dist, kind="stable")[:k]
+        return self.ids[pos[best]]
+
+    def polygon(self, polygon: Sequence[tuple[float, float]]) -> np.ndarray:
+        """Eventos dentro de um poligono
+
+        Args:
+            polygon (Sequence[tuple[float, float]]): vertices (lat, lon) do poligono
+
+        Returns:
+            np.ndarray: IDs dos eventos
+        """
+        vertices = np.asarray(polygon, dtype=float)
+        lat_min, lon_min = vertices.min(axis=0)
+        lat_max, lon_max = vertices.max(axis=0)
+
+        pos = self._candidates(lat_min, lat_max, lon_min, lon_max)
+        inside = points_in_polygon(self.lats[pos], self.lons[pos], polygon)
+        return self.ids[pos[inside]]
+
+
+def get_index(df: pd.DataFrame) -> SpatialIndex:
+    """Retorna o indice espacial do catalogo de `df`
+
+    Args:
+        df (pd.DataFrame): DataFrame com eventos
+
+    Returns:
+        SpatialIndex: indice espacial
+    """
+    return catalog.derived(df, "spatial", SpatialIndex.from_catalog)
+
+
+catalog.register_builder("spatial", SpatialIndex.from_catalog)
@@ -0,0 +1,445 @@
+# pyright: basic
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.parser import arrival_times
+from utils.stats import PERIODS, Groups, period_labels
+
+"""Estatisticas por estacao e por fase, sobre as linhas (leituras) do catalogo
+
+Cada linha do catalogo e uma leitura de uma estacao (ver docstring do `parser.py`).
+Todas as funcoes sao contagens vetorizadas (`bincount` sobre codigos inteiros) ou
+agrupamentos com uma so ordenacao, sem ciclos por estacao ou por mes, e servem para
+detetar estacoes paradas ou degradadas.
+
+A distancia epicentral de cada leitura esta na coluna `DIS` (o cabecalho das linhas
+tipo 4 e truncado pelo `read_fwf`). O tempo de percurso de cada leitura e a diferenca
+entre a hora absoluta de chegada (ver `parser.arrival_times`) e a hora de origem.
+
+"""
+
+DIST_COL = "DIS"
+AMPLITUDE_PHASE = "IAML"
+UNKNOWN_PHASE = "?"
+
+# classes de distancia (km) para a distribuicao amplitude-distancia
+DIST_BINS = (0, 10, 25, 50, 100, 200, 400, np.inf)
+
+# uma estacao e degradada se a participacao no ultimo periodo for inferior a esta
+# fracao da sua participacao mediana
+DEGRADED_RATIO = 0.5
+
+# fases e classes de distancia (km) das curvas tempo-distancia
+TT_PHASES = ("P", "S")
+TT_BINS = (0, 10, 20, 30, 50, 75, 100, 150, 200, 300, 400)
+
+# leituras com residuo superior a este numero de desvios (MAD normalizado) da fase
+OUTLIER_Z = 4.0
+MAD_SCALE = 1.4826
+
+STATIONS_HEADER = """=== Terramotos ===
+ == Estações ==
+"""
+
+STATIONS_MENU = """[1] Leituras por estação, por mês
+[2] Fases P e S por estação
+[3] Amplitude (IAML) por distância
+[4] Participação das estações nos eventos, por mês
+[5] Estado das estações (paradas / degradadas)
+[6] Curvas tempo-distância (P e S)
+[7] Leituras com tempo de percurso suspeito
+
+[Q] Voltar ao menu principal
+"""
+
+
+def phases(df: pd.DataFrame) -> pd.Series:
+    """Fase de cada leitura, sem o indicador de peso (ex: `S   4` -> `S`)
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+
+    Returns:
+        pd.Series: fase, `UNKNOWN_PHASE` se a leitura nao tiver fase
+    """
+    # normaliza apenas os valores distintos, e nao cada leitura
+    codes, uniques = pd.factorize(df["Tipo Onda"])
+    names = [str(u).split()[0] if str(u).strip() else UNKNOWN_PHASE for u in uniques]
+    names = np.array(names + [UNKNOWN_PHASE], dtype=object)
+    return pd.Series(names[codes], index=df.index, name="Fase")
+
+
+def _period_codes(
+    df: pd.DataFrame, period: str
+) -> tuple[np.ndarray, pd.DatetimeIndex]:
+    """Funcao privada que retorna o periodo de cada linha, como codigo 0..n-1, e a
+    etiqueta de cada periodo (todos os periodos entre o primeiro e o ultimo)
+    """
+    freq, atEnd = PERIODS[period]
+    codes = pd.PeriodIndex(df["Data"], freq=freq).asi8
+    if len(codes) == 0:
+        return codes, pd.DatetimeIndex([], name="Data")
+
+    first = codes.min()
+    periods = pd.period_range(
+        pd.Period(ordinal=first, freq=freq), periods=codes.max() - first + 1, freq=freq
+    )
+    return codes - first, period_labels(periods, atEnd)
+
+
+def _crosstab(
+    rows: np.ndarray, nrows: int, cols: np.ndarray, ncols: int
+) -> np.ndarray:
+    """Funcao privada que conta os pares (linha, coluna) com um so `bincount`"""
+    return np.bincount(rows * ncols + cols, minlength=nrows * ncols).reshape(
+        nrows, ncols
+    )
+
+
+def picks_per_station(df: pd.DataFrame, period: str = "ME") -> pd.DataFrame:
+    """Numero de leituras de cada estacao, por periodo
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        period (str): periodo, de entre `stats.PERIODS` (default: `ME`)
+
+    Returns:
+        pd.DataFrame: uma linha por periodo e uma coluna por estacao
+    """
+    pcodes, labels = _period_codes(df, period)
+    scodes, stations = pd.factorize(df["Estacao"], sort=True)
+    valid = scodes >= 0
+
+    counts = _crosstab(pcodes[valid], len(labels), scodes[valid], len(stations))
+    return pd.DataFrame(counts, index=labels, columns=pd.Index(stations, name="Estacao"))
+
+
+def phase_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """Numero de leituras de cada fase por estacao, e a razao entre leituras P e S
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+
+    Returns:
+        pd.DataFrame: uma linha por estacao, com uma coluna por fase, `Total`,
+            `Eventos` e `P/S` (NaN se a estacao nao tiver leituras S)
+    """
+    scodes, stations = pd.factorize(df["Estacao"], sort=True)
+    fcodes, names = pd.factorize(phases(df), sort=True)
+    valid = scodes >= 0
+
+    counts = _crosstab(scodes[valid], len(stations), fcodes[valid], len(names))
+    res = pd.DataFrame(counts, index=pd.Index(stations, name="Estacao"), columns=names)
+    res["Total"] = counts.sum(axis=1)
+
+    pairs = pd.DataFrame({"s": scodes, "id": df["ID"].to_numpy()})[valid]
+    res["Eventos"] = np.bincount(
+        pairs.drop_duplicates()["s"].to_numpy(), minlength=len(stations)
+    )
+
+    p, s = res.get("P", 0), res.get("S", 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        res["P/S"] = np.where(s > 0, p / s, np.nan)
+    return res
+
+
+def amplitude_distance(
+    df: pd.DataFrame, bins: tuple[float, ...] = DIST_BINS, by_station: bool = False
+) -> pd.DataFrame:
+    """Distribuicao da amplitude das leituras IAML por classe de distancia epicentral
+
+    As estatisticas sao calculadas sobre log10(amplitude), com uma so ordenacao
+    (ver `stats.Groups`).
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        bins (tuple[float, ...]): limites das classes de distancia, em km
+            (default: `DIST_BINS`)
+        by_station (bool): uma distribuicao por estacao e classe (default: False)
+
+    Returns:
+        pd.DataFrame: uma linha por classe (e estacao), com `Count`, `Median`, `Q1`,
+            `Q3`, `Min` e `Max` de log10(amplitude)
+    """
+    amp = df[(phases(df) == AMPLITUDE_PHASE) & (df["Amplitude"] > 0)]
+    dist = amp[DIST_COL].to_numpy(dtype=float)
+    bins_ = np.asarray(bins, dtype=float)
+    dcodes = np.searchsorted(bins_, dist, "right") - 1
+    valid = (dcodes >= 0) & (dcodes < len(bins_) - 1)
+
+    intervals = pd.IntervalIndex.from_breaks(bins_, closed="left", name="Distancia")
+    values = np.log10(amp["Amplitude"].to_numpy(dtype=float))[valid]
+    dcodes = dcodes[valid]
+
+    if by_station:
+        scodes, stations = pd.factorize(amp["Estacao"].to_numpy()[valid], sort=True)
+        codes = scodes * len(intervals) + dcodes
+        labels = pd.MultiIndex.from_product(
+            [pd.Index(stations, name="Estacao"), intervals]
+        )
+    else:
+        codes, labels = dcodes, intervals
+
+    g = Groups.from_codes(labels, codes, values)
+    res = pd.DataFrame(
+        {
+            "Count": g.counts,
+            "Median": g.quantile(0.5),
+            "Q1": g.quantile(0.25),
+            "Q3": g.quantile(0.75),
+            "Min": g.first(),
+            "Max": g.last(),
+        },
+        index=labels,
+    )
+    return res[res["Count"] > 0] if by_station else res
+
+
+def participation(df: pd.DataFrame, period: str = "ME") -> pd.DataFrame:
+    """Fracao dos eventos de cada periodo com pelo menos uma leitura de cada estacao
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        period (str): periodo, de entre `stats.PERIODS` (default: `ME`)
+
+    Returns:
+        pd.DataFrame: uma linha por periodo e uma coluna por estacao, entre 0 e 1
+            (NaN nos periodos sem eventos)
+    """
+    pcodes, labels = _period_codes(df, period)
+    scodes, stations = pd.factorize(df["Estacao"], sort=True)
+    ids = df["ID"].to_numpy()
+    valid = scodes >= 0
+
+    # pares (evento, estacao) unicos, e eventos unicos, por periodo
+    pairs = pd.DataFrame({"p": pcodes, "s": scodes, "id": ids})[valid].drop_duplicates()
+    withStation = _crosstab(
+        pairs["p"].to_numpy(), len(labels), pairs["s"].to_numpy(), len(stations)
+    )
+    events = pd.DataFrame({"p": pcodes, "id": ids}).drop_duplicates()
+    perPeriod = np.bincount(events["p"].to_numpy(), minlength=len(labels))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = withStation / perPeriod[:, None]
+    return pd.DataFrame(frac, index=labels, columns=pd.Index(stations, name="Estacao"))
+
+
+def station_status(
+    df: pd.DataFrame, period: str = "ME", ratio: float = DEGRADED_RATIO
+) -> pd.DataFrame:
+    """Compara a participacao de cada estacao no ultimo periodo com a sua mediana
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        period (str): periodo, de entre `stats.PERIODS` (default: `ME`)
+        ratio (float): fracao da mediana abaixo da qual a estacao e degradada
+            (default: `DEGRADED_RATIO`)
+
+    Returns:
+        pd.DataFrame: uma linha por estacao, com `Mediana`, `Ultimo`, `Ultima Leitura`
+            e `Estado` (`ok`, `degradada` ou `parada`)
+    """
+    part = participation(df, period).dropna(how="all")
+    last = df.groupby("Estacao")["Data"].max()
+    if part.empty:
+        return pd.DataFrame(columns=["Mediana", "Ultimo", "Ultima Leitura", "Estado"])
+
+    median = part.median()
+    latest = part.iloc[-1]
+    rank = np.select([latest == 0, latest < ratio * median], [0, 1], 2)
+    res = pd.DataFrame(
+        {
+            "Mediana": median,
+            "Ultimo": latest,
+            "Ultima Leitura": last.reindex(part.columns),
+            "Estado": np.array(["parada", "degradada", "ok"])[rank],
+        }
+    )
+    # paradas primeiro, depois degradadas; dentro de cada estado, as mais ativas
+    order = np.lexsort((-median.to_numpy(), rank))
+    return res.iloc[order]
+
+
+def travel_times(df: pd.DataFrame, phase_types: tuple[str, ...] = TT_PHASES) -> pd.DataFrame:
+    """Tempo de percurso de cada leitura das fases `phase_types`
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        phase_types (tuple[str, ...]): fases (default: `TT_PHASES`)
+
+    Returns:
+        pd.DataFrame: uma linha por leitura, com `ID`, `Estacao`, `Fase`, `Distancia`
+            (epicentral, km), `Chegada` e `Tempo` (s)
+    """
+    fase = phases(df)
+    keep = fase.isin(phase_types).to_numpy()
+    arrival = arrival_times(df)
+    seconds = (arrival - pd.to_datetime(df["Data"])).dt.total_seconds()
+
+    return pd.DataFrame(
+        {
+            "ID": df["ID"].to_numpy()[keep],
+            "Estacao": df["Estacao"].to_numpy()[keep],
+            "Fase": fase.to_numpy()[keep],
+            "Distancia": df[DIST_COL].to_numpy(dtype=float)[keep],
+            "Chegada": arrival.to_numpy()[keep],
+            "Tempo": seconds.to_numpy()[keep],
+        },
+        index=df.index[keep],
+    )
+
+
+def _tt_groups(
+    tt: pd.DataFrame, bins: tuple[float, ...], phase_types: tuple[str, ...]
+) -> tuple[np.ndarray, pd.MultiIndex]:
+    """Funcao privada com o grupo (fase, classe de distancia) de cada leitura
+
+    Returns:
+        tuple[np.ndarray, pd.MultiIndex]: codigo do grupo (-1 fora das classes) e
+            etiqueta de cada grupo
+    """
+    bins_ = np.asarray(bins, dtype=float)
+    dcodes = np.searchsorted(bins_, tt["Distancia"].to_numpy(), "right") - 1
+    fcodes = pd.Index(phase_types).get_indexer(tt["Fase"])
+    nbins = len(bins_) - 1
+    valid = (dcodes >= 0) & (dcodes < nbins) & (fcodes >= 0)
+
+    intervals = pd.IntervalIndex.from_breaks(bins_, closed="left", name="Distancia")
+    labels = pd.MultiIndex.from_product([pd.Index(phase_types, name="Fase"), intervals])
+    return np.where(valid, fcodes * nbins + dcodes, -1), labels
+
+
+def travel_time_curves(
+    df: pd.DataFrame,
+    bins: tuple[float, ...] = TT_BINS,
+    phase_types: tuple[str, ...] = TT_PHASES,
+) -> pd.DataFrame:
+    """Curvas tempo-distancia: tempo de percurso por fase e classe de distancia
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        bins (tuple[float, ...]): limites das classes de distancia, em km
+            (default: `TT_BINS`)
+        phase_types (tuple[str, ...]): fases (default: `TT_PHASES`)
+
+    Returns:
+        pd.DataFrame: uma linha por fase e classe, com `Count`, a mediana da distancia
+            (`Distancia`), e `Median`, `Q1`, `Q3`, `Min` e `Max` do tempo (s)
+    """
+    tt = travel_times(df, phase_types)
+    codes, labels = _tt_groups(tt, bins, phase_types)
+    valid = codes >= 0
+
+    g = Groups.from_codes(labels, codes[valid], tt["Tempo"].to_numpy()[valid])
+    dist = Groups.from_codes(labels, codes[valid], tt["Distancia"].to_numpy()[valid])
+    return pd.DataFrame(
+        {
+            "Count": g.counts,
+            "Distancia": dist.quantile(0.5),
+            "Median": g.quantile(0.5),
+            "Q1": g.quantile(0.25),
+            "Q3": g.quantile(0.75),
+            "Min": g.first(),
+            "Max": g.last(),
+        },
+        index=labels.set_names("Classe", level=1),
+    )
+
+
+def travel_time_residuals(
+    df: pd.DataFrame,
+    bins: tuple[float, ...] = TT_BINS,
+    phase_types: tuple[str, ...] = TT_PHASES,
+    z: float = OUTLIER_Z,
+) -> pd.DataFrame:
+    """Residuo de cada leitura em relacao a curva tempo-distancia da sua fase
+
+    A curva e a interpolacao linear das medianas (distancia, tempo) de cada classe. O
+    residuo e normalizado pelo desvio absoluto mediano dos residuos da fase.
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+        bins (tuple[float, ...]): limites das classes de distancia, em km
+            (default: `TT_BINS`)
+        phase_types (tuple[str, ...]): fases (default: `TT_PHASES`)
+        z (float): leituras com |Z| acima deste valor sao suspeitas
+            (default: `OUTLIER_Z`)
+
+    Returns:
+        pd.DataFrame: resultado de `travel_times`, com `Residuo` (s), `Z` e
+            `Suspeita`
+    """
+    tt = travel_times(df, phase_types)
+    curves = travel_time_curves(df, bins, phase_types)
+    fcodes = pd.Index(phase_types).get_indexer(tt["Fase"])
+    dist = tt["Distancia"].to_numpy()
+
+    expected = np.full(len(tt), np.nan)
+    for i, phase in enumerate(phase_types):
+        curve = curves.loc[phase].dropna(subset=["Median"])
+        mask = fcodes == i
+        if len(curve) and mask.any():
+            expected[mask] = np.interp(
+                dist[mask], curve["Distancia"].to_numpy(), curve["Median"].to_numpy()
+            )
+
+    res = tt["Tempo"].to_numpy() - expected
+    labels = pd.Index(phase_types)
+    g = Groups.from_codes(labels, fcodes, res)
+    center = g.quantile(0.5)
+    spread = Groups.from_codes(labels, fcodes, np.abs(res - center[fcodes]))
+    scale = MAD_SCALE * spread.quantile(0.5)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = (res - center[fcodes]) / scale[fcodes]
+    return tt.assign(Residuo=res, Z=score, Suspeita=np.abs(score) > z)
+
+
+def station_menu(df: pd.DataFrame):
+    """Menu de estatisticas das estacoes
+
+    Args:
+        df (pd.DataFrame): Dataframe com leituras
+    """
+    while True:
+        os.system("cls" if sys.platform == "windows" else "clear")
+        print(STATIONS_HEADER + "\n" + STATIONS_MENU)
+        usrIn = input("Opção: ").lower()
+
+        match usrIn:
+            case "1":
+                print(picks_per_station(df).T.to_string())
+
+            case "2":
+                print(phase_counts(df).to_string())
+
+            case "3":
+                byStation = input("Por estação? (s/n): ").strip().lower() == "s"
+                print("log10(Amplitude) por distância (km):")
+                print(amplitude_distance(df, by_station=byStation).to_string())
+
+            case "4":
+                print(participation(df).T.round(2).to_string())
+
+            case "5":
+                print(station_status(df).to_string())
+
+            case "6":
+                print("Tempo de percurso (s) por distância epicentral (km):")
+                print(travel_time_curves(df).round(2).to_string())
+
+            case "7":
+                res = travel_time_residuals(df)
+                print(f"Leituras suspeitas (|Z| > {OUTLIER_Z}):")
+                print(res[res["Suspeita"]].round(2).to_string())
+
+            case "q":
+                return
+            case _:
+                pass
+
+        input("\n[Enter] para continuar...")
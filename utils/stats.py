@@ -5,7 +5,8 @@ from typing import Any, Iterable
 import numpy as np
 import pandas as pd
 
-from utils.utils import extract_mag_depth
+from utils import cube, declustering, gutenberg, rates
+from utils.utils import MAG_COLUMN, event_magnitudes, extract_mag_depth
 
 STAT_HEADER = """=== Terramotos ===
  == Estatísticas ==
@@ -19,6 +20,8 @@ STAT_MENU = """[1] Média
 [6] Moda
 [7] Print de todas as estatísticas
 [T] Estatísticas Temporais (T5)
+[G] Lei de Gutenberg-Richter (Mc e b-value)
+[Z] Comparar Zonas (SZ, VZ, Região)
 
 [Q] Voltar ao menu principal
 """
@@ -56,9 +59,6 @@ def filter_submenu(type: str):
         return None
 
 
-# -- t5 funcs
-
-
 def _get_unique_events(df: pd.DataFrame) -> pd.DataFrame:
     """Função privada que retorna os eventos únicos
 
@@ -73,6 +73,510 @@ def _get_unique_events(df: pd.DataFrame) -> pd.DataFrame:
     return df.drop_duplicates(subset="ID", keep="first")
 
 
+# -- motor de agregacao
+
+STAT_LABELS = {
+    "count": "Count",
+    "mean": "Mean",
+    "std": "Std",
+    "median": "Median",
+    "q1": "Q1",
+    "q3": "Q3",
+    "min": "Min",
+    "max": "Max",
+    "var": "Variance",
+    "mode": "Mode",
+}
+QUANTILES = {"median": 0.5, "q1": 0.25, "q3": 0.75}
+# comprimento maximo dos bigodes das boxplots, em IQR (como no matplotlib)
+BOX_WHIS = 1.5
+MONTH_STATS = ("mean", "std", "median", "q1", "q3", "min", "max")
+# estatisticas T5 e T3 para a comparacao entre zonas (`var` com ddof=0, como `np.var`)
+ZONE_STATS = ("count", "mean", "std", "var", "median", "q1", "q3", "min", "max", "mode")
+ZONE_TYPES = ("SZ", "VZ", "Regiao")
+
+# frequencia do periodo, e se a etiqueta e o fim do periodo (como no `resample`)
+PERIODS = {
+    "h": ("h", False),
+    "D": ("D", False),
+    "W": ("W", True),
+    "M": ("M", True),
+    "ME": ("M", True),
+    "Y": ("Y", True),
+    "YE": ("Y", True),
+}
+
+
+def _event_values(events: pd.DataFrame, column: str | None) -> np.ndarray:
+    """Funcao privada que retorna os valores de uma coluna, um por evento
+
+    Args:
+        events (pd.DataFrame): Dataframe com uma linha por evento
+        column (str | None): coluna, `MAG_COLUMN` para a magnitude maxima do evento,
+            ou None para apenas contar eventos
+
+    Returns:
+        np.ndarray: valores
+    """
+    if column is None:
+        return np.zeros(len(events))
+    if column == MAG_COLUMN:
+        mags = event_magnitudes(events).groupby("ID")["Magnitude"].max()
+        return events["ID"].map(mags).to_numpy(dtype=float)
+    return events[column].to_numpy(dtype=float)
+
+
+def _group_order(codes: np.ndarray, values: np.ndarray, ngroups: int) -> np.ndarray:
+    """Funcao privada com a ordem por grupo e, dentro de cada grupo, por valor
+
+    Equivalente a `np.lexsort((values, codes))`, mas mais rapida: ordena os valores e
+    depois, de forma estavel, os codigos, em passagens radix de 16 bits.
+    """
+    if ngroups >= 1 << 32:
+        return np.lexsort((values, codes))
+
+    order = np.argsort(values)
+    c = codes[order]
+    if ngroups > 1 << 16:
+        low = np.argsort((c & 0xFFFF).astype(np.uint16), kind="stable")
+        order, c = order[low], c[low] >> 16
+    return order[np.argsort(c.astype(np.uint16), kind="stable")]
+
+
+class Groups:
+    """Valores agrupados (por periodo, por zona), ordenados dentro de cada grupo.
+
+    O grupo `i` corresponde a `values[offsets[i]:offsets[i + 1]]`, com etiqueta
+    `labels[i]`. Nos agrupamentos por periodo, todos os periodos entre o primeiro e
+    o ultimo existem, mesmo vazios.
+    """
+
+    def __init__(self, labels: pd.Index, offsets: np.ndarray, values: np.ndarray):
+        self.labels = labels
+        self.offsets = offsets
+        self.values = values
+        self.counts = np.diff(offsets)
+
+    @classmethod
+    def from_codes(
+        cls, labels: pd.Index, codes: np.ndarray, values: np.ndarray
+    ) -> "Groups":
+        """Agrupa `values` pelo grupo de cada valor, com uma so ordenacao
+
+        Args:
+            labels (pd.Index): etiqueta de cada grupo
+            codes (np.ndarray): grupo de cada valor, entre 0 e `len(labels) - 1`
+            values (np.ndarray): valores; os NaN sao ignorados
+
+        Returns:
+            Groups: valores agrupados
+        """
+        valid = ~np.isnan(values)
+        order = _group_order(codes[valid], values[valid], len(labels))
+        codes, values = codes[valid][order], values[valid][order]
+        offsets = np.searchsorted(codes, np.arange(len(labels) + 1))
+        return cls(labels, offsets, values)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def split(self) -> list[np.ndarray]:
+        """Lista com os valores de cada grupo"""
+        return np.split(self.values, self.offsets[1:-1])
+
+    def first(self) -> np.ndarray:
+        """Menor valor de cada grupo"""
+        out = np.full(len(self), np.nan)
+        has = self.counts > 0
+        out[has] = self.values[self.offsets[:-1][has]]
+        return out
+
+    def last(self) -> np.ndarray:
+        """Maior valor de cada grupo"""
+        out = np.full(len(self), np.nan)
+        has = self.counts > 0
+        out[has] = self.values[self.offsets[1:][has] - 1]
+        return out
+
+    def quantile(self, q: float) -> np.ndarray:
+        """Quantil `q` de cada grupo, por interpolacao linear (como no pandas)"""
+        out = np.full(len(self), np.nan)
+        has = self.counts > 0
+        pos = (self.counts[has] - 1) * q
+        lo = np.floor(pos).astype(int)
+        hi = np.minimum(lo + 1, self.counts[has] - 1)
+        frac = pos - lo
+        start = self.offsets[:-1][has]
+        vlo = self.values[start + lo]
+        out[has] = vlo + frac * (self.values[start + hi] - vlo)
+        return out
+
+    def mode(self) -> np.ndarray:
+        """Valor mais frequente de cada grupo (o menor, em caso de empate)"""
+        out = np.full(len(self), np.nan)
+        if len(self.values) == 0:
+            return out
+
+        group = np.repeat(np.arange(len(self)), self.counts)
+        newRun = np.r_[
+            True,
+            (self.values[1:] != self.values[:-1]) | (group[1:] != group[:-1]),
+        ]
+        starts = np.flatnonzero(newRun)
+        lengths = np.diff(np.r_[starts, len(self.values)])
+        runGroup = group[starts]
+
+        # por grupo: a sequencia mais longa, e a primeira (menor valor) em caso de empate
+        order = np.lexsort((starts, -lengths, runGroup))
+        best = order[np.r_[True, runGroup[order][1:] != runGroup[order][:-1]]]
+        out[runGroup[best]] = self.values[starts[best]]
+        return out
+
+    def whiskers(
+        self, whis: float = BOX_WHIS
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Bigodes de cada grupo, como no `boxplot` do matplotlib: o menor e o maior
+        valor a menos de `whis` * IQR dos quartis
+
+        Args:
+            whis (float): fator do IQR (default: `BOX_WHIS`)
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: bigode inferior e superior de
+                cada grupo, e mascara dos valores (em `values`) fora dos bigodes
+        """
+        q1, q3 = self.quantile(0.25), self.quantile(0.75)
+        group = np.repeat(np.arange(len(self)), self.counts)
+        low = (q1 - whis * (q3 - q1))[group]
+        high = (q3 + whis * (q3 - q1))[group]
+        inside = (self.values >= low) & (self.values <= high)
+
+        has = self.counts > 0
+        starts = self.offsets[:-1][has]
+        lo, hi = q1.copy(), q3.copy()
+        if has.any():
+            lo[has] = np.fmin.reduceat(np.where(inside, self.values, np.nan), starts)
+            hi[has] = np.fmax.reduceat(np.where(inside, self.values, np.nan), starts)
+        # sem valores entre o quartil e o limite, o bigode fica no quartil
+        lo = np.where(np.isnan(lo) | (lo > q1), q1, lo)
+        hi = np.where(np.isnan(hi) | (hi < q3), q3, hi)
+        return lo, hi, ~inside
+
+    def stats(self, statistics: Iterable[str]) -> dict[str, np.ndarray]:
+        """Calcula varias estatisticas de cada grupo numa so passagem
+
+        Os quantis saem todos da mesma ordenacao; minimo e maximo sao o primeiro e o
+        ultimo valor de cada grupo.
+
+        Args:
+            statistics (Iterable[str]): estatisticas, de entre `STAT_LABELS`
+
+        Raises:
+            ValueError: se uma estatistica for desconhecida
+
+        Returns:
+            dict[str, np.ndarray]: um array por estatistica, com um valor por grupo
+        """
+        counts = self.counts
+        has = counts > 0
+        starts = self.offsets[:-1][has]
+
+        sums = np.zeros(len(self))
+        if has.any():
+            sums[has] = np.add.reduceat(self.values, starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(has, sums / counts, np.nan)
+
+            dev = self.values - np.repeat(mean, counts)
+            m2 = np.zeros(len(self))
+            if has.any():
+                m2[has] = np.add.reduceat(dev * dev, starts)
+            std = np.where(counts > 1, np.sqrt(m2 / (counts - 1)), np.nan)
+            var = np.where(has, m2 / counts, np.nan)
+
+        results = {}
+        for stat in statistics:
+            match stat:
+                case "count":
+                    results[stat] = counts
+                case "mean":
+                    results[stat] = mean
+                case "std":
+                    results[stat] = std
+                case "var":
+                    results[stat] = var
+                case "min":
+                    results[stat] = self.first()
+                case "max":
+                    results[stat] = self.last()
+                case "mode":
+                    results[stat] = self.mode()
+                case _ if stat in QUANTILES:
+                    results[stat] = self.quantile(QUANTILES[stat])
+                case _:
+                    raise ValueError(f"Estatistica desconhecida: {stat}")
+        return results
+
+
+def group_by_period(df: pd.DataFrame, column: str | None, period: str) -> Groups:
+    """Agrupa os valores de uma coluna dos eventos por periodo, com uma so ordenacao
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        column (str | None): coluna a agrupar (ver `_event_values`)
+        period (str): periodo, de entre `PERIODS` (ex: `D`, `ME`)
+
+    Returns:
+        Groups: valores agrupados
+    """
+    freq, atEnd = PERIODS[period]
+    events = _get_unique_events(df)
+    values = _event_values(events, column)
+    dates = events["Data"].to_numpy()
+
+    codes = pd.PeriodIndex(dates, freq=freq).asi8
+    if len(codes) == 0:
+        return Groups(pd.DatetimeIndex([], name="Data"), np.zeros(1, dtype=int), values)
+    first, last = codes.min(), codes.max()
+
+    periods = pd.period_range(
+        pd.Period(ordinal=first, freq=freq), periods=last - first + 1, freq=freq
+    )
+    return Groups.from_codes(period_labels(periods, atEnd), codes - first, values)
+
+
+def period_labels(periods: pd.PeriodIndex, atEnd: bool) -> pd.DatetimeIndex:
+    """Etiquetas dos periodos: o fim do periodo, ou o inicio (como no `resample`)
+
+    Args:
+        periods (pd.PeriodIndex): periodos
+        atEnd (bool): usar o fim do periodo (ver `PERIODS`)
+
+    Returns:
+        pd.DatetimeIndex: etiquetas
+    """
+    if atEnd:
+        labels = periods.to_timestamp(how="end").normalize()
+    else:
+        labels = periods.to_timestamp()
+    return pd.DatetimeIndex(labels, name="Data")
+
+
+def aggregate(
+    df: pd.DataFrame,
+    column: str | None,
+    statistics: Iterable[str] = MONTH_STATS,
+    period: str = "ME",
+) -> pd.DataFrame:
+    """Calcula varias estatisticas de uma coluna dos eventos, por periodo, numa so
+    passagem sobre os grupos ordenados (ver `Groups.stats`).
+
+    Pedidos mensais sem quantis, sobre o catalogo completo ou filtrado apenas por
+    zonas/tipo de evento, sao respondidos pelo cubo mensal.
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        column (str | None): coluna (ex: `Profundidade`, `MAG_COLUMN`), ou None para
+            contar eventos
+        statistics (Iterable[str]): estatisticas, de entre `STAT_LABELS`
+            (default: `MONTH_STATS`)
+        period (str): periodo, de entre `PERIODS` (default: `ME`)
+
+    Returns:
+        pd.DataFrame: Dataframe com uma linha por periodo e uma coluna por estatistica
+    """
+    statistics = tuple(statistics)
+    if period in ("M", "ME") and set(statistics) <= cube.CUBE_STATS:
+        where = cube.where_from(df)
+        if where is not None:
+            return cube.get_cube(df).month_stats(column, statistics, where)
+
+    g = group_by_period(df, column, period)
+    results = g.stats(statistics)
+    return pd.DataFrame(
+        {STAT_LABELS[k]: v for k, v in results.items()}, index=g.labels
+    )
+
+
+# estatisticas que se obtem juntando as dos periodos mais finos
+ROLLUP_STATS = {"count", "mean", "std", "var", "min", "max"}
+LEVELS = ("h", "D", "W", "ME", "YE")
+
+# frequencias cujos periodos estao contidos, cada um, num so periodo de outra
+# (um dia esta num so mes; uma semana pode estar em dois)
+_NESTS = {"h": ("D", "W", "M", "Y"), "D": ("W", "M", "Y"), "M": ("Y",), "W": (), "Y": ()}
+_FINENESS = ("h", "D", "W", "M", "Y")
+
+
+class _Level:
+    """Estatisticas suficientes dos periodos com eventos de uma resolucao"""
+
+    def __init__(self, freq, codes, events, n, sums, m2, mins, maxs):
+        self.freq = freq
+        self.codes = codes
+        self.events = events
+        self.n = n
+        self.sums = sums
+        self.m2 = m2
+        self.mins = mins
+        self.maxs = maxs
+
+    @classmethod
+    def from_values(cls, freq: str, codes: np.ndarray, values: np.ndarray) -> "_Level":
+        """Agrega valores ja ordenados pelo codigo do periodo"""
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else codes
+        events = np.diff(np.r_[starts, len(codes)])
+        valid = ~np.isnan(values)
+
+        def _sum(x):
+            return np.add.reduceat(x, starts) if len(starts) else np.zeros(0)
+
+        n = _sum(valid.astype(np.int64))
+        sums = _sum(np.where(valid, values, 0.0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.repeat(sums / n, events)
+        m2 = _sum(np.where(valid, values - mean, 0.0) ** 2)
+        if len(starts):
+            mins = np.fmin.reduceat(values, starts)
+            maxs = np.fmax.reduceat(values, starts)
+        else:
+            mins = maxs = np.zeros(0)
+        return cls(freq, codes[starts], events, n, sums, m2, mins, maxs)
+
+    def rollup(self, freq: str) -> "_Level":
+        """Junta os periodos desta resolucao nos periodos de `freq`, que os contem"""
+        fine = pd.PeriodIndex.from_ordinals(self.codes, freq=self.freq)
+        codes = fine.asfreq(freq, how="start").asi8
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else codes
+        if len(starts) == 0:
+            return _Level(freq, codes, *[np.zeros(0)] * 6)
+        sizes = np.diff(np.r_[starts, len(codes)])
+
+        n = np.add.reduceat(self.n, starts)
+        sums = np.add.reduceat(self.sums, starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # M2 = soma dos M2 + n_i * (media_i - media)^2 (Chan et al.)
+            spread = self.n * (self.sums / self.n - np.repeat(sums / n, sizes)) ** 2
+        m2 = np.add.reduceat(self.m2 + np.nan_to_num(spread), starts)
+        return _Level(
+            freq,
+            codes[starts],
+            np.add.reduceat(self.events, starts),
+            n,
+            sums,
+            m2,
+            np.fmin.reduceat(self.mins, starts),
+            np.fmax.reduceat(self.maxs, starts),
+        )
+
+    def stats(self, statistics: tuple[str, ...]) -> dict[str, np.ndarray]:
+        n = self.n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = {
+                "count": n,
+                "mean": np.where(n > 0, self.sums / n, np.nan),
+                "std": np.where(n > 1, np.sqrt(self.m2 / (n - 1)), np.nan),
+                "var": np.where(n > 0, self.m2 / n, np.nan),
+                "min": self.mins,
+                "max": self.maxs,
+            }
+        return {k: values[k] for k in statistics}
+
+
+def aggregate_levels(
+    df: pd.DataFrame,
+    column: str | None,
+    statistics: Iterable[str] = ("count", "mean", "std", "min", "max"),
+    periods: Iterable[str] = LEVELS,
+    fill: bool = True,
+) -> dict[str, pd.DataFrame]:
+    """Estatisticas de uma coluna dos eventos em varias resolucoes de uma vez
+
+    Os eventos sao ordenados uma vez, pela resolucao mais fina pedida. Cada resolucao
+    mais grossa e obtida juntando as estatisticas suficientes (n, soma, M2, min, max)
+    da resolucao mais grossa ja calculada que a contem (ex: anos a partir de meses,
+    semanas a partir de dias). Quantis e moda nao se podem juntar, e sao calculados
+    com uma ordenacao por resolucao (ver `group_by_period`).
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        column (str | None): coluna (ver `_event_values`), ou None para contar eventos
+        statistics (Iterable[str]): estatisticas, de entre `STAT_LABELS`
+            (default: contagem, media, desvio padrao, minimo e maximo)
+        periods (Iterable[str]): periodos, de entre `PERIODS` (default: `LEVELS`)
+        fill (bool): inclui os periodos sem eventos, entre o primeiro e o ultimo, com
+            contagem 0 (default: True, como `aggregate`)
+
+    Returns:
+        dict[str, pd.DataFrame]: para cada periodo, uma Dataframe como a de `aggregate`
+    """
+    statistics = tuple(statistics)
+    periods = tuple(periods)
+    events = _get_unique_events(df)
+    values = _event_values(events, column)
+    dates = events["Data"].to_numpy()
+
+    rolled = tuple(s for s in statistics if s in ROLLUP_STATS)
+    freqs = sorted({PERIODS[p][0] for p in periods}, key=_FINENESS.index)
+
+    levels: dict[str, _Level] = {}
+    for freq in freqs:
+        parents = [f for f in levels if freq in _NESTS[f]]
+        if parents:
+            levels[freq] = levels[parents[-1]].rollup(freq)
+        else:
+            codes = pd.PeriodIndex(dates, freq=freq).asi8
+            order = np.argsort(codes, kind="stable")
+            levels[freq] = _Level.from_values(freq, codes[order], values[order])
+
+    results = {}
+    for period in periods:
+        freq, atEnd = PERIODS[period]
+        level = levels[freq]
+        columns = level.stats(rolled)
+
+        if fill and len(level.codes):
+            ordinals = np.arange(level.codes[0], level.codes[-1] + 1)
+            pos = level.codes - level.codes[0]
+            for k, v in columns.items():
+                full = np.zeros(len(ordinals), v.dtype) if k == "count" else np.full(len(ordinals), np.nan)
+                full[pos] = v
+                columns[k] = full
+        else:
+            ordinals = level.codes
+
+        labels = period_labels(pd.PeriodIndex.from_ordinals(ordinals, freq=freq), atEnd)
+        res = pd.DataFrame({STAT_LABELS[k]: v for k, v in columns.items()}, index=labels)
+
+        others = tuple(s for s in statistics if s not in ROLLUP_STATS)
+        if others:
+            g = group_by_period(df, column, period)
+            extra = pd.DataFrame(
+                {STAT_LABELS[k]: v for k, v in g.stats(others).items()}, index=g.labels
+            )
+            res = res.join(extra)
+        results[period] = res[[STAT_LABELS[s] for s in statistics]]
+    return results
+
+
+def mag_type_submenu(choice: str) -> str | None:
+    """Pergunta o tipo de magnitude a usar, se `choice` for `Magnitudes`
+
+    Args:
+        choice (str): valor escolhido em `filter_submenu`
+
+    Returns:
+        str | None: tipo de magnitude, ou None para todos os tipos
+    """
+    if choice != "Magnitudes":
+        return None
+    usrIn = input("Tipo de magnitude (ex: L, C, W; Enter para todos): ").strip()
+    return usrIn.upper() or None
+
+
+# -- t5 funcs
+
+
 def events_per_period(df: pd.DataFrame, period: str) -> tuple[Iterable, Iterable]:
     """Retorna os eventos por período, seja por dia, seja por mês
 
@@ -83,13 +587,7 @@ def events_per_period(df: pd.DataFrame, period: str) -> tuple[Iterable, Iterable
     Returns:
         tuple[Iterable, Iterable]: tuple com iteradores dos indices e valores
     """
-    # Calcula o número de eventos por dia ('D') ou mês ('M')
-    events = _get_unique_events(df)
-
-    if period == "M":
-        period = "ME"
-
-    res = events.set_index("Data").resample(period).size()
+    res = aggregate(df, None, ("count",), period)["Count"]
     return (res.index, res.values)
 
 
@@ -100,67 +598,92 @@ def stats_depth_month(df: pd.DataFrame) -> pd.DataFrame:
         df (pd.DataFrame): DataFrame com eventos
 
     Returns:
-        [type]: Dataframe com as estatisticas de profundidade, por mes
+        pd.DataFrame: Dataframe com as estatisticas de profundidade, por mes
     """
-    events = _get_unique_events(df)
-
-    grouped = events.set_index("Data").resample("ME")["Profundidade"]
-
-    stats_df = pd.DataFrame(
-        {
-            "Mean": grouped.mean(),
-            "Std": grouped.std(),
-            "Median": grouped.median(),
-            "Q1": grouped.quantile(0.25),
-            "Q3": grouped.quantile(0.75),
-            "Min": grouped.min(),
-            "Max": grouped.max(),
-        }
-    )
-    return stats_df
+    return aggregate(df, "Profundidade", MONTH_STATS, "ME")
 
 
-def stats_mag_month(df: pd.DataFrame):
+def stats_mag_month(df: pd.DataFrame) -> pd.DataFrame:
     """Estatisticas de magnitude dos sismos, por mes
 
+    Usa a maior magnitude de cada evento.
+
     Args:
         df (pd.DataFrame): DataFrame com eventos
 
     Returns:
-        [type]: Dataframe com as estatisticas de magnitude, por mes
+        pd.DataFrame: Dataframe com as estatisticas de magnitude, por mes
     """
-    # Calcula estatísticas de Magnitude por Mês
-    events = _get_unique_events(df)
+    return aggregate(df, MAG_COLUMN, MONTH_STATS, "ME")
 
-    def _get_max_mag(mags: pd.Series):
-        """Funcao aplicadora à df, para encontrar a maior magnitude
 
-        Args:
-            mags (pd.Series): Serie com as magnitudes
+# -- comparacao entre zonas
 
-        Returns:
-            pd.Series: Serie com a magnitude maxima
-        """
-        vals = [float(m["Magnitude"]) for m in mags if "Magnitude" in m]
-        return max(vals) if vals else np.nan
-
-    events = events.copy()
-    events["MaxMag"] = events["Magnitudes"].apply(_get_max_mag)
-
-    grouped = events.set_index("Data").resample("ME")["MaxMag"]
-
-    stats_df = pd.DataFrame(
-        {
-            "Mean": grouped.mean(),
-            "Std": grouped.std(),
-            "Median": grouped.median(),
-            "Q1": grouped.quantile(0.25),
-            "Q3": grouped.quantile(0.75),
-            "Min": grouped.min(),
-            "Max": grouped.max(),
-        }
-    )
-    return stats_df
+
+def compare_zones(
+    df: pd.DataFrame,
+    zone: str = "SZ",
+    columns: Iterable[str] = ("Profundidade", MAG_COLUMN),
+    statistics: Iterable[str] = ZONE_STATS,
+    period: str | None = None,
+) -> pd.DataFrame:
+    """Estatisticas de todas as zonas de uma vez, numa tabela longa (tidy)
+
+    Os eventos sao agrupados pela zona (e, opcionalmente, pelo periodo) com uma so
+    ordenacao por coluna, em vez de filtrar o catalogo uma vez por zona. Eventos sem
+    zona sao ignorados.
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        zone (str): coluna da zona, de entre `ZONE_TYPES` (default: `SZ`)
+        columns (Iterable[str]): colunas a resumir (default: profundidade e magnitude
+            maxima do evento)
+        statistics (Iterable[str]): estatisticas, de entre `STAT_LABELS`
+            (default: `ZONE_STATS`)
+        period (str | None): periodo, de entre `PERIODS`, para estatisticas por zona e
+            por periodo (default: None, uma linha por zona)
+
+    Returns:
+        pd.DataFrame: uma linha por zona (e periodo) e coluna, com `Zona`, `Data` (se
+            `period` for dado), `Variavel` e uma coluna por estatistica
+    """
+    statistics = tuple(statistics)
+    events = _get_unique_events(df)
+    events = events[events[zone].notna()]
+    zoneCodes, zones = pd.factorize(events[zone], sort=True)
+
+    if period is None:
+        codes, labels = zoneCodes, pd.Index(zones, name="Zona")
+    elif len(events) == 0:
+        codes = zoneCodes
+        labels = pd.MultiIndex.from_arrays([[], []], names=["Zona", "Data"])
+    else:
+        freq, atEnd = PERIODS[period]
+        periodCodes = pd.PeriodIndex(events["Data"], freq=freq).asi8
+        first = periodCodes.min()
+        span = periodCodes.max() - first + 1
+
+        # so os pares (zona, periodo) com eventos
+        pairs, codes = np.unique(
+            zoneCodes.astype(np.int64) * span + (periodCodes - first), return_inverse=True
+        )
+        periods = pd.PeriodIndex.from_ordinals(pairs % span + first, freq=freq)
+        labels = pd.MultiIndex.from_arrays(
+            [zones[pairs // span], period_labels(periods, atEnd)], names=["Zona", "Data"]
+        )
+
+    frames = []
+    for col in columns:
+        g = Groups.from_codes(labels, codes, _event_values(events, col))
+        res = pd.DataFrame(
+            {STAT_LABELS[k]: v for k, v in g.stats(statistics).items()}, index=labels
+        )
+        res.insert(0, "Variavel", col)
+        frames.append(res)
+
+    out = pd.concat(frames).reset_index()
+    keys = ["Zona", "Data", "Variavel"] if period is not None else ["Zona", "Variavel"]
+    return out.sort_values(keys, kind="stable", ignore_index=True)
 
 
 # -- t5 menu
@@ -169,6 +692,9 @@ T5_MENU = """[1] Número de eventos por dia
 [2] Número de eventos por mês
 [3] Estatísticas Profundidade por mês
 [4] Estatísticas Magnitude por mês
+[5] Taxa de eventos em janela deslizante (anomalias)
+[6] Contagens e estatísticas por hora, dia, semana, mês e ano
+[7] Eventos por cluster (declustering)
 
 [Q] Voltar
 """
@@ -214,6 +740,35 @@ def t5_menu(df: pd.DataFrame):
                 print("\nEstatísticas Magnitude por Mês:")
                 print(st.to_string())
 
+            case "5":
+                window = input("Janela (ex: 1h, 6h, 24h) [24h]: ").strip() or "24h"
+                step = input(f"Passo [{rates.DEFAULT_STEP}]: ").strip() or rates.DEFAULT_STEP
+                res = rates.sliding_rates(df, window, step)
+                print(f"\nMáximo de eventos numa janela de {window}: {res['Count'].max()}")
+                print("\nEpisódios acima da taxa de referência:")
+                print(rates.anomalies(res).to_string(index=False))
+                print("\nJanelas a terminar no último evento:")
+                print(rates.latest_rates(df).to_string())
+
+            case "6":
+                col = input("Coluna (Profundidade/Magnitude) [Profundidade]: ").strip()
+                col = MAG_COLUMN if col.lower().startswith("m") else "Profundidade"
+                fill = input("Incluir períodos sem eventos? (s/n): ").strip().lower() == "s"
+                names = {"h": "Hora", "D": "Dia", "W": "Semana", "ME": "Mês", "YE": "Ano"}
+                for period, res in aggregate_levels(df, col, fill=fill).items():
+                    print(f"\n{col} por {names[period]}:")
+                    print(res.to_string())
+
+            case "7":
+                method = input("Método (gk/reasenberg) [gk]: ").strip().lower() or "gk"
+                if method not in declustering.METHODS:
+                    print("Método inválido!")
+                else:
+                    res = declustering.cluster_stats(df, method)
+                    total = df["ID"].nunique()
+                    print(f"\nClusters: {len(res)}, com {int(res['N'].sum())} de {total} eventos")
+                    print(res.round(2).to_string())
+
             case "q":
                 return
             case _:
@@ -243,11 +798,27 @@ def stat_menu(df: pd.DataFrame):
                 t5_menu(df)
                 continue
 
+            case "g":
+                gr_summary(df)
+
+            case "z":
+                zone = {"vz": "VZ", "r": "Regiao"}.get(
+                    input("Zonas [SZ], [VZ] ou [R]egião: ").strip().lower(), "SZ"
+                )
+                period = input("Por mês? (s/n): ").strip().lower() == "s"
+                table = compare_zones(df, zone, period="ME" if period else None)
+                print(table.to_string(index=False))
+
+                fname = input("Guardar em CSV (nome do ficheiro, Enter para não): ")
+                if fname.strip():
+                    table.to_csv(fname.strip(), index=False)
+                    print(f"Tabela guardada em {fname.strip()}")
+
             case "1":
                 c = filter_submenu("Média")
 
                 if c is not None:
-                    retValue = average(df, c)
+                    retValue = average(df, c, mag_type_submenu(c))
                     if retValue:
                         print(f"A média de {c} é {retValue}")
                     else:
@@ -259,7 +830,7 @@ def stat_menu(df: pd.DataFrame):
                 c = filter_submenu("Variância")
 
                 if c is not None:
-                    retValue = variance(df, c)
+                    retValue = variance(df, c, mag_type_submenu(c))
                     if retValue:
                         print(f"A variância dos dados de {c} é {retValue}")
                     else:
@@ -271,7 +842,7 @@ def stat_menu(df: pd.DataFrame):
                 c = filter_submenu("Desvio Padrão")
 
                 if c is not None:
-                    retValue = std_dev(df, c)
+                    retValue = std_dev(df, c, mag_type_submenu(c))
                     if retValue:
                         print(f"O desvio padrão de {c} é {retValue}")
                     else:
@@ -283,7 +854,7 @@ def stat_menu(df: pd.DataFrame):
                 c = filter_submenu("Máximo")
 
                 if c is not None:
-                    retValue = max_v(df, c)
+                    retValue = max_v(df, c, mag_type_submenu(c))
                     print(f"O valor máximo em {c} é {retValue}")
                 else:
                     continue
@@ -292,7 +863,7 @@ def stat_menu(df: pd.DataFrame):
                 c = filter_submenu("Mínimo")
 
                 if c is not None:
-                    retValue = min_v(df, c)
+                    retValue = min_v(df, c, mag_type_submenu(c))
                     print(f"O valor mínimo em {c} é {retValue}")
                 else:
                     continue
@@ -301,7 +872,7 @@ def stat_menu(df: pd.DataFrame):
                 c = filter_submenu("Moda")
 
                 if c is not None:
-                    retValue = moda(df, c)
+                    retValue = moda(df, c, mag_type_submenu(c))
                     print(f"O valor moda em {c} é {retValue}")
                 else:
                     continue
@@ -323,6 +894,36 @@ def stat_menu(df: pd.DataFrame):
         input("Clica `Enter` para continuar")
 
 
+def gr_summary(df: pd.DataFrame):
+    """Mostra o Mc e o b-value do catalogo, por mes e por zona sismica (SZ)
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+    """
+    method = input("Método do Mc (maxc, gof) [maxc]: ").strip().lower() or "maxc"
+    if method not in gutenberg.MC_METHODS:
+        print(f"Método desconhecido: {method}")
+        return
+
+    mags = gutenberg.magnitudes(df).to_numpy()
+    res = gutenberg.b_value(mags, method)
+    boot = gutenberg.bootstrap(mags, method=method)["b"].dropna()
+
+    print("\nDistribuição frequência-magnitude (ML):")
+    print(gutenberg.fmd(mags).to_string())
+    print(
+        f"\nMc = {res['Mc']}\tb = {round(res['b'], 3)} ± {round(res['b_std'], 3)}"
+        f"\ta = {round(res['a'], 3)}\t(N = {res['N']})"
+    )
+    if len(boot):
+        low, high = np.percentile(boot, gutenberg.BOOT_CI)
+        print(f"Intervalo de confiança bootstrap do b-value: [{low:.3f}, {high:.3f}]")
+
+    for by in ("month", "SZ"):
+        print(f"\nPor {'mês' if by == 'month' else by}:")
+        print(gutenberg.gr_table(df, by, method=method).to_string())
+
+
 type tuples = tuple[list[tuple[str, Any]], list[tuple[str, Any]]]
 
 
@@ -339,8 +940,8 @@ def _mag_depth(df: pd.DataFrame) -> tuples:
     """
     data = extract_mag_depth(df)
 
-    mag_array = data.Magnitudes.values
-    depth_array = data.Profundidade.values
+    mag_array = data.Magnitudes.dropna().values
+    depth_array = data.Profundidade.dropna().values
 
     mags = []
     dep = []
@@ -354,42 +955,43 @@ def _mag_depth(df: pd.DataFrame) -> tuples:
     return (mags, dep)
 
 
-def average(df: pd.DataFrame, filter_by) -> np.float64 | None:
+def average(
+    df: pd.DataFrame, filter_by: str, mag_type: str | None = None
+) -> np.float64 | None:
     """Calculo da média para o tipo especifico
 
     Args:
         df (pd.DataFrame): Dataframe com valores
         filter_by (str): Valor para calculo da media
+        mag_type (str | None): Tipo de magnitude, se `filter_by` for `Magnitudes`
+            (default: todos os tipos)
 
     Returns:
         np.float64 | None: média
     """
-    events = _get_unique_events(df)
-    values = events[filter_by].to_numpy()
+    values = _values(df, filter_by, mag_type)
 
-    if filter_by == "Magnitudes":
-        values = _unpack_mags(values)
     try:
         return np.average(values)
     except Exception:
         return None
 
 
-def variance(df: pd.DataFrame, filter_by: str) -> np.float64 | None:
+def variance(
+    df: pd.DataFrame, filter_by: str, mag_type: str | None = None
+) -> np.float64 | None:
     """calcula a variancia para o tipo especificado
 
     Args:
         df (pd.DataFrame): Dataframe com valores
         filter_by (str): Valor para calculo da variancia
+        mag_type (str | None): Tipo de magnitude, se `filter_by` for `Magnitudes`
+            (default: todos os tipos)
 
     Returns:
         np.float64 | None: variancia
     """
-    events = _get_unique_events(df)
-    values = events[filter_by].to_numpy()
-
-    if filter_by == "Magnitudes":
-        values = _unpack_mags(values)
+    values = _values(df, filter_by, mag_type)
 
     try:
         return np.var(values)
@@ -397,21 +999,21 @@ def variance(df: pd.DataFrame, filter_by: str) -> np.float64 | None:
         return None
 
 
-def std_dev(df: pd.DataFrame, filter_by: str) -> np.float64 | None:
+def std_dev(
+    df: pd.DataFrame, filter_by: str, mag_type: str | None = None
+) -> np.float64 | None:
     """calcula o desvio-padrao para o tipo especificado
 
     Args:
         df (pd.DataFrame): Dataframe com valores
         filter_by (str): Valor para calculo do desvio-padrao
+        mag_type (str | None): Tipo de magnitude, se `filter_by` for `Magnitudes`
+            (default: todos os tipos)
 
     Returns:
         np.float64 | None: desvio-padrao
     """
-    events = _get_unique_events(df)
-    values = events[filter_by].to_numpy()
-
-    if filter_by == "Magnitudes":
-        values = _unpack_mags(values)
+    values = _values(df, filter_by, mag_type)
 
     try:
         return np.std(values)
@@ -419,60 +1021,60 @@ def std_dev(df: pd.DataFrame, filter_by: str) -> np.float64 | None:
         return None
 
 
-def max_v(df: pd.DataFrame, filter_by: str) -> np.floating:
+def max_v(
+    df: pd.DataFrame, filter_by: str, mag_type: str | None = None
+) -> np.floating:
     """Retorna o valor maximo num array
 
     Args:
         df (pd.DataFrame): Dataframe com valores
         filter_by (str): Coluna para o valor maximo
+        mag_type (str | None): Tipo de magnitude, se `filter_by` for `Magnitudes`
+            (default: todos os tipos)
 
     Returns:
         np.floating: valor maximo
     """
-    events = _get_unique_events(df)
-    values = events[filter_by].to_numpy()
-
-    if filter_by == "Magnitudes":
-        values = _unpack_mags(values)
+    values = _values(df, filter_by, mag_type)
 
     return np.max(values)
 
 
-def min_v(df, filter_by) -> np.floating:
+def min_v(
+    df: pd.DataFrame, filter_by: str, mag_type: str | None = None
+) -> np.floating:
     """Retorna o valor minimo num array
 
     Args:
         df (pd.DataFrame): Dataframe com valores
         filter_by (str): Coluna para o valor minimo
+        mag_type (str | None): Tipo de magnitude, se `filter_by` for `Magnitudes`
+            (default: todos os tipos)
 
     Returns:
         np.floating: valor minimo
     """
-    events = _get_unique_events(df)
-    values = events[filter_by].to_numpy()
-
-    if filter_by == "Magnitudes":
-        values = _unpack_mags(values)
+    values = _values(df, filter_by, mag_type)
 
     return np.min(values)
 
 
-def moda(df, filter_by) -> np.floating:
+def moda(
+    df: pd.DataFrame, filter_by: str, mag_type: str | None = None
+) -> np.floating:
     """Calcula a moda para um array de valores
 
 
     Args:
         df (pd.DataFrame): Dataframe com valores
         filter_by (str): Coluna para o calculo da moda
+        mag_type (str | None): Tipo de magnitude, se `filter_by` for `Magnitudes`
+            (default: todos os tipos)
 
     Returns:
         np.floating: moda
     """
-    events = _get_unique_events(df)
-    values = events[filter_by].to_numpy()
-
-    if filter_by == "Magnitudes":
-        values = _unpack_mags(values)
+    values = _values(df, filter_by, mag_type)
 
     uniques, count = np.unique(values, return_counts=True)
     uniques_list = list(zip(uniques, count))
@@ -480,18 +1082,33 @@ def moda(df, filter_by) -> np.floating:
     return sorted(uniques_list, reverse=True, key=lambda x: x[1])[0][0]
 
 
-def _unpack_mags(arr: np.ndarray) -> np.ndarray:
+def _values(df: pd.DataFrame, filter_by: str, mag_type: str | None = None) -> np.ndarray:
+    """Funcao privada que retorna os valores de uma coluna, um por evento, ou todas
+    as magnitudes dos eventos
+
+    Args:
+        df (pd.DataFrame): Dataframe com valores
+        filter_by (str): Coluna
+        mag_type (str | None): Tipo de magnitude (default: todos os tipos)
+
+    Returns:
+        np.ndarray: valores
+    """
+    if filter_by == "Magnitudes":
+        return _unpack_mags(df, mag_type)
+    return _get_unique_events(df)[filter_by].to_numpy()
+
+
+def _unpack_mags(df: pd.DataFrame, mag_type: str | None = None) -> np.ndarray:
     """Funcao privada para facilitar o calculo das magnitudes
 
+    Usa a tabela plana de magnitudes do catalogo, construida uma vez por versao.
 
     Args:
-        arr (np.ndarray): Lista dos tipos de magnitudes
+        df (pd.DataFrame): Dataframe com valores
+        mag_type (str | None): Tipo de magnitude (default: todos os tipos)
 
     Returns:
         np.ndarray: magnitudes
     """
-    newVals = np.empty(0)
-    for v in arr:
-        for m in v:
-            newVals = np.append(newVals, float(m["Magnitude"]))
-    return newVals
+    return event_magnitudes(df, mag_type)["Magnitude"].to_numpy()
@@ -2,17 +2,22 @@
 # pyright: basic
 
 import json
-from datetime import time
-from math import modf
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
+from utils import catalog, parser
+
+# coluna virtual com a maior magnitude de cada evento, de qualquer tipo
+MAG_COLUMN = "Magnitude"
+
 
 def extract_mag_depth(df: pd.DataFrame) -> pd.DataFrame:
     """Extrai as magnitudes e profundidades.
 
-    Nas magnitudes, apenas deixa o tipo L
+    Nas magnitudes, apenas deixa o tipo L (a primeira de cada evento, NaN se o
+    evento nao tiver magnitude L)
 
     Args:
         df (pd.DataFrame): Dataframe com eventos
@@ -21,18 +26,71 @@ def extract_mag_depth(df: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: Dataframe com apenas magnitudes e profundidades
     """
     _df = df.drop_duplicates(subset="ID", keep="first")[
-        ["Magnitudes", "Profundidade"]
+        ["ID", "Profundidade"]
     ].reset_index(drop=True)
-    mags = []
 
-    for _, value in _df.iterrows():
-        for mag in value.Magnitudes:
-            if mag["Tipo"] == "L":
-                mags.append(float(mag["Magnitude"]))
-                break
-    _df = _df.drop(columns=["Magnitudes"])
-    aux = pd.DataFrame.from_dict({"Magnitudes": mags})
-    return pd.concat([aux, _df], axis=1)
+    mags = event_magnitudes(df, "L").drop_duplicates(subset="ID", keep="first")
+    aux = _df["ID"].map(mags.set_index("ID")["Magnitude"])
+    return pd.DataFrame({"Magnitudes": aux, "Profundidade": _df["Profundidade"]})
+
+
+def _magnitude_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Funcao privada que constroi a tabela plana de magnitudes de um catalogo.
+
+    Os arrays sao pre-alocados com o numero total de magnitudes, e as magnitudes
+    sao lidas apenas uma vez por evento (e nao por cada linha de estacao).
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+
+    Returns:
+        pd.DataFrame: Dataframe com as colunas `ID`, `Tipo` e `Magnitude`
+    """
+    events = df.drop_duplicates(subset="ID", keep="first")
+    # linhas criadas pelo CRUD podem nao ter lista de magnitudes
+    magnitudes = events["Magnitudes"].map(lambda m: m if isinstance(m, list) else [])
+    counts = magnitudes.map(len).to_numpy(dtype=int)
+    total = int(counts.sum())
+
+    return pd.DataFrame(
+        {
+            "ID": np.repeat(events["ID"].to_numpy(), counts),
+            "Tipo": np.fromiter(
+                (m["Tipo"] for mags in magnitudes for m in mags),
+                dtype=object,
+                count=total,
+            ),
+            "Magnitude": np.fromiter(
+                (float(m["Magnitude"]) for mags in magnitudes for m in mags),
+                dtype=float,
+                count=total,
+            ),
+        }
+    )
+
+
+def event_magnitudes(df: pd.DataFrame, mag_type: str | None = None) -> pd.DataFrame:
+    """Tabela plana com todas as magnitudes dos eventos, uma linha por magnitude.
+
+    A tabela e construida uma vez por versao do catalogo e reutilizada por todos os
+    subconjuntos (filtrados) desse catalogo.
+
+    Args:
+        df (pd.DataFrame): Dataframe com eventos
+        mag_type (str | None): Tipo de magnitude a incluir (default: todos os tipos)
+
+    Returns:
+        pd.DataFrame: Dataframe com as colunas `ID`, `Tipo` e `Magnitude`
+    """
+    table = catalog.derived(df, "magnitudes", _magnitude_table)
+
+    # a tabela nao tem linhas para eventos sem magnitudes: comparar o numero de IDs
+    # nao chega para saber se `df` e o catalogo completo
+    if df is not catalog.root(df):
+        table = table[np.isin(table["ID"].to_numpy(), df["ID"].unique())]
+    if mag_type is not None:
+        table = table[table["Tipo"].to_numpy() == mag_type]
+    return table
 
 
 def save_as_json(df: pd.DataFrame, fname: str, event_cols: list[str]) -> bool:
@@ -66,12 +124,9 @@ def _create_dict_struct(df: pd.DataFrame, event_cols) -> dict[str, Any]:
     Returns:
         dict[str, Any]: [description]
     """
-    uniqueIds = df["ID"].unique()
-
     allEvents = {}
 
-    for id in uniqueIds:
-        filteredDf = df.loc[df["ID"] == id]
+    for id, filteredDf in df.groupby("ID", sort=False):
         first_row = filteredDf.head(1)
         allEvents[int(id)] = _create_event_info(first_row, event_cols)
         allEvents[int(id)].update(create_stations_info_1(filteredDf))
@@ -109,35 +164,33 @@ def _create_event_info(info: pd.DataFrame, cols) -> dict[str, Any]:
 def create_stations_info_1(info: pd.DataFrame) -> dict[str, Any]:
     """Funcao privada para ajuda de formatacao no guardar como JSON
 
+    As horas de chegada sao calculadas de uma vez para todas as leituras
+    (ver `parser.arrival_times`).
+
     Args:
         info (pd.DataFrame): dataframe com eventos
 
     Returns:
         dict[str, Any]: dict com o formato pretendido
     """
+    hms = parser.arrival_times(info).dt.strftime("%H:%M:%S.%f").to_numpy()
     stationsDict = {}
-    for idx in range(len(info)):
-        aux = info.iloc[idx]
-
-        micro, sec = tuple(map(int, modf(aux["Seg"])))
-        hms = time(
-            hour=aux["Hora"], minute=aux["Min"], second=sec, microsecond=micro
-        ).strftime("%H:%M:%S.%f")
-        station = {
-            "Componente": aux["Componente"],
-            "Hora": hms,
-            "Distancia": float(aux["DIS"]),
-        }
-
-        if type(aux["Tipo Onda"]) is float:
-            station.update({"Tipo Onda": aux["Tipo Onda"]})
-            if aux["Tipo Onda"] == "IAML":
-                station.update({"Amplitude": float(aux["Amplitude"])})
-
-        if aux["Estacao"] not in stationsDict.keys():
-            stationsDict[aux["Estacao"]] = [station]
-        else:
-            stationsDict[aux["Estacao"]].append(station)
+    for sta, comp, hora, dist, phase, amp in zip(
+        info["Estacao"].to_numpy(),
+        info["Componente"].to_numpy(),
+        hms,
+        info["DIS"].to_numpy(dtype=float),
+        info["Tipo Onda"].to_numpy(),
+        info["Amplitude"].to_numpy(dtype=float),
+    ):
+        station = {"Componente": comp, "Hora": hora, "Distancia": float(dist)}
+
+        if isinstance(phase, str):
+            station["Tipo Onda"] = phase
+            if phase == "IAML":
+                station["Amplitude"] = float(amp)
+
+        stationsDict.setdefault(sta, []).append(station)
     return {"Estacoes": stationsDict}
 
 
@@ -154,3 +207,6 @@ def create_mag_info(magnitudes: list[dict[str, Any]]) -> dict[str, Any]:
     for value in magnitudes:
         mags[value["Tipo"]] = value["Magnitude"]
     return mags
+
+
+catalog.register_builder("magnitudes", _magnitude_table)
@@ -1,38 +1,356 @@
+# pyright: basic
+
+import functools
 import json
-import plotly.express as px
+import math
+import sys
+
+import numpy as np
 import pandas as pd
-from dash import Dash, html, Input, Output, dcc, callback
-import parser as parser
+import plotly
+import plotly.graph_objects as go
+from dash import Dash, Input, Output, callback, dcc, html
+
+from utils import events, figcache
+from utils.spatial import SpatialIndex
+
+"""App Dash com os mapas (2D e 3D) dos eventos
+
+Correr a partir da raiz do projeto: `python -m utils.vis [ficheiro de dados]`
+
+Os mapas usam o catalogo de eventos pre-construido (ver `utils/events.py`), com um
+ponto por evento. O catalogo so e lido no primeiro pedido, e nao no arranque da app:
+o arranque nao depende do tamanho do catalogo. Para evitar o parse na primeira
+visita, o catalogo pode ser construido antes com `python earthquakes.py -e`.
+
+Os mapas sao calculados no servidor para a vista atual do mapa 2D: a cada
+deslocamento ou zoom, os eventos dentro da vista sao procurados no indice espacial
+(ver `utils/spatial.py`), e so esses sao enviados para o browser:
+    - ate `MAX_POINTS` eventos, cada evento e um ponto;
+    - acima disso, os eventos sao agregados numa grelha de ~`GRID_CELLS` celulas
+      ao longo da largura da vista, com um ponto por celula (tamanho e cor pelo
+      numero de eventos). A grelha fica mais fina com o zoom, ate os eventos
+      aparecerem individualmente.
+O mapa 3D mostra os `MAX_POINTS_3D` eventos de maior magnitude dentro da vista. Os
+dois mapas usam tracos WebGL (`Scattermap` e `Scatter3d`).
+
+As celulas da grelha sao fracoes de 360 graus em potencias de 2, e a vista e
+alargada ate aos limites das celulas: vistas proximas dao a mesma figura, que e
+guardada na cache de figuras (ver `utils/figcache.py`).
+
+"""
+
+DATA_FILE = "dados.txt"
+
+# numero maximo de eventos individuais enviados para o mapa 2D e para o 3D
+MAX_POINTS = 20_000
+MAX_POINTS_3D = 20_000
+
+# celulas da grelha de agregacao ao longo da largura da vista
+GRID_CELLS = 64
+
+# tamanho da vista, em pixeis, quando o browser so envia o centro e o zoom
+VIEW_PX = (1000, 450)
+
+# mantem o zoom e a posicao escolhidos pelo utilizador quando a figura muda
+UIREVISION = "mapa"
+
+
+@functools.cache
+def load_catalog() -> tuple[pd.DataFrame, SpatialIndex, str]:
+    """Catalogo de eventos, lido (ou construido) no primeiro pedido, com o seu
+    indice espacial e a chave do seu conteudo para a cache de figuras
+
+    Returns:
+        tuple[pd.DataFrame, SpatialIndex, str]: catalogo de eventos (ver
+            `events.event_table`), indice e chave
+    """
+    ev = events.load(DATA_FILE)
+    lats = ev["Latitude"].to_numpy(dtype=float)
+    lons = ev["Longitude"].to_numpy(dtype=float)
+    # o indice guarda a posicao de cada evento no catalogo, em vez do ID
+    index = SpatialIndex(np.arange(len(ev)), lats, lons)
+    data = ev[["ID", "Latitude", "Longitude", "Profundidade", "Magnitude"]]
+    return ev, index, figcache.content_key(data.to_numpy(dtype=float))
+
+
+def viewport(
+    relayout: dict | None, ev: pd.DataFrame
+) -> tuple[float, float, float, float]:
+    """Caixa (lat_min, lat_max, lon_min, lon_max) visivel no mapa 2D
+
+    Args:
+        relayout (dict | None): `relayoutData` do mapa 2D
+        ev (pd.DataFrame): catalogo de eventos
+
+    Returns:
+        tuple[float, float, float, float]: caixa; sem vista, a de todos os eventos
+    """
+    relayout = relayout or {}
+    derived = relayout.get("map._derived")
+    if derived:
+        lons, lats = np.asarray(derived["coordinates"], dtype=float).T
+    elif "map.center" in relayout and "map.zoom" in relayout:
+        # projecao de Mercator: 512 pixeis para 360 graus no zoom 0
+        center = relayout["map.center"]
+        degPerPx = 360 / (512 * 2 ** relayout["map.zoom"])
+        halfLon = VIEW_PX[0] / 2 * degPerPx
+        halfLat = VIEW_PX[1] / 2 * degPerPx * math.cos(math.radians(center["lat"]))
+        lons = np.array([center["lon"] - halfLon, center["lon"] + halfLon])
+        lats = np.array([center["lat"] - halfLat, center["lat"] + halfLat])
+    else:
+        lons = ev["Longitude"].to_numpy(dtype=float)
+        lats = ev["Latitude"].to_numpy(dtype=float)
+        if np.isnan(lats).all():
+            return -90.0, 90.0, -180.0, 180.0
+
+    return (
+        max(float(np.nanmin(lats)), -90.0),
+        min(float(np.nanmax(lats)), 90.0),
+        max(float(np.nanmin(lons)), -180.0),
+        min(float(np.nanmax(lons)), 180.0),
+    )
+
+
+def snap(
+    box: tuple[float, float, float, float], cells: int = GRID_CELLS
+) -> tuple[tuple[float, float, float, float], float]:
+    """Lado das celulas da grelha para a largura da vista, e a vista alargada ate
+    aos limites das celulas
+
+    Args:
+        box (tuple[float, float, float, float]): caixa (ver `viewport`)
+        cells (int): numero de celulas ao longo da largura (default: `GRID_CELLS`)
+
+    Returns:
+        tuple[tuple[float, float, float, float], float]: caixa alargada e lado das
+            celulas, em graus
+    """
+    lat_min, lat_max, lon_min, lon_max = box
+    width = max(lon_max - lon_min, lat_max - lat_min, 1e-6)
+    cell = 360 / 2 ** max(0, math.floor(math.log2(360 * cells / width)))
+    return (
+        math.floor(lat_min / cell) * cell,
+        math.ceil(lat_max / cell) * cell,
+        math.floor(lon_min / cell) * cell,
+        math.ceil(lon_max / cell) * cell,
+    ), cell
+
+
+def grid_density(
+    lats: np.ndarray, lons: np.ndarray, mags: np.ndarray, cell: float
+) -> pd.DataFrame:
+    """Agrega os eventos numa grelha regular
+
+    Args:
+        lats (np.ndarray): latitudes
+        lons (np.ndarray): longitudes
+        mags (np.ndarray): magnitudes
+        cell (float): lado das celulas, em graus
+
+    Returns:
+        pd.DataFrame: uma linha por celula com eventos, com `Latitude` e
+            `Longitude` (media dos eventos da celula), `N` e `Magnitude` (maxima)
+    """
+    rows = np.floor(lats / cell).astype(np.int64)
+    cols = np.floor(lons / cell).astype(np.int64)
+    codes, uniq = pd.factorize((rows << 32) + (cols - cols.min(initial=0)))
+    n = np.bincount(codes, minlength=len(uniq))
+    mag = np.full(len(uniq), -np.inf)
+    np.fmax.at(mag, codes, mags)
+    return pd.DataFrame(
+        {
+            "Latitude": np.bincount(codes, lats, len(uniq)) / n,
+            "Longitude": np.bincount(codes, lons, len(uniq)) / n,
+            "N": n,
+            "Magnitude": np.where(np.isinf(mag), np.nan, mag),
+        }
+    )
+
+
+def _customdata(ev: pd.DataFrame) -> np.ndarray:
+    """Funcao privada com o ID e a magnitude de cada evento, para o texto ao passar
+    o rato e para os cliques (o ID, AAAAMMDDhhmmss, inclui a data)"""
+    return np.column_stack(
+        [ev["ID"].to_numpy(dtype=float), ev["Magnitude"].to_numpy(dtype=float)]
+    )
+
+
+# texto ao passar o rato, calculado no browser a partir de `_customdata`
+HOVER_2D = "%{customdata[0]:d}<br>M %{customdata[1]:.1f}<extra></extra>"
+HOVER_3D = "%{customdata[0]:d}<br>M %{customdata[1]:.1f} | %{z:.1f} km<extra></extra>"
+
+
+def _layout2D(fig: go.Figure, box: tuple[float, float, float, float]) -> go.Figure:
+    """Funcao privada com o estilo do mapa 2D, centrado na caixa"""
+    lat_min, lat_max, lon_min, lon_max = box
+    width = max(lon_max - lon_min, lat_max - lat_min, 1e-6)
+    fig.update_layout(
+        map_style="satellite",
+        map_center={"lat": (lat_min + lat_max) / 2, "lon": (lon_min + lon_max) / 2},
+        map_zoom=max(0.0, math.log2(360 / width)),
+        margin={"l": 0, "r": 0, "t": 0, "b": 0},
+        uirevision=UIREVISION,
+    )
+    return fig
+
+
+def build_map2D(ev: pd.DataFrame, box: tuple[float, float, float, float]) -> go.Figure:
+    """Mapa dos epicentros, um ponto por evento
+
+    Args:
+        ev (pd.DataFrame): eventos a desenhar
+        box (tuple[float, float, float, float]): vista inicial
+
+    Returns:
+        go.Figure: figura
+    """
+    fig = go.Figure(
+        go.Scattermap(
+            lat=ev["Latitude"],
+            lon=ev["Longitude"],
+            mode="markers",
+            marker={"color": ev["Magnitude"], "colorscale": "YlOrRd", "size": 7},
+            customdata=_customdata(ev),
+            hovertemplate=HOVER_2D,
+        )
+    )
+    return _layout2D(fig, box)
+
+
+def build_density2D(
+    grid: pd.DataFrame, box: tuple[float, float, float, float]
+) -> go.Figure:
+    """Mapa da densidade de epicentros, um ponto por celula da grelha
+
+    Args:
+        grid (pd.DataFrame): resultado de `grid_density`
+        box (tuple[float, float, float, float]): vista inicial
+
+    Returns:
+        go.Figure: figura
+    """
+    n = grid["N"].to_numpy()
+    fig = go.Figure(
+        go.Scattermap(
+            lat=grid["Latitude"],
+            lon=grid["Longitude"],
+            mode="markers",
+            marker={
+                "size": 6 + 24 * np.sqrt(n / n.max(initial=1)),
+                "color": np.log10(n),
+                "colorscale": "Viridis",
+                "colorbar": {"title": "log10(N)"},
+            },
+            hovertext=[
+                f"{k} eventos<br>M max {m:.1f}" for k, m in zip(n, grid["Magnitude"])
+            ],
+            hoverinfo="text",
+        )
+    )
+    return _layout2D(fig, box)
+
+
+def build_map3D(ev: pd.DataFrame) -> go.Figure:
+    """Hipocentros em 3D, com a profundidade para baixo
+
+    Args:
+        ev (pd.DataFrame): eventos a desenhar
+
+    Returns:
+        go.Figure: figura
+    """
+    fig = go.Figure(
+        go.Scatter3d(
+            x=ev["Longitude"],
+            y=ev["Latitude"],
+            z=ev["Profundidade"],
+            mode="markers",
+            marker={"size": 3, "color": ev["Magnitude"], "colorscale": "YlOrRd"},
+            customdata=_customdata(ev),
+            hovertemplate=HOVER_3D,
+        )
+    )
+    fig.update_scenes(
+        xaxis_title="Longitude",
+        yaxis_title="Latitude",
+        zaxis_title="Profundidade",
+        zaxis_autorange="reversed",
+    )
+    fig.update_layout(uirevision=UIREVISION)
+    return fig
+
+
+def view_figures(relayout: dict | None) -> tuple[go.Figure, go.Figure]:
+    """Mapas 2D e 3D da vista atual (ver a descricao do modulo)
+
+    Args:
+        relayout (dict | None): `relayoutData` do mapa 2D
+
+    Returns:
+        tuple[go.Figure, go.Figure]: mapa 2D e mapa 3D
+    """
+    ev, index, dataKey = load_catalog()
+    box, cell = snap(viewport(relayout, ev))
+    pos = np.sort(index.bbox(*box))
+    inView = ev.iloc[pos]
+    mags = inView["Magnitude"].to_numpy(dtype=float)
+
+    aggregate = len(pos) > MAX_POINTS
+    if len(pos) > MAX_POINTS_3D:
+        top = np.argpartition(np.nan_to_num(mags, nan=-np.inf), -MAX_POINTS_3D)
+        top3D = inView.iloc[np.sort(top[-MAX_POINTS_3D:])]
+    else:
+        top3D = inView
+
+    cache = figcache.get_cache()
+    parts = (plotly.__version__, dataKey, box, cell if aggregate else None)
+
+    def _build2D():
+        if not aggregate:
+            return build_map2D(inView, box)
+        grid = grid_density(
+            inView["Latitude"].to_numpy(dtype=float),
+            inView["Longitude"].to_numpy(dtype=float),
+            mags,
+            cell,
+        )
+        return build_density2D(grid, box)
+
+    map2D = cache.plotly(figcache.content_key("map2D", *parts), _build2D)
+    map3D = cache.plotly(
+        figcache.content_key("map3D", *parts, MAX_POINTS_3D), lambda: build_map3D(top3D)
+    )
+    return map2D, map3D
 
 
 @callback(
-    Output('dump-json', 'children'),
-    Input('map3D-view', 'clickData')
+    Output("map2D-view", "figure"),
+    Output("map3D-view", "figure"),
+    Input("map2D-view", "relayoutData"),
 )
-def display_clicked_content(clickData):
-    return json.dumps(clickData, indent=2)
+def update_maps(relayout):
+    """Atualiza os mapas a cada deslocamento ou zoom do mapa 2D (e no primeiro
+    pedido, em que o catalogo e lido)
+    """
+    return view_figures(relayout)
 
-def update_map(clickData):
-    return 
 
-df = parser.parse("dados.txt")
+@callback(Output("dump-json", "children"), Input("map3D-view", "clickData"))
+def display_clicked_content(clickData):
+    return json.dumps(clickData, indent=2)
 
-map2D = px.scatter_map(df, lat="Latitude", lon="Longitude", map_style="satellite")
-map3D = px.scatter_3d(df, x="Longitude", y="Latitude", z="Profundidade")
-map3D.update_scenes(zaxis_autorange="reversed")
 
 app = Dash()
-app.layout = html.Div(children=[
-    dcc.Graph(
-        id="map3D-view",
-        figure=map3D
-    ),
-    dcc.Graph(
-        id="map2D-view",
-        figure=map2D
-    ),
-    html.Div(children=[html.Pre(id='dump-json', style={'overflowX': 'scroll'}, children="1\n2\n3\n4\n5\n6\n7\n8\n9\n10\n11\n12\n13\n14\n15")
-])])
-
-if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+app.layout = html.Div(
+    children=[
+        dcc.Graph(id="map3D-view"),
+        dcc.Graph(id="map2D-view"),
+        html.Div(children=[html.Pre(id="dump-json", style={"overflowX": "scroll"})]),
+    ]
+)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        DATA_FILE = sys.argv[1]
+    app.run(debug=True)
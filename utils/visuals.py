@@ -1,18 +1,49 @@
 import os
 import sys
-from typing import Sequence
+from typing import Any, Callable, Sequence
 
+import matplotlib as mpl
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+from matplotlib.ticker import MaxNLocator
 import numpy as np
 import pandas as pd
 from numpy.typing import ArrayLike
 
-from utils import stats
+from utils import figcache, stats
+
+type Plot = tuple[Callable[..., None], dict[str, Any]]
+
+# largura minima de uma barra, em pixeis; com mais periodos do que cabem no eixo,
+# os periodos consecutivos sao agrupados
+MIN_BAR_PX = 2
 
 # -- helpers
 
 
-def plot_bar(x: ArrayLike, y: ArrayLike, xLabel: str, yLabel: str, title: str) -> None:
+def _finish(fname: str | Sequence[str] | None) -> None:
+    """Funcao privada que mostra a figura atual ou, com `fname`, a guarda e fecha
+
+    Args:
+        fname (str | Sequence[str] | None): ficheiro(s) onde guardar a figura (o
+            formato vem da extensao: png, svg, pdf); None para a mostrar
+    """
+    if fname is None:
+        plt.show()
+        return
+    for f in [fname] if isinstance(fname, str) else fname:
+        plt.savefig(f)
+    plt.close()
+
+
+def plot_bar(
+    x: ArrayLike,
+    y: ArrayLike,
+    xLabel: str,
+    yLabel: str,
+    title: str,
+    fname: str | Sequence[str] | None = None,
+) -> None:
     """Funcao para efetuar o plot de um grafico de barras
 
     Args:
@@ -21,6 +52,8 @@ def plot_bar(x: ArrayLike, y: ArrayLike, xLabel: str, yLabel: str, title: str) -
         xLabel (str): Nome da linha x
         yLabel (str): Nome da linha y
         title (str): Titulo do grafico
+        fname (str | Sequence[str] | None): ficheiro(s) onde guardar o grafico, em vez
+            de o mostrar (default: None)
     """
     plt.figure(figsize=(10, 6))
     plt.bar(x, y)
@@ -29,11 +62,73 @@ def plot_bar(x: ArrayLike, y: ArrayLike, xLabel: str, yLabel: str, title: str) -
     plt.title(title)
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.show()
+    _finish(fname)
+
+
+def plot_bar_dates(
+    starts: ArrayLike,
+    ends: ArrayLike,
+    counts: ArrayLike,
+    xLabel: str,
+    yLabel: str,
+    title: str,
+    unit: str = "dias",
+    fname: str | Sequence[str] | None = None,
+) -> None:
+    """Grafico de barras com eixo de datas, agregado a resolucao da figura
+
+    Cada barra ocupa o intervalo do seu periodo. Se houver mais periodos do que
+    barras de `MIN_BAR_PX` pixeis no eixo, os periodos consecutivos sao somados em
+    grupos de `k`, e o numero de barras (e o tempo de desenho) fica limitado pela
+    largura da figura.
+
+    Args:
+        starts (ArrayLike): inicio de cada periodo
+        ends (ArrayLike): fim de cada periodo
+        counts (ArrayLike): valor de cada periodo
+        xLabel (str): Nome da linha x
+        yLabel (str): Nome da linha y
+        title (str): Titulo do grafico
+        unit (str): nome dos periodos, para a legenda do eixo y (default: dias)
+        fname (str | Sequence[str] | None): ficheiro(s) onde guardar o grafico, em vez
+            de o mostrar (default: None)
+    """
+    fig, ax = plt.subplots(figsize=(10, 6))
+    x0 = mdates.date2num(pd.DatetimeIndex(starts))
+    x1 = mdates.date2num(pd.DatetimeIndex(ends))
+    counts = np.asarray(counts)
+
+    maxBars = max(1, int(ax.get_window_extent().width // MIN_BAR_PX))
+    k = -(-len(counts) // maxBars)
+    if k > 1:
+        padded = np.zeros(-(-len(counts) // k) * k, dtype=counts.dtype)
+        padded[: len(counts)] = counts
+        counts = padded.reshape(-1, k).sum(axis=1)
+        x1 = np.r_[x1[k - 1 :: k], x1[-1:]][: len(counts)]
+        x0 = x0[::k]
+        yLabel = f"{yLabel} (por {k} {unit})"
+
+    # barras com 90% do periodo, centradas no periodo
+    ax.bar((x0 + x1) / 2, counts, width=0.9 * (x1 - x0))
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+    locator = mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    ax.set_xlabel(xLabel)
+    ax.set_ylabel(yLabel)
+    ax.set_title(title)
+    fig.tight_layout()
+    _finish(fname)
 
 
 def plot_linear_with_std(
-    x: ArrayLike, mean: ArrayLike, std: ArrayLike, xLabel: str, yLabel: str, title: str
+    x: ArrayLike,
+    mean: ArrayLike,
+    std: ArrayLike,
+    xLabel: str,
+    yLabel: str,
+    title: str,
+    fname: str | Sequence[str] | None = None,
 ) -> None:
     """Funcao para efetuar o plot de um grafico linear
 
@@ -44,6 +139,8 @@ def plot_linear_with_std(
         xLabel (str): Nome da linha x
         yLabel (str): Nome da linha y
         title (str): Titulo do grafico
+        fname (str | Sequence[str] | None): ficheiro(s) onde guardar o grafico, em vez
+            de o mostrar (default: None)
     """
     plt.figure(figsize=(10, 6))
     plt.errorbar(x, mean, yerr=std, fmt="-o", capsize=5, ecolor="red")
@@ -53,113 +150,258 @@ def plot_linear_with_std(
     plt.xticks(rotation=45)
     plt.grid(True)
     plt.tight_layout()
-    plt.show()
+    _finish(fname)
 
 
 def plot_boxplot(
-    dataList: ArrayLike, labels: Sequence, xLabel: str, yLabel: str, title: str
+    boxes: Sequence[dict[str, Any]],
+    xLabel: str,
+    yLabel: str,
+    title: str,
+    fname: str | Sequence[str] | None = None,
 ) -> None:
-    """Funcao para efetuar o plot de um grafico boxplot
+    """Funcao para efetuar o plot de um grafico boxplot, a partir das estatisticas de
+    cada caixa (ver `boxplot_plot`), sem os valores
 
     Args:
-        dataList (ArrayLike): array com valores
-        labels (Sequence): array com nomes para cada valor em `dataList`
+        boxes (Sequence[dict[str, Any]]): uma dict por caixa, no formato do `bxp` do
+            matplotlib (`label`, `med`, `q1`, `q3`, `whislo`, `whishi`, `fliers`)
         xLabel (str): Nome da linha x
         yLabel (str): Nome da linha y
         title (str): Titulo do grafico
+        fname (str | Sequence[str] | None): ficheiro(s) onde guardar o grafico, em vez
+            de o mostrar (default: None)
     """
-    # dataList: lista de arrays/series, um para cada etiqueta
-    # labels: lista de etiquetas correspondentes a dataList
-    plt.figure(figsize=(10, 6))
-    plt.boxplot(dataList, label=labels)
-    plt.xlabel(xLabel)
-    plt.ylabel(yLabel)
-    plt.title(title)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bxp(boxes)
+    ax.set_xlabel(xLabel)
+    ax.set_ylabel(yLabel)
+    ax.set_title(title)
     plt.xticks(rotation=90)
-    plt.tight_layout()
-    plt.show()
+    fig.tight_layout()
+    _finish(fname)
+
+
+def figure_key(
+    plot: Callable[..., None], kwargs: dict[str, Any], dpi: float | None = None
+) -> str:
+    """Chave de um grafico na cache de figuras: a funcao de plot, os seus argumentos,
+    a resolucao e a versao do matplotlib
+
+    Args:
+        plot (Callable[..., None]): funcao de plot
+        kwargs (dict[str, Any]): argumentos de `plot`
+        dpi (float | None): resolucao das imagens (default: a do matplotlib)
+
+    Returns:
+        str: chave (ver `figcache.content_key`)
+    """
+    if dpi is None:
+        dpi = mpl.rcParams["savefig.dpi"]
+    if dpi == "figure":
+        dpi = mpl.rcParams["figure.dpi"]
+    return figcache.content_key(plot, kwargs, float(dpi), mpl.__version__)
+
+
+def draw(
+    plot: Callable[..., None],
+    kwargs: dict[str, Any],
+    fname: str | Sequence[str] | None = None,
+    cache: figcache.FigureCache | None = None,
+) -> None:
+    """Desenha um grafico. Para ficheiros, reutiliza as imagens da cache se o grafico
+    ja tiver sido desenhado com os mesmos argumentos (ver `utils/figcache.py`)
+
+    Args:
+        plot (Callable[..., None]): funcao de plot
+        kwargs (dict[str, Any]): argumentos de `plot`
+        fname (str | Sequence[str] | None): ficheiro(s) onde guardar o grafico
+            (default: mostra a figura, sempre desenhada de novo, para manter o zoom
+            e as coordenadas do cursor em datas e valores)
+        cache (figcache.FigureCache | None): cache (default: `figcache.get_cache()`)
+    """
+    if fname is None:
+        plot(**kwargs)
+        return
+
+    cache = figcache.get_cache() if cache is None else cache
+    key = figure_key(plot, kwargs)
+    fnames = [fname] if isinstance(fname, str) else list(fname)
+    exts = [os.path.splitext(f)[1].lstrip(".").lower() for f in fnames]
+    missing = [ext for ext, f in zip(exts, fnames) if not cache.copy(key, ext, f)]
+    if missing:
+        cache.put(key, missing, lambda tmps: plot(**kwargs, fname=tmps))
+        for ext, f in zip(exts, fnames):
+            if ext in missing:
+                cache.copy(key, ext, f)
+
+
+def _render(
+    df: pd.DataFrame,
+    prepare: Callable[..., Plot],
+    args: tuple,
+    fname: str | Sequence[str] | None,
+) -> None:
+    """Funcao privada que prepara os dados de um grafico (reutilizados enquanto o
+    catalogo nao mudar) e o desenha"""
+    plot, kwargs = figcache.get_cache().prepared(df, prepare.__name__, args, prepare)
+    draw(plot, kwargs, fname)
 
 
 # -- t6 logic
 
 
-def viz_events_per_period(df: pd.DataFrame, period: str, title_suffix: str) -> None:
-    """Prepara dados para serem visualizados por um grafico de barras
+def events_per_period_plot(df: pd.DataFrame, period: str, title_suffix: str) -> Plot:
+    """Dados do grafico de barras do numero de eventos por periodo
 
     Args:
         df (pd.DataFrame): dataframe com eventos
         period (str): periodo, em dias ou meses
         title_suffix (str): sufixo para o nome do titulo do grafico
+
+    Returns:
+        Plot: funcao de plot e os seus argumentos
     """
     dates, counts = stats.events_per_period(df, period)
-    # Formatar datas para melhor leitura no gráfico
-    if period == "D":
-        # dates é um DatetimeIndex
-        labels = [d.strftime("%Y-%m-%d") for d in dates]
-    else:
-        labels = [d.strftime("%Y-%m") for d in dates]
+    # periodos como intervalos [inicio, fim[, para um eixo de datas
+    periods = pd.PeriodIndex(dates, freq=stats.PERIODS[period][0])
 
-    plot_bar(labels, counts, "Data", "Número de Eventos", f"Eventos por {title_suffix}")
+    return plot_bar_dates, {
+        "starts": periods.start_time,
+        "ends": (periods + 1).start_time,
+        "counts": np.asarray(counts),
+        "xLabel": "Data",
+        "yLabel": "Número de Eventos",
+        "title": f"Eventos por {title_suffix}",
+        "unit": "dias" if period == "D" else "meses",
+    }
 
 
-def viz_linear_stats(df: pd.DataFrame, target: str):
-    """Prepara dados para serem visualizados por um grafico linear
+def linear_stats_plot(df: pd.DataFrame, target: str) -> Plot:
+    """Dados do grafico linear da media e desvio padrao por mes
 
     Args:
         df (pd.DataFrame): dataframe com eventos
         target (str): Escolha entre magnitude ou profundidade para visualizar
+
+    Returns:
+        Plot: funcao de plot e os seus argumentos
     """
     # Média +/- Desvio Padrão
     if target == "Profundidade":
-        st = stats.stats_depth_month(df)
+        st = stats.aggregate(df, "Profundidade", ("mean", "std"))
         unit = "km"
     else:  # Magnitude
-        st = stats.stats_mag_month(df)
+        st = stats.aggregate(df, stats.MAG_COLUMN, ("mean", "std"))
         unit = "Magn"
 
     labels = [d.strftime("%Y-%m") for d in st.index]
 
-    plot_linear_with_std(
-        labels,
-        st["Mean"],
-        st["Std"],
-        "Mês",
-        f"{target} ({unit})",
-        f"Média e Desvio Padrão de {target} por Mês",
-    )
+    return plot_linear_with_std, {
+        "x": labels,
+        "mean": st["Mean"].to_numpy(),
+        "std": st["Std"].to_numpy(),
+        "xLabel": "Mês",
+        "yLabel": f"{target} ({unit})",
+        "title": f"Média e Desvio Padrão de {target} por Mês",
+    }
 
 
-def viz_boxplot(df: pd.DataFrame, target: str):
-    """Prepara dados para serem visualizados por um grafico tipo boxplot
+def boxplot_plot(df: pd.DataFrame, target: str) -> Plot:
+    """Dados do grafico boxplot por mes
 
     Args:
         df (pd.DataFrame): dataframe com eventos
         target (str): Escolha entre magnitude ou profundidade para visualizar
+
+    Returns:
+        Plot: funcao de plot e os seus argumentos
     """
-    events = stats._get_unique_events(df)
+    column = "Profundidade" if target == "Profundidade" else stats.MAG_COLUMN
+
+    # Agrupar por mês, já ordenado por valor; só as estatísticas de cada mês e os
+    # outliers passam para o gráfico
+    groups = stats.group_by_period(df, column, "ME")
+    q1, med, q3 = (groups.quantile(q) for q in (0.25, 0.5, 0.75))
+    whislo, whishi, outside = groups.whiskers()
+    bounds = groups.offsets
+
+    boxes = []
+    for i in np.flatnonzero(groups.counts > 0):
+        vals = groups.values[bounds[i] : bounds[i + 1]]
+        boxes.append(
+            {
+                "label": groups.labels[i].strftime("%Y-%m"),
+                "med": med[i],
+                "q1": q1[i],
+                "q3": q3[i],
+                "whislo": whislo[i],
+                "whishi": whishi[i],
+                "fliers": vals[outside[bounds[i] : bounds[i + 1]]],
+            }
+        )
+
+    return plot_boxplot, {
+        "boxes": boxes,
+        "xLabel": "Mês",
+        "yLabel": target,
+        "title": f"Boxplot de {target} por Mês",
+    }
+
+
+def viz_events_per_period(
+    df: pd.DataFrame,
+    period: str,
+    title_suffix: str,
+    fname: str | Sequence[str] | None = None,
+) -> None:
+    """Prepara dados para serem visualizados por um grafico de barras
 
-    # Agrupar por mês
-    grouped = events.set_index("Data").resample("ME")
+    Args:
+        df (pd.DataFrame): dataframe com eventos
+        period (str): periodo, em dias ou meses
+        title_suffix (str): sufixo para o nome do titulo do grafico
+        fname (str | Sequence[str] | None): ficheiro(s) onde guardar o grafico
+            (default: mostra-o)
+    """
+    _render(df, events_per_period_plot, (period, title_suffix), fname)
 
-    data_to_plot = []
-    labels = []
 
-    for name, group in grouped:
-        if target == "Profundidade":
-            vals = group["Profundidade"].dropna().values
-        else:
-            # Extrair magnitudes máximas
-            def get_max_mag(mags):
-                vals = [float(m["Magnitude"]) for m in mags if "Magnitude" in m]
-                return max(vals) if vals else np.nan
+def viz_linear_stats(
+    df: pd.DataFrame, target: str, fname: str | Sequence[str] | None = None
+):
+    """Prepara dados para serem visualizados por um grafico linear
 
-            vals = group["Magnitudes"].apply(get_max_mag).dropna().values
+    Args:
+        df (pd.DataFrame): dataframe com eventos
+        target (str): Escolha entre magnitude ou profundidade para visualizar
+        fname (str | Sequence[str] | None): ficheiro(s) onde guardar o grafico
+            (default: mostra-o)
+    """
+    _render(df, linear_stats_plot, (target,), fname)
 
-        if len(vals) > 0:
-            data_to_plot.append(vals)
-            labels.append(name.strftime("%Y-%m"))
 
-    plot_boxplot(data_to_plot, labels, "Mês", target, f"Boxplot de {target} por Mês")
+def viz_boxplot(df: pd.DataFrame, target: str, fname: str | Sequence[str] | None = None):
+    """Prepara dados para serem visualizados por um grafico tipo boxplot
+
+    Args:
+        df (pd.DataFrame): dataframe com eventos
+        target (str): Escolha entre magnitude ou profundidade para visualizar
+        fname (str | Sequence[str] | None): ficheiro(s) onde guardar o grafico
+            (default: mostra-o)
+    """
+    _render(df, boxplot_plot, (target,), fname)
+
+
+# os seis graficos T6: nome -> funcao que prepara os dados, e argumentos
+T6_PLOTS: dict[str, tuple[Callable[..., Plot], tuple]] = {
+    "eventos_dia": (events_per_period_plot, ("D", "Dia")),
+    "eventos_mes": (events_per_period_plot, ("M", "Mês")),
+    "profundidade_media": (linear_stats_plot, ("Profundidade",)),
+    "magnitude_media": (linear_stats_plot, ("Magnitude",)),
+    "profundidade_boxplot": (boxplot_plot, ("Profundidade",)),
+    "magnitude_boxplot": (boxplot_plot, ("Magnitude",)),
+}
 
 
 # --- Menu ---